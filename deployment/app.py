@@ -1,5 +1,68 @@
-# Create your locally deployed streamlit app 
+# Create your locally deployed streamlit app
 # of your final model
+#
+# Run with:  streamlit run deployment/app.py
+# The model, tables and per-NTA lookups are built once per server process
+# (st.cache_resource) so widget interactions only read from memory.
 
+import sys
+import time
+from pathlib import Path
+
+RUN_START = time.perf_counter()
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'python' / 'src'))
+
+import pandas as pd
 import streamlit as st
-import joblib, json, numpy as np, pandas as pd
\ No newline at end of file
+
+from nta_lookup import build_lookup
+
+COLD_START_TARGET_S = 2.0
+INTERACTION_TARGET_MS = 100.0
+
+st.set_page_config(page_title='Beyond the Pantry', layout='wide')
+
+
+@st.cache_resource(show_spinner='Loading model and data...')
+def get_lookup():
+    return build_lookup()
+
+
+lookup, load_timings = get_lookup()
+
+st.title('Beyond the Pantry: emergency food coverage by NTA')
+
+nta_id = st.selectbox('Neighborhood Tabulation Area', lookup.nta_ids, format_func=lookup.label)
+profile, nearest = lookup.lookup(nta_id)
+
+col1, col2, col3, col4 = st.columns(4)
+ratio = profile['coverage_ratio']
+col1.metric('Coverage ratio (sites per 1,000 sheltered)', 'n/a' if pd.isna(ratio) else f"{ratio:.2f}")
+col2.metric('Food sites', 0 if pd.isna(profile['total_sites']) else int(profile['total_sites']))
+col3.metric('Sheltered people (CDTA share)',
+            'n/a' if pd.isna(profile['sheltered_population']) else f"{profile['sheltered_population']:.0f}")
+if lookup.has_model:
+    probability = profile['high_coverage_probability']
+    col4.metric('Model: P(high coverage)', 'n/a' if pd.isna(probability) else f"{probability:.2f}")
+else:
+    col4.info('No saved model: run `python python/src/model_training.py` to add the model scores')
+
+left, right = st.columns(2)
+with left:
+    st.subheader('Neighborhood profile')
+    st.table({key: [value] for key, value in profile.items()
+              if key not in ('nta_id', 'nta_name')})
+with right:
+    st.subheader(f'{len(nearest)} nearest EFAP sites')
+    st.dataframe(nearest, hide_index=True)
+    if not nearest.empty:
+        st.map(nearest, latitude='lat', longitude='lon')
+
+interaction_ms = (time.perf_counter() - RUN_START) * 1000
+with st.expander('Timing'):
+    st.write({'cold start (s)': load_timings, 'this run (ms)': round(interaction_ms, 1)})
+    if load_timings['total'] > COLD_START_TARGET_S:
+        st.warning(f"Cold start {load_timings['total']:.2f}s is over the {COLD_START_TARGET_S}s target")
+    if interaction_ms > INTERACTION_TARGET_MS:
+        st.warning(f"This interaction took {interaction_ms:.0f}ms (target {INTERACTION_TARGET_MS:.0f}ms)")
@@ -0,0 +1,145 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from config import PRIORITIZATION_RAW
+from schemas import read_raw, read_table
+
+# -----------------------------
+# Distance-based access metrics
+# Counting sites inside an NTA ignores the pantry across the street in the
+# next NTA. Here the EFAP sites go into KD-trees (all sites, pantries,
+# kitchens, weekend-open sites) on a local equirectangular projection in km,
+# which is accurate to well under 0.1% across the five boroughs, and every
+# origin (NTA centroids or any points) is queried in bulk: k nearest sites,
+# distance to the nearest pantry / kitchen / weekend site, and the number of
+# sites within several radii.
+# -----------------------------
+
+EARTH_RADIUS_KM = 6371.0
+NYC_REFERENCE_LAT = 40.7          # latitude of the projection's true scale
+RADII_KM = (0.5, 1.0, 2.0)
+
+# site subsets with their own tree: name -> column of the site frame that flags members
+SUBSETS = {
+    'pantry': 'has_pantry_access',
+    'kitchen': 'has_kitchen_access',
+    'weekend': 'weekend_available',
+}
+
+
+def project_km(lat, lon):
+    """(n, 2) planar coordinates in km around New York City."""
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    scale = np.radians(1) * EARTH_RADIUS_KM
+    return np.column_stack([lon * scale * np.cos(np.radians(NYC_REFERENCE_LAT)), lat * scale])
+
+
+def load_sites():
+    """Mapped EFAP sites with coordinates and their pantry / kitchen / weekend flags."""
+    efap = read_table('efap_cleaned', columns=['efap_id', 'has_pantry_access', 'has_kitchen_access',
+                                               'weekend_available', 'weekday_available'])
+    sites = read_table('efap_nta_mapping').merge(efap, on='efap_id', how='left')
+    return sites.dropna(subset=['lat', 'lon']).reset_index(drop=True)
+
+
+def nta_origins(path=PRIORITIZATION_RAW):
+    """NTA reference points ('Latitude (generated)' / 'Longitude (generated)') from the prioritization file."""
+    raw = read_raw('prioritization_raw', path, columns=['NTA', 'Latitude (generated)', 'Longitude (generated)'])
+    return raw.rename(columns={'NTA': 'nta_id', 'Latitude (generated)': 'lat',
+                               'Longitude (generated)': 'lon'}).dropna(subset=['lat', 'lon'])
+
+
+class SiteTrees:
+    """KD-trees over all sites and over each subset in SUBSETS."""
+
+    def __init__(self, sites):
+        self.sites = sites.reset_index(drop=True)
+        points = project_km(self.sites['lat'], self.sites['lon'])
+        self.trees = {'all': (cKDTree(points), np.arange(len(points)))}
+        for name, column in SUBSETS.items():
+            members = np.flatnonzero(self.sites[column].fillna(0).to_numpy() == 1)
+            if len(members):
+                self.trees[name] = (cKDTree(points[members]), members)
+
+    def knn(self, origins, k=3, subset='all'):
+        """(distances km, site row positions), both (n, k); inf / -1 when the subset has fewer than k sites."""
+        tree, members = self.trees[subset]
+        distances, positions = tree.query(origins, k=k, workers=-1)
+        distances = distances.reshape(len(origins), k)
+        positions = positions.reshape(len(origins), k)
+        found = positions < len(members)
+        return distances, np.where(found, members[np.minimum(positions, len(members) - 1)], -1)
+
+    def nearest_km(self, origins, subset):
+        if subset not in self.trees:
+            return np.full(len(origins), np.inf)
+        return self.knn(origins, 1, subset)[0][:, 0]
+
+    def count_within(self, origins, radius_km, subset='all'):
+        if subset not in self.trees:
+            return np.zeros(len(origins), dtype=np.int64)
+        return self.trees[subset][0].query_ball_point(origins, radius_km, return_length=True, workers=-1)
+
+
+def access_metrics(trees, lat, lon, k=3, radii=RADII_KM, count_subsets=('all', 'weekend')):
+    """Access metrics for every origin point, as a frame aligned with lat/lon."""
+    origins = project_km(lat, lon)
+    distances, positions = trees.knn(origins, k)
+    site_ids = trees.sites['efap_id'].to_numpy()
+    metrics = {}
+    for j in range(k):
+        metrics[f'site_{j + 1}_efap_id'] = np.where(positions[:, j] >= 0, site_ids[positions[:, j]], -1)
+        metrics[f'site_{j + 1}_km'] = distances[:, j]
+    for subset in SUBSETS:
+        metrics[f'nearest_{subset}_km'] = trees.nearest_km(origins, subset)
+    for subset in count_subsets:
+        prefix = 'sites' if subset == 'all' else f'{subset}_sites'
+        for radius in radii:
+            metrics[f'{prefix}_within_{radius:g}km'] = trees.count_within(origins, radius, subset)
+    return pd.DataFrame(metrics)
+
+
+def nta_access(trees=None, k=3, radii=RADII_KM):
+    """access_metrics for every NTA reference point, keyed by nta_id."""
+    trees = trees if trees is not None else SiteTrees(load_sites())
+    origins = nta_origins()
+    metrics = access_metrics(trees, origins['lat'], origins['lon'], k, radii)
+    return pd.concat([origins.reset_index(drop=True), metrics], axis=1)
+
+
+def benchmark(trees, n_points=100_000, seed=0):
+    """Time access_metrics on random points inside the sites' bounding box."""
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(trees.sites['lat'].min(), trees.sites['lat'].max(), n_points)
+    lon = rng.uniform(trees.sites['lon'].min(), trees.sites['lon'].max(), n_points)
+    start = time.perf_counter()
+    access_metrics(trees, lat, lon)
+    return {'origins': n_points, 'sites': len(trees.sites), 'seconds': round(time.perf_counter() - start, 3)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Distance-based EFAP access metrics per NTA (or random origins).')
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--radii', type=float, nargs='+', default=list(RADII_KM))
+    parser.add_argument('--output', help='write the per-NTA metrics to this csv')
+    parser.add_argument('--benchmark', type=int, default=0, metavar='N', help='time N random origins')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    trees = SiteTrees(load_sites())
+    print(f"Built trees over {len(trees.sites)} sites in {time.perf_counter() - start:.3f}s")
+
+    if args.benchmark:
+        print(benchmark(trees, args.benchmark))
+    else:
+        access = nta_access(trees, args.k, args.radii)
+        if args.output:
+            access.to_csv(args.output, index=False)
+            print(f"Saved access metrics for {len(access)} NTAs to {args.output}")
+        else:
+            print(access.describe().T.to_string())
@@ -0,0 +1,218 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from config import DATA_DIR, DIM_MAP_CLEAN
+from schemas import read_table
+
+# -----------------------------
+# CDTA -> NTA apportionment
+# Shelter counts are only reported per community district (CDTA) while sites
+# and prioritization are per NTA. A sparse (n_cdta x n_nta) matrix holds the
+# share of each CDTA's count that goes to each of its NTAs (each row sums
+# to 1): equal shares, shares by land area computed from the_geom_wkt, or
+# shares by a population column. Apportioning every month and facility
+# type is then one sparse product. Matrices are cached in data/cache/apportion
+# keyed by the crosswalk and the inputs of its weights (geometries or
+# population), so a cache hit never parses a polygon.
+# -----------------------------
+
+CACHE_DIR = DATA_DIR / 'cache' / 'apportion'
+METHODS = ['equal', 'area', 'population']
+
+
+class Apportionment:
+    def __init__(self, matrix, cdta_ids, nta_ids, method):
+        self.matrix = matrix.tocsr()        # (n_cdta, n_nta) shares, rows sum to 1
+        self.cdta_ids = list(cdta_ids)
+        self.nta_ids = list(nta_ids)
+        self.method = method
+
+    def apportion(self, values, cdta_ids, check=True):
+        """Split per-CDTA values (n_cdta, ...) into per-NTA values (n_nta, ...).
+
+        cdta_ids labels the first axis of `values`; any trailing axes (months,
+        facility types) are carried along in the same sparse product. CDTAs
+        without NTAs in the crosswalk cannot be apportioned: they are dropped,
+        with a warning naming them when `check` is set, and check_totals only
+        covers the CDTAs that were apportioned.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        rows = pd.Index(self.cdta_ids).get_indexer(cdta_ids)
+        aligned = np.zeros((len(self.cdta_ids),) + values.shape[1:])
+        known = rows >= 0
+        aligned[rows[known]] = values[known]
+        # NaN (a month without a report) stays NaN for every NTA of the district
+        flat = aligned.reshape(len(self.cdta_ids), -1)
+        result = (self.matrix.T @ flat).reshape((len(self.nta_ids),) + values.shape[1:])
+        if check:
+            if not known.all():
+                unmapped = sorted(set(np.asarray(cdta_ids)[~known].tolist()))
+                warnings.warn(f"{len(unmapped)} CDTAs have no NTAs in the crosswalk and were not apportioned: "
+                              f"{unmapped}", stacklevel=2)
+            check_totals(values[known], result)
+        return result
+
+    def save(self, key, path=CACHE_DIR):
+        os.makedirs(path, exist_ok=True)
+        sparse.save_npz(os.path.join(path, f'{key}.npz'), self.matrix)
+        with open(os.path.join(path, f'{key}.json'), 'w') as f:
+            json.dump({'cdta_ids': self.cdta_ids, 'nta_ids': self.nta_ids, 'method': self.method}, f)
+
+    @classmethod
+    def load(cls, key, path=CACHE_DIR):
+        matrix_path = os.path.join(path, f'{key}.npz')
+        if not os.path.exists(matrix_path):
+            return None
+        with open(os.path.join(path, f'{key}.json')) as f:
+            axes = json.load(f)
+        return cls(sparse.load_npz(matrix_path), axes['cdta_ids'], axes['nta_ids'], axes['method'])
+
+
+def check_totals(cdta_values, nta_values, rtol=1e-9):
+    """Raise ValueError when the apportioned values do not add up to the district values."""
+    expected = np.nansum(cdta_values, axis=0)
+    actual = np.nansum(nta_values, axis=0)
+    if not np.allclose(expected, actual, rtol=rtol, atol=1e-6):
+        worst = np.max(np.abs(expected - actual))
+        raise ValueError(f"Apportionment does not preserve totals (largest difference {worst:.6g})")
+
+
+# -----------------------------
+# Weights
+# -----------------------------
+
+def _ring_area(ring):
+    x, y = ring[:, 0], ring[:, 1]
+    return abs(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y)) / 2
+
+
+def wkt_area_km2(wkt):
+    """Planar area of a WKT (multi)polygon in lon/lat degrees, in km2 (holes subtracted)."""
+    from spatial_join import parse_wkt_multipolygon
+    if not isinstance(wkt, str):
+        return np.nan
+    degrees = 0.0
+    latitudes = []
+    for polygon in parse_wkt_multipolygon(wkt):
+        degrees += _ring_area(polygon[0]) - sum(_ring_area(hole) for hole in polygon[1:])
+        latitudes.append(polygon[0][:, 1].mean())
+    km_per_degree = 111.195
+    return degrees * km_per_degree ** 2 * np.cos(np.radians(np.mean(latitudes)))
+
+
+def nta_weights(dim_map, method='equal', population=None):
+    """Unnormalized weight per NTA row of dim_map."""
+    if method == 'equal':
+        return np.ones(len(dim_map))
+    if method == 'area':
+        if 'the_geom_wkt' not in dim_map or dim_map['the_geom_wkt'].isna().all():
+            raise ValueError("Area weights need the_geom_wkt in dim_map (build dim_map.csv from the NTA file)")
+        return dim_map['the_geom_wkt'].map(wkt_area_km2).to_numpy(dtype=float)
+    if method == 'population':
+        if population is None:
+            raise ValueError("Population weights need a population column or an nta_id-indexed Series")
+        if isinstance(population, str):
+            return dim_map[population].to_numpy(dtype=float)
+        return pd.Series(population).reindex(dim_map['nta_id']).to_numpy(dtype=float)
+    raise ValueError(f"Unknown apportionment method {method!r}; expected one of {METHODS}")
+
+
+def cache_key(dim_map, method, population=None):
+    """Hash of the crosswalk and the inputs of the weights (not the weights: area weights parse every polygon)."""
+    digest = hashlib.sha256(method.encode())
+    digest.update('|'.join(dim_map['nta_id'].astype(str) + ':' + dim_map['cdta_id'].astype(str)).encode())
+    if method == 'area' and 'the_geom_wkt' in dim_map:
+        digest.update('|'.join(dim_map['the_geom_wkt'].astype(str)).encode())
+    elif method == 'population' and population is not None:
+        values = (dim_map[population] if isinstance(population, str)
+                  else pd.Series(population).reindex(dim_map['nta_id']))
+        digest.update(np.ascontiguousarray(np.nan_to_num(values.to_numpy(dtype=float), nan=-1)).tobytes())
+    return digest.hexdigest()[:24]
+
+
+def build_apportionment(dim_map, method='equal', population=None, use_cache=True, cache_dir=CACHE_DIR):
+    """Sparse CDTA x NTA share matrix for a dim_map crosswalk (nta_id, cdta_id[, the_geom_wkt]).
+
+    NTAs with a missing or non-positive weight get nothing; a district whose
+    NTAs all lack weights falls back to equal shares so its count is not lost.
+    The weights are only computed when the matrix is not cached.
+    """
+    dim_map = dim_map.dropna(subset=['cdta_id']).sort_values('nta_id').reset_index(drop=True)
+    key = cache_key(dim_map, method, population)
+    if use_cache:
+        cached = Apportionment.load(key, cache_dir)
+        if cached is not None:
+            return cached
+
+    weights = nta_weights(dim_map, method, population)
+    weights = np.where(np.isfinite(weights) & (weights > 0), weights, 0.0)
+    cdta_codes, cdta_ids = pd.factorize(dim_map['cdta_id'], sort=True)
+    district_totals = np.bincount(cdta_codes, weights=weights, minlength=len(cdta_ids))
+    unweighted = district_totals[cdta_codes] == 0
+    weights[unweighted] = 1.0
+    district_totals = np.bincount(cdta_codes, weights=weights, minlength=len(cdta_ids))
+
+    shares = weights / district_totals[cdta_codes]
+    matrix = sparse.csr_matrix((shares, (cdta_codes, np.arange(len(dim_map)))),
+                               shape=(len(cdta_ids), len(dim_map)))
+    result = Apportionment(matrix, cdta_ids, dim_map['nta_id'], method)
+    if use_cache:
+        result.save(key, cache_dir)
+    return result
+
+
+def load_dim_map():
+    """dim_map.csv, or placeholder rows (no geometry) from the NTA ids in use when it has not been built."""
+    if os.path.exists(DIM_MAP_CLEAN):
+        return read_table('dim_map')
+    from load_sqlite import _dim_map_from_ids
+    nta_ids = pd.concat([read_table('prioritization_clean', columns=['nta_id'])['nta_id'],
+                         read_table('efap_nta_mapping', columns=['nta_id'])['nta_id']])
+    return _dim_map_from_ids(nta_ids)
+
+
+def apportion_panel(panel, apportionment):
+    """(n_nta, n_months, n_facilities) NTA-level cube from a ShelterPanel in one sparse product."""
+    return apportionment.apportion(panel.values, panel.districts)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Apportion the shelter census from community districts to NTAs.')
+    parser.add_argument('--method', default='equal', choices=METHODS)
+    parser.add_argument('--population', help='dim_map column with NTA population (for --method population)')
+    parser.add_argument('--output', help='write the long NTA x month x facility table to this csv')
+    parser.add_argument('--no-cache', action='store_true')
+    args = parser.parse_args()
+
+    from panel import ShelterPanel, build_and_save
+    from config import SHELTER_PANEL_DIR
+    panel = (ShelterPanel.load() if os.path.exists(SHELTER_PANEL_DIR / 'values.npy') else build_and_save())
+
+    start = time.perf_counter()
+    apportionment = build_apportionment(load_dim_map(), args.method, args.population, use_cache=not args.no_cache)
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    nta_values = apportion_panel(panel, apportionment)
+    product = time.perf_counter() - start
+
+    unmapped = sorted(set(panel.districts) - set(apportionment.cdta_ids))
+    print(f"{apportionment.matrix.shape[0]} CDTAs x {apportionment.matrix.shape[1]} NTAs, "
+          f"{apportionment.matrix.nnz} weights ({args.method}); matrix {built * 1000:.1f}ms, "
+          f"apportioning {len(panel.months)} months x {len(panel.facilities)} types {product * 1000:.2f}ms")
+    print("Totals preserved for every district in the crosswalk")
+    if unmapped:
+        print(f"Districts without NTAs in dim_map (not apportioned): {unmapped}")
+
+    if args.output:
+        frame = pd.Series(nta_values.reshape(-1), name='value', index=pd.MultiIndex.from_product(
+            [apportionment.nta_ids, panel.months, panel.facilities], names=['nta_id', 'date_id', 'facility']))
+        frame.reset_index().to_csv(args.output, index=False)
+        print(f"Saved {len(frame)} rows to {args.output}")
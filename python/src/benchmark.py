@@ -0,0 +1,280 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import create_schema
+from config import BENCHMARK_BASELINE
+from schemas import read_raw
+from synthetic import generate, site_points
+
+# -----------------------------
+# Scaling benchmarks for the whole pipeline
+# Generates synthetic raw files at each scale, runs every stage on them and
+# records wall time, peak Python/numpy memory (tracemalloc) and rows in/out
+# per stage. Results are compared with a JSON baseline and a stage is
+# flagged when it is slower or hungrier than the baseline by more than the
+# tolerance.
+#
+# Wall time is the median of several runs of the stage (at least
+# MIN_REPEATS, short stages up to REPEATS within REPEAT_BUDGET seconds), and
+# a stage that still comes out slower than the baseline is timed a second
+# time before it is flagged. Memory peaks repeat exactly, but on a shared
+# machine the times of unchanged code drift by up to ~40% between runs, so
+# times get a wider tolerance plus a noise term: the spread of the timed
+# runs (now or in the baseline, whichever is larger) and MIN_SECONDS of
+# timer jitter. The baseline holds absolute times of the machine it was
+# recorded on; re-record it (--save-baseline) on the machine that runs the
+# gate. Entries recorded before the spread was stored are stale and not
+# compared; without a baseline nothing is gated. Wall time and memory are
+# measured in separate passes because tracing allocations slows the
+# pure-Python stages down.
+#
+# 1000x takes 10+ minutes and is opt-in (--scales 1000).
+# -----------------------------
+
+SCALES = [1, 10, 100]
+REPEATS = 5
+MIN_REPEATS = 3
+REPEAT_BUDGET = 3.0     # seconds a stage may spend on repeats beyond MIN_REPEATS
+TOLERANCE = 0.5             # allowed slowdown
+MEMORY_TOLERANCE = 0.25     # allowed growth of the peak
+MIN_SECONDS = 0.01          # timer and scheduler jitter added to the spread of the runs
+MIN_MB = 1.0                # memory differences below this are never regressions
+MEMORY_MAX_SCALE = 100      # tracemalloc's own bookkeeping at 1000x outgrows a 5 GB machine
+
+
+def _quiet(fn, *args):
+    """Run a cleaning function with its summary prints discarded (diagnostics stay off unless VERBOSE)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args)
+
+
+# -----------------------------
+# Stages: each takes the shared context, stores its output and returns (rows in, rows out)
+# -----------------------------
+
+def stage_clean_prioritization(ctx):
+    raw = read_raw('prioritization_raw', ctx['paths']['prioritization'])
+    ctx['prioritization'] = _quiet(create_schema.clean_prioritization, raw)
+    return len(raw), len(ctx['prioritization'])
+
+
+def stage_clean_shelter_census(ctx):
+    raw = read_raw('shelter_census_raw', ctx['paths']['census'])
+    ctx['census'] = _quiet(create_schema.clean_shelter_census, raw)
+    return len(raw), len(ctx['census'])
+
+
+def stage_clean_nta(ctx):
+    raw = read_raw('nta_raw', ctx['paths']['nta'])
+    ctx['dim_map'] = _quiet(create_schema.clean_nta, raw)
+    return len(raw), len(ctx['dim_map'])
+
+
+def stage_clean_efap(ctx):
+    ctx['efap_raw'] = read_raw('efap_raw', ctx['paths']['efap'])
+    ctx['efap'] = _quiet(create_schema.clean_efap, ctx['efap_raw'].copy())
+    return len(ctx['efap_raw']), len(ctx['efap'])
+
+
+def stage_schedule_parsing(ctx):
+    from schedule import schedule_frame
+    schedules = schedule_frame(ctx['efap_raw'])
+    return len(ctx['efap_raw']), len(schedules)
+
+
+def stage_spatial_join(ctx):
+    from spatial_join import NTAIndex, build_efap_nta_mapping
+    lat, lon = site_points(len(ctx['efap']), np.random.default_rng(0))
+    sites = pd.DataFrame({'efap_id': ctx['efap']['efap_id'], 'lat': lat, 'lon': lon})
+    ctx['mapping'] = build_efap_nta_mapping(sites, NTAIndex(ctx['dim_map']))
+    return len(sites), len(ctx['mapping'])
+
+
+def stage_aggregation(ctx):
+    from apportion import build_apportionment
+    from panel import build_panel
+    panel = build_panel(ctx['census'])
+    apportionment = build_apportionment(ctx['dim_map'], 'area', use_cache=False)
+    nta_values = apportionment.apportion(panel.values, panel.districts)
+    return len(ctx['census']), int(np.prod(nta_values.shape))
+
+
+def stage_sqlite_load(ctx):
+    from load_sqlite import build_tables, load_star_schema
+    tables = build_tables(ctx['prioritization'], ctx['census'], ctx['efap'], ctx['mapping'], ctx['dim_map'])
+    db_path = os.path.join(ctx['workdir'], 'benchmark.db')
+    stats = load_star_schema(db_path, tables)
+    return sum(len(df) for df in tables.values()), sum(stats['rows'].values())
+
+
+STAGES = [
+    ('clean_prioritization', stage_clean_prioritization),
+    ('clean_shelter_census', stage_clean_shelter_census),
+    ('clean_nta', stage_clean_nta),
+    ('clean_efap', stage_clean_efap),
+    ('schedule_parsing', stage_schedule_parsing),
+    ('spatial_join', stage_spatial_join),
+    ('aggregation', stage_aggregation),
+    ('sqlite_load', stage_sqlite_load),
+]
+
+
+# -----------------------------
+# Running and comparing
+# -----------------------------
+
+def time_stage(stage, ctx, repeats=REPEATS, budget=REPEAT_BUDGET):
+    """(median seconds, spread, runs, rows in, rows out).
+
+    Runs the stage at least MIN_REPEATS times (fewer only if `repeats` is
+    lower), then keeps rerunning it until `repeats` runs or `budget` seconds.
+    spread is the fastest-to-slowest range of the runs.
+    """
+    timings = []
+    while len(timings) < repeats and (len(timings) < MIN_REPEATS or sum(timings) < budget):
+        start = time.perf_counter()
+        rows_in, rows_out = stage(ctx)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), max(timings) - min(timings), len(timings), rows_in, rows_out
+
+
+def exceeds(old, new, allowed, floor):
+    return new > old * (1 + allowed) and new - old > floor
+
+
+def slower(previous, seconds, spread, allowed):
+    """True when `seconds` is slower than the baseline entry by more than `allowed` plus the timing noise."""
+    noise = max(spread, previous['spread']) + MIN_SECONDS
+    return seconds > previous['seconds'] * (1 + allowed) + noise
+
+
+def run_scale(scale, memory=True, seed=0, repeats=REPEATS, baseline=None, tolerance=TOLERANCE):
+    """{stage: {'seconds', 'spread', 'runs', 'peak_mb', 'rows_in', 'rows_out'}} for one scale.
+
+    baseline -- this scale's baseline results; a stage slower than it is
+                timed a second time and the faster median kept, so a burst
+                of load on the machine does not read as a regression
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        paths = generate(scale, workdir, seed)
+        results = {'generate': {'seconds': round(time.perf_counter() - start, 4)}}
+
+        ctx = {'paths': paths, 'workdir': workdir}
+        for name, stage in STAGES:
+            seconds, spread, runs, rows_in, rows_out = time_stage(stage, ctx, repeats)
+            previous = (baseline or {}).get(name)
+            if previous is not None and 'spread' in previous and slower(previous, seconds, spread, tolerance):
+                retimed, respread, more, _, _ = time_stage(stage, ctx, repeats)
+                if retimed < seconds:
+                    seconds, spread = retimed, respread
+                runs += more
+            results[name] = {'seconds': round(seconds, 4), 'spread': round(spread, 4), 'runs': runs,
+                             'rows_in': int(rows_in), 'rows_out': int(rows_out)}
+
+        if memory and scale <= MEMORY_MAX_SCALE:
+            ctx = {'paths': paths, 'workdir': workdir}
+            for name, stage in STAGES:
+                tracemalloc.start()
+                stage(ctx)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                results[name]['peak_mb'] = round(peak / 2**20, 2)
+    return results
+
+
+def compare(current, baseline, tolerance=TOLERANCE, memory_tolerance=MEMORY_TOLERANCE):
+    """List of regressions: (scale, stage, metric, baseline value, current value)."""
+    regressions = []
+    for scale, stages in current.items():
+        for stage, metrics in stages.items():
+            previous = baseline.get(scale, {}).get(stage)
+            # generating the synthetic files is not part of the pipeline; entries
+            # without a spread were timed by the old single-run method
+            if previous is None or stage == 'generate' or 'spread' not in previous:
+                continue
+            if 'seconds' in previous and slower(previous, metrics['seconds'], metrics.get('spread', 0.0), tolerance):
+                regressions.append((scale, stage, 'seconds', previous['seconds'], metrics['seconds']))
+            if 'peak_mb' in metrics and 'peak_mb' in previous:
+                if exceeds(previous['peak_mb'], metrics['peak_mb'], memory_tolerance, MIN_MB):
+                    regressions.append((scale, stage, 'peak_mb', previous['peak_mb'], metrics['peak_mb']))
+    return regressions
+
+
+def environment():
+    return {'python': platform.python_version(), 'machine': platform.machine(),
+            'cpus': os.cpu_count(), 'pandas': pd.__version__, 'numpy': np.__version__}
+
+
+def load_baseline(path=BENCHMARK_BASELINE, meta=False):
+    if not os.path.exists(path):
+        return ({}, {}) if meta else {}
+    with open(path) as f:
+        stored = json.load(f)
+    return (stored['results'], stored['meta']) if meta else stored['results']
+
+
+def save_baseline(results, path=BENCHMARK_BASELINE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    meta = {**environment(), 'repeats': REPEATS, 'min_repeats': MIN_REPEATS, 'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    with open(path, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2, sort_keys=True)
+
+
+def format_table(results):
+    rows = []
+    for scale, stages in results.items():
+        for stage, metrics in stages.items():
+            rows.append({'scale': f'{scale}x', 'stage': stage, **metrics})
+    return pd.DataFrame(rows).to_string(index=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time every pipeline stage on synthetic data at several scales.')
+    parser.add_argument('--scales', type=int, nargs='+', default=SCALES, help='e.g. 1 10 100 (add 1000 for the 10+ minute run)')
+    parser.add_argument('--baseline', default=BENCHMARK_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='allowed slowdown (0.5 = 50%%)')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--repeats', type=int, default=REPEATS, help='timed runs per stage (the median is kept)')
+    args = parser.parse_args()
+
+    baseline, baseline_meta = load_baseline(args.baseline, meta=True)
+    if not baseline:
+        print(f"No baseline in {args.baseline}; nothing is gated until one is recorded with --save-baseline")
+    changed = {k: (baseline_meta[k], v) for k, v in environment().items() if baseline_meta.get(k, v) != v}
+    if changed:
+        print(f"Warning: the baseline was recorded in another environment {changed}; "
+              f"its times may not be comparable (re-record it with --save-baseline)")
+
+    results = {}
+    for scale in args.scales:
+        start = time.perf_counter()
+        results[str(scale)] = run_scale(scale, memory=not args.no_memory, repeats=args.repeats,
+                                        baseline=baseline.get(str(scale)), tolerance=args.tolerance)
+        print(f"{scale}x done in {time.perf_counter() - start:.1f}s", flush=True)
+    print(format_table(results))
+
+    regressions = compare(results, baseline, args.tolerance)
+    for scale, stage, metric, old, new in regressions:
+        print(f"REGRESSION {scale}x {stage} {metric}: {old} -> {new}")
+
+    if args.save_baseline:
+        merged = dict(baseline)
+        merged.update(results)
+        save_baseline(merged, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+    elif regressions:
+        sys.exit(1)
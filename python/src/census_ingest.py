@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+
+from config import CLEAN_DIR, SHELTER_CENSUS_RAW, SHELTER_CENSUS_CLEAN
+from schemas import SchemaDriftError, enforce, validate_header
+
+# -----------------------------
+# Streaming, incremental ingestion of the DHS Individual Census
+# The raw export grows by ~60 rows a month but create_schema.py reads every
+# column as text and re-parses the whole history on each run. Here only the
+# six columns we keep are read, with explicit dtypes and thousands-separator
+# parsing done by the CSV reader, in fixed-size chunks. In incremental mode
+# only report dates newer than the last ingested month are read and written
+# in front of the stored months, where a full rebuild would put them. Chunks
+# are checked against the shelter_census_clean schema (schemas.py) before
+# they are written.
+# -----------------------------
+
+STATE_PATH = CLEAN_DIR / '.census_ingest_state.json'
+CHUNKSIZE = 50_000
+
+# raw column -> clean column, in output order
+COLUMNS = {
+    'Report Date': 'report_date',
+    'Borough': 'borough',
+    'Community Districts': 'community_districts',
+    'Family with Children Commercial Hotel': 'family_with_children_commercial_hotel',
+    'Family with Children Shelter': 'family_with_children_shelter',
+    'Family Cluster': 'family_cluster',
+}
+
+DTYPES = {
+    'Report Date': str,
+    'Borough': str,
+    'Community Districts': 'float64',
+    'Family with Children Commercial Hotel': 'float64',
+    'Family with Children Shelter': 'float64',
+    'Family Cluster': 'float64',
+}
+
+
+def read_census_chunks(raw_path=SHELTER_CENSUS_RAW, chunksize=CHUNKSIZE):
+    """Yield cleaned shelter census chunks (same columns and values as clean_shelter_census)."""
+    validate_header('shelter_census_raw', raw_path)
+    reader = pd.read_csv(raw_path, usecols=list(COLUMNS), dtype=DTYPES, thousands=',', chunksize=chunksize)
+    for chunk in reader:
+        chunk = chunk[list(COLUMNS)].rename(columns=COLUMNS)
+        dates = pd.to_datetime(chunk['report_date'], format='%m/%d/%Y', errors='coerce')
+        if (dates.isna() & chunk['report_date'].notna()).any():
+            bad = chunk.loc[dates.isna() & chunk['report_date'].notna(), 'report_date'].unique()[:5].tolist()
+            raise SchemaDriftError(f"shelter_census_raw: Report Date not in %m/%d/%Y format, e.g. {bad}")
+        chunk['report_date'] = dates
+        yield enforce(chunk, 'shelter_census_clean')
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_PATH):
+    with open(path, 'w') as f:
+        json.dump(state, f, indent=2)
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return [os.path.basename(path), stat.st_size, stat.st_mtime_ns]
+
+
+def last_ingested_date(store_path=SHELTER_CENSUS_CLEAN, state_path=STATE_PATH):
+    """Newest report_date already in the store (from the state file, else by scanning one column)."""
+    if not os.path.exists(store_path):
+        return None
+    state = load_state(state_path)
+    # the state is only trusted if nothing else rewrote the store since
+    if state and state.get('store_signature') == _signature(store_path):
+        return pd.Timestamp(state['last_report_date'])
+    dates = pd.read_csv(store_path, usecols=['report_date'], parse_dates=['report_date'])['report_date']
+    return dates.max() if len(dates) else None
+
+
+def _write_rows(out, raw_path, chunksize, watermark=None):
+    """Write the rows newer than watermark (every row when None) in raw order.
+
+    Returns (rows read, rows written, newest date written), or None when an
+    incremental read finds the export out of newest-first order.
+    """
+    rows_read, rows_written, newest, reached_old = 0, 0, None, False
+    previous_last = None        # last date of the previous chunk: the order must hold across chunks too
+    for chunk in read_census_chunks(raw_path, chunksize):
+        rows_read += len(chunk)
+        if watermark is None:
+            new = chunk
+        else:
+            dates = chunk['report_date']
+            if not dates.is_monotonic_decreasing or (previous_last is not None and dates.iloc[0] > previous_last):
+                return None
+            previous_last = dates.iloc[-1]
+            new = chunk[dates > watermark]
+            reached_old = len(new) < len(chunk)
+        if len(new):
+            new.to_csv(out, header=(rows_written == 0), index=False)
+            rows_written += len(new)
+            newest = new['report_date'].max() if newest is None else max(newest, new['report_date'].max())
+        if reached_old:
+            break
+    return rows_read, rows_written, newest
+
+
+def ingest_census(raw_path=SHELTER_CENSUS_RAW, store_path=SHELTER_CENSUS_CLEAN, full=False,
+                  chunksize=CHUNKSIZE, state_path=STATE_PATH):
+    """Load the shelter census into the clean store; returns ingest stats.
+
+    full=False adds only months newer than the store's last report_date. The
+    DHS export is sorted newest first, so reading stops at the first chunk
+    that reaches already-ingested months and the new rows go in front of the
+    stored ones, where a full rebuild puts them. If the export is not in that
+    order the store is rebuilt in full instead. Revisions to already-ingested
+    months are not picked up incrementally - run with full=True for that.
+
+    The raw header is validated before anything is written, and the store is
+    rewritten through a temporary file that only replaces it on success.
+    """
+    start = time.perf_counter()
+    validate_header('shelter_census_raw', raw_path)
+    watermark = None if full else last_ingested_date(store_path, state_path)
+    full = watermark is None
+
+    tmp_path = f'{store_path}.tmp'
+    try:
+        with open(tmp_path, 'w', newline='') as out:
+            result = _write_rows(out, raw_path, chunksize, watermark)
+            if result is None:
+                # not newest first: rebuild rather than guess where the rows go
+                out.seek(0)
+                out.truncate()
+                full = True
+                result = _write_rows(out, raw_path, chunksize, None)
+            rows_read, rows_written, newest = result
+            if not full and rows_written:
+                with open(store_path, newline='') as store:
+                    store.readline()
+                    shutil.copyfileobj(store, out)
+        if full or rows_written:
+            os.replace(tmp_path, store_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    if watermark is not None and (newest is None or newest < watermark):
+        newest = watermark
+    if newest is not None:
+        save_state({'store_signature': _signature(store_path), 'last_report_date': str(newest.date())}, state_path)
+    return {
+        'mode': 'full' if full else 'incremental',
+        'previous_last_date': None if watermark is None else str(watermark.date()),
+        'last_date': None if newest is None else str(newest.date()),
+        'rows_read': rows_read,
+        'rows_written': rows_written,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Chunked, incremental ingestion of the DHS shelter census.')
+    parser.add_argument('--full', action='store_true', help='rebuild the store from the whole raw file')
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    args = parser.parse_args()
+
+    for key, value in ingest_census(full=args.full, chunksize=args.chunksize).items():
+        print(f"{key}: {value}")
@@ -0,0 +1,167 @@
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from config import DATA_DIR
+from instrument import rss_mb
+from schemas import SCHEMAS, read_table
+
+# -----------------------------
+# Columnar cache for the cleaned tables
+# Every consumer re-parses the cleaned CSVs and re-infers dtypes (and
+# re-parses report_date). Next to each CSV the pipeline also writes an
+# uncompressed Arrow IPC (Feather v2) file with the dtypes stored, which can
+# be memory-mapped and read column by column. schemas.read_table serves the
+# cleaned tables from this cache whenever it is at least as new as the csv,
+# so every reader of the registry gets it without code changes.
+# -----------------------------
+
+CACHE_DIR = DATA_DIR / 'cache' / 'columnar'
+
+# table name -> csv path; dtypes come from the schema registry (schemas.py)
+TABLES = {name: SCHEMAS[name].path
+          for name in ['prioritization_clean', 'shelter_census_clean', 'efap_cleaned', 'efap_nta_mapping', 'dim_map']}
+
+
+def cache_path(name):
+    return CACHE_DIR / f'{name}.arrow'
+
+
+def table_for_csv(path):
+    """Name of the cached table backed by a given csv path, or None."""
+    for name, csv_path in TABLES.items():
+        if os.path.abspath(csv_path) == os.path.abspath(path):
+            return name
+    return None
+
+
+def read_csv_table(name, columns=None):
+    return read_table(name, columns=columns, cache=False)
+
+
+def write_cache(name, df=None):
+    """Write (or refresh) the Arrow file for one table from a frame or its csv."""
+    if df is None:
+        df = read_csv_table(name)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # uncompressed so the file can be memory-mapped without decoding
+    tmp = cache_path(name).with_suffix('.arrow.tmp')
+    feather.write_feather(table, tmp, compression='uncompressed')
+    os.replace(tmp, cache_path(name))
+    return cache_path(name)
+
+
+def is_fresh(name):
+    csv_path = TABLES[name]
+    path = cache_path(name)
+    return path.exists() and (not csv_path.exists() or path.stat().st_mtime_ns >= csv_path.stat().st_mtime_ns)
+
+
+def _mapped(name, columns=None):
+    """Memory-mapped pyarrow.Table of the cache, or None when it is missing, stale or lacks a column."""
+    if name not in TABLES or not is_fresh(name):
+        return None
+    table = feather.read_table(cache_path(name), memory_map=True)
+    columns = table.column_names if columns is None else list(columns)
+    if any(c not in table.column_names for c in columns):
+        return None     # written before the registry gained a column
+    return table.select(columns)
+
+
+def read_cached(name, columns=None):
+    """DataFrame from the Arrow cache, or None when the csv has to be read instead."""
+    table = _mapped(name, columns)
+    return None if table is None else table.to_pandas()
+
+
+def load_table(name, columns=None, as_arrow=False):
+    """Load a cleaned table, memory-mapping its Arrow cache when it is fresh.
+
+    columns  -- optional list of columns; only those are read
+    as_arrow -- return the memory-mapped pyarrow.Table instead of a DataFrame
+    Falls back to the csv when the cache is missing or older than the csv.
+    """
+    table = _mapped(name, columns)
+    if table is None:
+        df = read_csv_table(name, columns)
+        return pa.Table.from_pandas(df, preserve_index=False) if as_arrow else df
+    return table if as_arrow else table.to_pandas()
+
+
+def refresh_cache(paths):
+    """Rewrite the cache for every csv in `paths` that backs a cached table."""
+    written = []
+    for path in paths:
+        name = table_for_csv(path)
+        if name is not None and os.path.exists(path):
+            written.append(write_cache(name))
+    return written
+
+
+# -----------------------------
+# Benchmark: cold start in a fresh interpreter per method
+# -----------------------------
+
+def _measure(method, columns_json):
+    """Load every available table once and print elapsed seconds and resident memory growth."""
+    columns = json.loads(columns_json)
+    names = [name for name, csv_path in TABLES.items() if csv_path.exists()]
+    # warm up lazily imported reader code so only the table loads are measured
+    pd.read_csv(io.StringIO('a,b\n1,x\n'))
+    pa.Table.from_pandas(pd.DataFrame({'a': [1], 'b': ['x']})).to_pandas()
+    before = rss_mb()
+    start = time.perf_counter()
+    frames = {}
+    for name in names:
+        cols = columns.get(name)
+        if method == 'csv':
+            frames[name] = read_csv_table(name, cols)
+        elif method == 'arrow':
+            frames[name] = load_table(name, cols, as_arrow=True)
+        else:
+            frames[name] = load_table(name, cols)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'method': method, 'tables': len(names), 'seconds': round(elapsed, 4),
+                      'rss_growth_mb': round(rss_mb() - before, 2)}))
+
+
+def benchmark(columns=None):
+    """Compare csv, Arrow->pandas and raw memory-mapped Arrow loads, each in a fresh process."""
+    results = []
+    for method in ['csv', 'cache', 'arrow']:
+        out = subprocess.run([sys.executable, __file__, '--measure', method, json.dumps(columns or {})],
+                             capture_output=True, text=True, check=True, cwd=os.path.dirname(__file__))
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build and benchmark the Arrow cache of the cleaned tables.')
+    parser.add_argument('--build', action='store_true', help='(re)write the cache for every available table')
+    parser.add_argument('--benchmark', action='store_true', help='compare cold-start load time and memory vs csv')
+    parser.add_argument('--columns', default='{}',
+                        help='JSON {table: [columns]} to benchmark selective reads, e.g. \'{"shelter_census_clean": ["report_date"]}\'')
+    parser.add_argument('--measure', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        _measure(*args.measure)
+        raise SystemExit(0)
+    if args.build:
+        for name, csv_path in TABLES.items():
+            if csv_path.exists():
+                print(f"Cached {name} -> {write_cache(name)}")
+            else:
+                print(f"Skipped {name}: {csv_path} not found")
+    if args.benchmark:
+        for result in benchmark(json.loads(args.columns)):
+            print(result)
@@ -0,0 +1,48 @@
+from pathlib import Path
+
+# -----------------------------
+# Shared project paths
+# Everything is resolved relative to the repository so the scripts run the
+# same way on any machine (no more /Users/... paths).
+# -----------------------------
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DATA_DIR = REPO_ROOT / 'data'
+RAW_DIR = DATA_DIR / 'raw'
+CLEAN_DIR = DATA_DIR / 'clean'
+
+# Raw NYC Open Data exports
+PRIORITIZATION_RAW = RAW_DIR / 'Neighborhood Prioritization Map 2024.csv'
+SHELTER_CENSUS_RAW = RAW_DIR / 'Individual_Census.csv'
+NTA_RAW = RAW_DIR / '2020_Neighborhood_Tabulation_Areas_(NTAs).csv'
+EFAP_RAW = RAW_DIR / 'efap_raw.csv'
+
+# Cleaned outputs
+PRIORITIZATION_CLEAN = CLEAN_DIR / 'prioritization_clean.csv'
+SHELTER_CENSUS_CLEAN = CLEAN_DIR / 'shelter_census_clean.csv'
+DIM_MAP_CLEAN = CLEAN_DIR / 'dim_map.csv'
+EFAP_CLEAN = CLEAN_DIR / 'efap_cleaned.csv'
+EFAP_NTA_MAPPING = CLEAN_DIR / 'efap_nta_mapping.csv'
+EFAP_SCHEDULE = CLEAN_DIR / 'efap_schedule.csv'
+
+# SQLite star schema (sql/data_processing.sql) loaded from the cleaned outputs
+STAR_SCHEMA_DB = DATA_DIR / 'food_access.db'
+
+# Trained model artifacts
+MODEL_DIR = DATA_DIR / 'models'
+COVERAGE_MODEL = MODEL_DIR / 'coverage_model.joblib'
+
+# Dense district x month x facility-type panel of the shelter census (memory-mappable .npy files)
+SHELTER_PANEL_DIR = DATA_DIR / 'cache' / 'shelter_panel'
+
+# Scaling benchmark baseline (python/src/benchmark.py)
+BENCHMARK_BASELINE = REPO_ROOT / 'python' / 'benchmarks' / 'baseline.json'
+
+# Instrumentation reports of the cleaning runs (python/src/instrument.py)
+RUN_REPORT_DIR = DATA_DIR / 'reports'
+
+# Surrogate-keyed star schema and its key registries (python/src/create_schema2.py)
+PROCESSED_DIR = DATA_DIR / 'processed'
+
+# Simplified NTA geometries per zoom level for the map views (python/src/geo_tiles.py)
+GEO_TILE_DIR = DATA_DIR / 'cache' / 'geo_tiles'
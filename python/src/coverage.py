@@ -0,0 +1,250 @@
+import argparse
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from load_sqlite import DB_PATH, TABLE_ORDER, build_tables, load_star_schema, read_schema, table_columns, _rows
+
+# -----------------------------
+# Materialized food site coverage
+# fact_food_site_coverage holds, per nta_id x date_id, the pantry / kitchen /
+# weekday / weekend / total site counts, the sheltered population and the
+# coverage ratio (sites per 1,000 sheltered people). It is computed inside
+# SQLite from the dimension and shelter fact tables, and when the cleaned
+# csvs change only the affected rows are recomputed: the NTAs touched by
+# added, removed, edited or re-mapped EFAP sites, and the months whose
+# shelter census changed or is new.
+# -----------------------------
+
+PER_PEOPLE = 1000
+
+# primary / unique key of every synced table
+TABLE_KEYS = {
+    'dim_date': ['date_id'],
+    'dim_map': ['nta_id'],
+    'dim_cdta': ['cdta_id'],
+    'dim_program_schedule': ['efap_id'],
+    'bridge_efap_site_nta': ['efap_id', 'nta_id'],
+    'fact_neighborhood_prioritization': ['nta_id'],
+    'fact_agg_shelter_cdta_year': ['cdta_id', 'date_id'],
+}
+
+# The shelter census is by community district, so an NTA gets an even share
+# of its CDTA's sheltered people for the month.
+REFRESH_SQL = """
+INSERT OR REPLACE INTO fact_food_site_coverage (
+    nta_id, date_id, pantry_site_count, kitchen_site_count, total_sites,
+    weekend_site_count, weekday_site_count, sheltered_population, coverage_ratio)
+WITH sites AS (
+    SELECT b.nta_id,
+           SUM(s.has_pantry_access)  AS pantry,
+           SUM(s.has_kitchen_access) AS kitchen,
+           COUNT(*)                  AS total,
+           SUM(s.weekend_available)  AS weekend,
+           SUM(s.weekday_available)  AS weekday
+    FROM bridge_efap_site_nta b
+    JOIN dim_program_schedule s ON s.efap_id = b.efap_id
+    GROUP BY b.nta_id
+),
+ntas_per_cdta AS (
+    SELECT cdta_id, COUNT(*) AS ntas FROM dim_map GROUP BY cdta_id
+),
+shelter AS (
+    SELECT cdta_id, date_id,
+           COALESCE(family_with_children_commercial_hotel, 0)
+           + COALESCE(family_with_children_shelter, 0)
+           + COALESCE(family_cluster, 0) AS people
+    FROM fact_agg_shelter_cdta_year
+)
+SELECT m.nta_id, d.date_id,
+       COALESCE(s.pantry, 0), COALESCE(s.kitchen, 0), COALESCE(s.total, 0),
+       COALESCE(s.weekend, 0), COALESCE(s.weekday, 0),
+       sh.people * 1.0 / n.ntas,
+       CASE WHEN sh.people > 0 THEN COALESCE(s.total, 0) * {per_people}.0 * n.ntas / sh.people END
+FROM dim_map m
+JOIN ntas_per_cdta n ON n.cdta_id = m.cdta_id
+CROSS JOIN dim_date d
+LEFT JOIN sites s ON s.nta_id = m.nta_id
+LEFT JOIN shelter sh ON sh.cdta_id = m.cdta_id AND sh.date_id = d.date_id
+WHERE {where}
+"""
+
+
+# -----------------------------
+# Refreshing rows of the materialized table
+# -----------------------------
+
+def _scope_table(conn, name, column, values):
+    """Temp table holding the keys a refresh is restricted to (avoids SQL variable limits)."""
+    conn.execute(f'DROP TABLE IF EXISTS temp.{name}')
+    conn.execute(f'CREATE TEMP TABLE {name} ({column} PRIMARY KEY)')
+    conn.executemany(f'INSERT OR IGNORE INTO temp.{name} VALUES (?)', [(v,) for v in values])
+
+
+def refresh_coverage(conn, nta_ids=None, date_ids=None):
+    """Recompute coverage rows; all of them when no NTAs and no dates are given.
+
+    nta_ids  -- NTAs whose site counts changed (every month is refreshed for them)
+    date_ids -- months whose shelter numbers changed (every NTA is refreshed for them)
+    Rows of NTAs or months that no longer exist are deleted. Returns the
+    number of rows written.
+    """
+    conn.execute('DELETE FROM fact_food_site_coverage WHERE nta_id NOT IN (SELECT nta_id FROM dim_map) '
+                 'OR date_id NOT IN (SELECT date_id FROM dim_date)')
+    if nta_ids is None and date_ids is None:
+        where = '1'
+    else:
+        clauses = []
+        if nta_ids:
+            _scope_table(conn, 'coverage_ntas', 'nta_id', nta_ids)
+            clauses.append('m.nta_id IN (SELECT nta_id FROM temp.coverage_ntas)')
+        if date_ids:
+            _scope_table(conn, 'coverage_dates', 'date_id', date_ids)
+            clauses.append('d.date_id IN (SELECT date_id FROM temp.coverage_dates)')
+        if not clauses:
+            return 0
+        where = ' OR '.join(clauses)
+    return conn.execute(REFRESH_SQL.format(per_people=PER_PEOPLE, where=where)).rowcount
+
+
+# -----------------------------
+# Syncing the database with the cleaned tables
+# -----------------------------
+
+def diff_table(conn, table, df):
+    """Compare a frame with the rows stored in `table`.
+
+    Returns (rows to upsert, keys to delete, old rows that changed or were
+    deleted); rows are tuples in table column order.
+    """
+    columns = table_columns(conn, table)
+    key_pos = [columns.index(k) for k in TABLE_KEYS[table]]
+    new = set(_rows(df, columns)) if not df.empty else set()
+    old = set(conn.execute(f'SELECT {", ".join(columns)} FROM {table}'))
+    new_keys = {tuple(row[i] for i in key_pos) for row in new}
+    upserts = new - old
+    stale = old - new
+    deleted = {tuple(row[i] for i in key_pos) for row in stale} - new_keys
+    return sorted(upserts, key=repr), sorted(deleted, key=repr), stale
+
+
+def apply_diff(conn, table, upserts, deleted):
+    columns = table_columns(conn, table)
+    keys = TABLE_KEYS[table]
+    if deleted:
+        condition = ' AND '.join(f'{k} = ?' for k in keys)
+        conn.executemany(f'DELETE FROM {table} WHERE {condition}', deleted)
+    if upserts:
+        placeholders = ', '.join('?' * len(columns))
+        conn.executemany(f'INSERT OR REPLACE INTO {table} ({", ".join(columns)}) VALUES ({placeholders})', upserts)
+
+
+def _column_values(conn, table, column, rows):
+    position = table_columns(conn, table).index(column)
+    return {row[position] for row in rows}
+
+
+def sync_tables(conn, tables):
+    """Bring the stored tables in line with `tables` and refresh only the affected coverage rows.
+
+    Returns a dict of what changed and how many coverage rows were rewritten.
+    """
+    changes, affected_ntas, affected_dates, full = {}, set(), set(), False
+    conn.execute('BEGIN')
+    for table in TABLE_KEYS:
+        upserts, deleted, stale = diff_table(conn, table, tables[table])
+        changes[table] = {'upserted': len(upserts), 'deleted': len(deleted)}
+        if not upserts and not deleted:
+            continue
+
+        if table == 'dim_map':
+            # a changed NTA -> CDTA assignment changes the population split of whole districts
+            full = True
+        elif table == 'dim_program_schedule':
+            # edited or removed sites: every NTA they are mapped to, before and after
+            efap_ids = _column_values(conn, table, 'efap_id', upserts) | {key[0] for key in deleted}
+            _scope_table(conn, 'coverage_sites', 'efap_id', efap_ids)
+            affected_ntas |= {row[0] for row in conn.execute(
+                'SELECT nta_id FROM bridge_efap_site_nta WHERE efap_id IN (SELECT efap_id FROM temp.coverage_sites)')}
+            mapping = tables['bridge_efap_site_nta']
+            affected_ntas |= set(mapping.loc[mapping['efap_id'].isin(efap_ids), 'nta_id'])
+        elif table == 'bridge_efap_site_nta':
+            affected_ntas |= _column_values(conn, table, 'nta_id', upserts) | {key[1] for key in deleted}
+        elif table in ('dim_date', 'fact_agg_shelter_cdta_year'):
+            affected_dates |= (_column_values(conn, table, 'date_id', upserts)
+                               | _column_values(conn, table, 'date_id', stale))
+        apply_diff(conn, table, upserts, deleted)
+
+    start = time.perf_counter()
+    if full:
+        written = refresh_coverage(conn)
+    else:
+        written = refresh_coverage(conn, nta_ids=affected_ntas, date_ids=affected_dates)
+    conn.execute('COMMIT')
+    return {
+        'changes': {table: counts for table, counts in changes.items() if any(counts.values())},
+        'affected_ntas': 'all' if full else len(affected_ntas),
+        'affected_dates': 'all' if full else len(affected_dates),
+        'coverage_rows_written': written,
+        'refresh_seconds': round(time.perf_counter() - start, 4),
+    }
+
+
+def schema_matches(conn):
+    """True when every table in the database has the columns declared in the schema file."""
+    expected = sqlite3.connect(':memory:')
+    expected.executescript(read_schema()[0])
+    try:
+        return all(table_columns(conn, table) == table_columns(expected, table) for table in TABLE_ORDER)
+    finally:
+        expected.close()
+
+
+def sync_database(db_path=DB_PATH, tables=None):
+    """Apply only what changed; (re)creates the database when it is missing or its schema is outdated."""
+    tables = tables if tables is not None else build_tables()
+    if os.path.exists(db_path):
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        try:
+            if schema_matches(conn):
+                return sync_tables(conn, tables)
+        finally:
+            conn.close()
+    return {'created': load_star_schema(db_path, tables)}
+
+
+# -----------------------------
+# Reading the precomputed numbers
+# -----------------------------
+
+def load_coverage(db_path=DB_PATH, date_id=None):
+    """Coverage rows for one month (the latest by default), one row per NTA."""
+    conn = sqlite3.connect(db_path)
+    try:
+        if date_id is None:
+            date_id = conn.execute('SELECT MAX(date_id) FROM fact_food_site_coverage').fetchone()[0]
+        return pd.read_sql_query('SELECT * FROM fact_food_site_coverage WHERE date_id = ? ORDER BY nta_id',
+                                 conn, params=(date_id,))
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Incrementally maintain fact_food_site_coverage.')
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--full', action='store_true', help='recompute every coverage row')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.full and os.path.exists(args.db):
+        conn = sqlite3.connect(args.db, isolation_level=None)
+        conn.execute('BEGIN')
+        print(f"coverage_rows_written: {refresh_coverage(conn)}")
+        conn.execute('COMMIT')
+        conn.close()
+    else:
+        for key, value in sync_database(args.db).items():
+            print(f"{key}: {value}")
+    print(f"Done in {time.perf_counter() - start:.2f}s")
@@ -1,213 +1,341 @@
-import pandas as pd
-import numpy as np
+import argparse
+import contextlib
 import os
-from pathlib import Path
-import sqlite3
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from config import PROCESSED_DIR
+from schemas import get_schema, validate, widen_floats, write_table
 
 # -----------------------------
-# CONFIGURATION (edit paths if needed)
+# Surrogate-keyed star schema
+# The SQLite star schema (load_sqlite.py) joins on natural keys: text NTA
+# and CDTA codes, EFAP ids and YYYYMM dates. This builder writes the same
+# dimensions and facts with compact integer surrogate keys, declared in
+# DIMENSIONS and FACTS below. Each dimension gets its keys from one
+# factorize pass over its natural key, and each fact foreign key is a
+# factorize of the fact column plus a gather through the (small) array of
+# keys of its distinct values - the fact table is never merged or copied.
+#
+# Keys are stable across runs: every natural key ever seen is kept with its
+# surrogate in data/processed/keys/<dimension>.csv. Members already
+# registered keep their key, new members get the next free keys (in natural
+# key order) and keys of members that disappear are never reused. Fact rows
+# whose natural key is missing or not in the dimension get key 0. Every
+# table is written through its star_<table> schema in schemas.py, and natural
+# keys are converted to that schema's dtype before they are matched, so an
+# id read as 80604.0 is the same member as 80604.
+#
+# --db bulk loads the tables like load_sqlite.py: DDL generated from the
+# declarations (surrogate primary keys, unique natural keys, foreign keys),
+# executemany in one transaction, then the foreign key indexes and ANALYZE.
 # -----------------------------
-RAW_DATA_PATH = '/mnt/data/EFAP_pdf_11_4_24.csv'  # <-- your uploaded CSV
-OUTPUT_DIR = Path('data/processed')
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-DB_NAME = 'efap_star_schema.db'  # optional: creates a local sqlite file
+
+KEYS_DIR = PROCESSED_DIR / 'keys'
+UNKNOWN_KEY = 0
+KEY_DTYPE = np.int32
+
+
+@dataclass
+class Dimension:
+    name: str
+    key: str                    # surrogate key column
+    natural_key: list           # columns identifying a member
+    attributes: list = field(default_factory=list)
+
+
+@dataclass
+class Fact:
+    name: str
+    foreign_keys: dict          # dimension name -> fact columns holding its natural key
+    measures: list = field(default_factory=list)
+
+
+DIMENSIONS = [
+    Dimension('dim_map', 'map_key', ['nta_id'],
+              ['nta_name', 'cdta_id', 'cdta_name', 'boro_code', 'boro_name', 'the_geom_wkt']),
+    Dimension('dim_cdta', 'cdta_key', ['cdta_id'], ['cdta_name', 'boro_code', 'boro_name']),
+    Dimension('dim_program_schedule', 'program_key', ['efap_id'],
+              ['program_name', 'access_type', 'has_pantry_access', 'has_kitchen_access',
+               'weekend_available', 'weekday_available']),
+    Dimension('dim_date', 'date_key', ['date_id'], ['report_date', 'year', 'month']),
+]
+
+FACTS = [
+    Fact('fact_neighborhood_prioritization', {'dim_map': ['nta_id']},
+         ['weighted_score', 'food_insecure_percentage', 'supply_gap', 'vulnerable_population_percentage']),
+    Fact('fact_agg_shelter_cdta_year', {'dim_cdta': ['cdta_id'], 'dim_date': ['date_id']},
+         ['family_with_children_commercial_hotel', 'family_with_children_shelter', 'family_cluster']),
+    Fact('bridge_efap_site_nta', {'dim_program_schedule': ['efap_id'], 'dim_map': ['nta_id']}),
+]
 
 
 # -----------------------------
-# Helpers
+# Key registries
 # -----------------------------
 
-def _choose_columns(df, candidates):
-    """Return the first subset of candidates that are all present in df."""
-    present = [c for c in candidates if c in df.columns]
-    return present
+def _natural_index(frame, columns):
+    """Index over the natural key values (a MultiIndex for composite keys)."""
+    if len(columns) == 1:
+        return pd.Index(frame[columns[0]].astype(object), name=columns[0])
+    return pd.MultiIndex.from_frame(frame[columns].astype(object))
+
+
+def natural_key_text(frame, dim):
+    """The natural key columns in the dimension's declared dtypes, as text.
+
+    Keys are matched as text so they survive the registry's csv round trip;
+    converting through the star_<dimension> schema first makes 80604.0 and
+    80604 the same member (SchemaDriftError for values that do not fit).
+    """
+    converted = validate(frame, get_schema(f'star_{dim.name}'), dim.natural_key)
+    return pd.DataFrame({c: converted[c].astype(object).astype(str) for c in dim.natural_key})
 
 
-def _find_columns_by_keyword(df, keyword):
-    return [c for c in df.columns if keyword.lower() in c.lower()]
+def empty_registry(dim):
+    return pd.DataFrame({**{c: pd.Series(dtype=object) for c in dim.natural_key},
+                         dim.key: pd.Series(dtype=KEY_DTYPE)})
+
+
+def load_registry(dim, keys_dir=KEYS_DIR):
+    path = os.path.join(keys_dir, f'{dim.name}.csv')
+    if not os.path.exists(path):
+        return empty_registry(dim)
+    return pd.read_csv(path, dtype={**{c: object for c in dim.natural_key}, dim.key: KEY_DTYPE})
+
+
+def save_registry(dim, registry, keys_dir=KEYS_DIR):
+    os.makedirs(keys_dir, exist_ok=True)
+    registry.to_csv(os.path.join(keys_dir, f'{dim.name}.csv'), index=False)
+
+
+def assign_keys(dim, members, registry):
+    """(surrogate key per member row, updated registry); new members get the next free keys."""
+    members_index = _natural_index(natural_key_text(members, dim), dim.natural_key)
+    known = _natural_index(registry, dim.natural_key)
+    position = known.get_indexer(members_index)
+
+    codes, uniques = pd.factorize(members_index[position < 0], sort=True)
+    start = int(registry[dim.key].max()) + 1 if len(registry) else UNKNOWN_KEY + 1
+    new_keys = np.arange(start, start + len(uniques), dtype=KEY_DTYPE)
+
+    keys = np.empty(len(members), dtype=KEY_DTYPE)
+    keys[position >= 0] = registry[dim.key].to_numpy()[position[position >= 0]]
+    keys[position < 0] = new_keys[codes]
+
+    added = uniques.to_frame(index=False) if isinstance(uniques, pd.MultiIndex) else \
+        pd.DataFrame({dim.natural_key[0]: np.asarray(uniques, dtype=object)})
+    added[dim.key] = new_keys
+    return keys, pd.concat([registry, added], ignore_index=True)
 
 
 # -----------------------------
-# Main processing function
+# Builder
 # -----------------------------
 
-def process_data_for_star_schema(raw_path):
-    # Load the raw data
-    try:
-        df = pd.read_csv(raw_path)
-    except FileNotFoundError:
-        raise FileNotFoundError(f"Raw data not found at {raw_path}")
-
-    print(f"Loaded raw data with {len(df)} rows and {len(df.columns)} columns.")
-
-    # -------------------------
-    # 1) BUILDING DIMENSION
-    # Prefer common column names, but fall back to heuristics
-    # -------------------------
-    building_candidates = [
-        ['Borough', 'BBL', 'ZipCode'],
-        ['Borough', 'BBL', 'ZIP'],
-        ['Borough', 'BBL', 'Zip'],
-        ['Borough', 'BBL', 'Zipcode'],
-        ['Latitude', 'Longitude', 'Address']
-    ]
-
-    building_cols = None
-    for cand in building_candidates:
-        if all(c in df.columns for c in cand):
-            building_cols = cand
-            break
-
-    if building_cols is None:
-        # fallback: take any location-like columns
-        loc_like = _find_columns_by_keyword(df, 'zip') + _find_columns_by_keyword(df, 'addr') + _find_columns_by_keyword(df, 'boro')
-        # dedupe while preserving order
-        seen = set(); loc_like = [x for x in loc_like if not (x in seen or seen.add(x))]
-        building_cols = loc_like[:3] if loc_like else []
-
-    print('Building dimension columns chosen:', building_cols)
-    if building_cols:
-        dim_building = df[building_cols].dropna(how='all').drop_duplicates().reset_index(drop=True)
-        dim_building = dim_building.fillna('')
-        dim_building['building_id'] = dim_building.index + 1
+def build_dimension(dim, source, registry):
+    """(dimension table with its surrogate key first, updated registry)."""
+    missing = [c for c in dim.natural_key + dim.attributes if c not in source.columns]
+    if missing:
+        raise ValueError(f"{dim.name}: source is missing columns {missing}")
+    members = source.drop_duplicates(dim.natural_key)
+    if members[dim.natural_key].isna().any(axis=None):
+        raise ValueError(f"{dim.name}: members without a natural key {dim.natural_key}")
+    keys, registry = assign_keys(dim, members, registry)
+    table = pd.DataFrame({dim.key: keys})
+    for column in dim.natural_key + dim.attributes:
+        table[column] = members[column].to_numpy()
+    return table.sort_values(dim.key, ignore_index=True), registry
+
+
+def foreign_key(fact_frame, columns, dim_table, dim):
+    """Surrogate keys for a fact's natural key columns: factorize, look up the distinct values, gather."""
+    if len(columns) == 1:
+        # factorize the column as stored (categorical codes are reused as is); only the
+        # distinct values are converted for the lookup
+        codes, uniques = pd.factorize(fact_frame[columns[0]])
+        uniques = pd.DataFrame({dim.natural_key[0]: np.asarray(uniques, dtype=object)})
     else:
-        dim_building = pd.DataFrame(columns=['building_id'])
-
-    # -------------------------
-    # 2) VIOLATION TYPE DIMENSION
-    # -------------------------
-    vt_candidates = ['ViolationClass', 'ViolationDescription', 'ViolationType', 'Violation']
-    vt_cols = [c for c in vt_candidates if c in df.columns]
-    if not vt_cols:
-        # fallback: any columns that contain 'violation' or 'type' in name
-        vt_cols = _find_columns_by_keyword(df, 'violation') or _find_columns_by_keyword(df, 'viola')
-
-    print('Violation-type columns chosen:', vt_cols)
-    if vt_cols:
-        dim_violation_type = df[vt_cols].dropna(how='all').drop_duplicates().reset_index(drop=True)
-        dim_violation_type = dim_violation_type.fillna('')
-        dim_violation_type['violation_type_id'] = dim_violation_type.index + 1
-    else:
-        dim_violation_type = pd.DataFrame(columns=['violation_type_id'])
-
-    # -------------------------
-    # 3) DATE DIMENSION (generate if date-like columns exist)
-    # -------------------------
-    date_cols = _find_columns_by_keyword(df, 'date')
-    date_cols = date_cols or _find_columns_by_keyword(df, 'day')
-
-    dim_date = pd.DataFrame()
-    if date_cols:
-        # take the first date-like column to build a date dim
-        date_col = date_cols[0]
-        print('Using date column for dim_date:', date_col)
-        # coerce to datetime
-        df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-        unique_dates = df[date_col].dropna().drop_duplicates().reset_index(drop=True)
-        dim_date = pd.DataFrame({date_col: unique_dates})
-        dim_date['date_id'] = dim_date.index + 1
-        dim_date['year'] = dim_date[date_col].dt.year
-        dim_date['month'] = dim_date[date_col].dt.month
-        dim_date['day'] = dim_date[date_col].dt.day
-        dim_date['weekday'] = dim_date[date_col].dt.weekday
-    else:
-        print('No date-like column found; skipping dim_date creation.')
-
-    # -------------------------
-    # 4) MERGE FOREIGN KEYS INTO FACT TABLE
-    # -------------------------
-    fact_df = df.copy()
-
-    # Merge building FK
-    if not dim_building.empty:
-        merge_on = [c for c in building_cols if c in fact_df.columns]
-        fact_df = fact_df.merge(dim_building, on=merge_on, how='left')
-        # drop the original building descriptive columns
-        fact_df = fact_df.drop(columns=merge_on)
-
-    # Merge violation-type FK
-    if not dim_violation_type.empty:
-        merge_on = [c for c in vt_cols if c in fact_df.columns]
-        fact_df = fact_df.merge(dim_violation_type, on=merge_on, how='left')
-        fact_df = fact_df.drop(columns=merge_on)
-
-    # Merge date FK
-    if not dim_date.empty:
-        date_col = date_cols[0]
-        fact_df = fact_df.merge(dim_date[[date_col, 'date_id']], on=date_col, how='left')
-        fact_df = fact_df.drop(columns=[date_col])
-
-    # Choose a fact id
-    id_candidates = ['ViolationID', 'id', 'ID', 'RecordID']
-    fact_id_col = next((c for c in id_candidates if c in fact_df.columns), None)
-    if fact_id_col is None:
-        # create an id from the index
-        fact_df = fact_df.reset_index().rename(columns={'index': 'fact_row_id'})
-        fact_id_col = 'fact_row_id'
-
-    # Example measure: is_open if a status column exists
-    status_cols = _find_columns_by_keyword(fact_df, 'status')
-    if status_cols:
-        status_col = status_cols[0]
-        fact_df['is_open'] = np.where(fact_df[status_col].astype(str).str.upper().str.contains('OPEN'), 1, 0)
-    else:
-        fact_df['is_open'] = np.nan
-
-    # Build final fact table with selected FKs and measure columns
-    fk_cols = []
-    if 'building_id' in fact_df.columns:
-        fk_cols.append('building_id')
-    if 'violation_type_id' in fact_df.columns:
-        fk_cols.append('violation_type_id')
-    if 'date_id' in fact_df.columns:
-        fk_cols.append('date_id')
-
-    measure_cols = ['is_open']
-    fact_table_cols = [fact_id_col] + fk_cols + measure_cols
-    fact_table = fact_df[fact_table_cols]
-
-    # -------------------------
-    # 5) SAVE CSVS
-    # -------------------------
-    fact_out = OUTPUT_DIR / 'fact_table.csv'
-    fact_table.to_csv(fact_out, index=False)
-    print(f"Saved fact table to {fact_out}")
-
-    if not dim_building.empty:
-        dim_building_out = OUTPUT_DIR / 'dim_building.csv'
-        dim_building.to_csv(dim_building_out, index=False)
-        print(f"Saved dim_building to {dim_building_out}")
-
-    if not dim_violation_type.empty:
-        dim_violation_out = OUTPUT_DIR / 'dim_violation_type.csv'
-        dim_violation_type.to_csv(dim_violation_out, index=False)
-        print(f"Saved dim_violation_type to {dim_violation_out}")
-
-    if not dim_date.empty:
-        dim_date_out = OUTPUT_DIR / 'dim_date.csv'
-        dim_date.to_csv(dim_date_out, index=False)
-        print(f"Saved dim_date to {dim_date_out}")
-
-    # -------------------------
-    # 6) OPTIONAL: write to sqlite for quick inspection
-    # -------------------------
-    try:
-        conn = sqlite3.connect(DB_NAME)
-        fact_table.to_sql('fact_table', conn, if_exists='replace', index=False)
-        if not dim_building.empty:
-            dim_building.to_sql('dim_building', conn, if_exists='replace', index=False)
-        if not dim_violation_type.empty:
-            dim_violation_type.to_sql('dim_violation_type', conn, if_exists='replace', index=False)
-        if not dim_date.empty:
-            dim_date.to_sql('dim_date', conn, if_exists='replace', index=False)
-        conn.close()
-        print(f"Wrote tables to sqlite DB: {DB_NAME}")
-    except Exception as e:
-        print('Could not write to sqlite DB (continuing):', e)
-
-    return fact_table, dim_building, dim_violation_type, dim_date
+        codes, uniques = pd.factorize(pd.MultiIndex.from_frame(fact_frame[columns]))
+        uniques = uniques.to_frame(index=False)
+        uniques.columns = dim.natural_key
+    members = _natural_index(natural_key_text(dim_table, dim), dim.natural_key)
+    lookup = members.get_indexer(_natural_index(natural_key_text(uniques, dim), dim.natural_key))
+    # one slot per distinct value plus a trailing UNKNOWN_KEY that code -1 (missing) picks
+    keys = np.append(np.where(lookup >= 0, dim_table[dim.key].to_numpy()[lookup], UNKNOWN_KEY), UNKNOWN_KEY)
+    return keys.astype(KEY_DTYPE)[codes]
+
+
+def build_fact(fact, source, dimension_tables, dimensions):
+    table = {}
+    for dim_name, columns in fact.foreign_keys.items():
+        dim = dimensions[dim_name]
+        table[dim.key] = foreign_key(source, columns, dimension_tables[dim_name], dim)
+    for column in fact.measures:
+        table[column] = source[column].to_numpy()
+    return pd.DataFrame(table)
+
+
+def build_star_schema(tables, dimensions=DIMENSIONS, facts=FACTS, keys_dir=KEYS_DIR, save_keys=True):
+    """Surrogate-keyed {table name: frame} from the natural-key tables of load_sqlite.build_tables.
+
+    Returns (tables, stats); stats counts new keys per dimension and fact
+    rows with an unknown member per foreign key.
+    """
+    by_name = {dim.name: dim for dim in dimensions}
+    result, stats = {}, {'new_keys': {}, 'unknown_members': {}}
+    for dim in dimensions:
+        registry = load_registry(dim, keys_dir)
+        result[dim.name], updated = build_dimension(dim, tables[dim.name], registry)
+        stats['new_keys'][dim.name] = len(updated) - len(registry)
+        if save_keys and len(updated) > len(registry):
+            save_registry(dim, updated, keys_dir)
+    for fact in facts:
+        result[fact.name] = build_fact(fact, tables[fact.name], result, by_name)
+        for dim_name in fact.foreign_keys:
+            key = by_name[dim_name].key
+            unknown = int((result[fact.name][key] == UNKNOWN_KEY).sum())
+            if unknown:
+                stats['unknown_members'][f'{fact.name}.{key}'] = unknown
+    return result, stats
+
+
+def _sql_type(dtype):
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'INT'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+
+def star_schema_sql(dimensions=DIMENSIONS, facts=FACTS):
+    """(table DDL, index DDL) for the surrogate-keyed tables, from their star_<table> schemas."""
+    by_name = {dim.name: dim for dim in dimensions}
+    tables, indexes = [], []
+    for dim in dimensions:
+        columns = [f'    {c} {_sql_type(dtype)}' + (' PRIMARY KEY' if c == dim.key else
+                                                    ' NOT NULL' if c in dim.natural_key else '')
+                   for c, dtype in get_schema(f'star_{dim.name}').columns.items()]
+        columns.append(f'    UNIQUE ({", ".join(dim.natural_key)})')
+        tables.append(f'CREATE TABLE {dim.name} (\n' + ',\n'.join(columns) + '\n);')
+    for fact in facts:
+        keys = [by_name[dim_name] for dim_name in fact.foreign_keys]
+        columns = [f'    {c} {_sql_type(dtype)}' + (' NOT NULL' if c in [d.key for d in keys] else '')
+                   for c, dtype in get_schema(f'star_{fact.name}').columns.items()]
+        columns += [f'    FOREIGN KEY ({d.key}) REFERENCES {d.name} ({d.key})' for d in keys]
+        tables.append(f'CREATE TABLE {fact.name} (\n' + ',\n'.join(columns) + '\n);')
+        indexes += [f'CREATE INDEX idx_{fact.name}_{d.key} ON {fact.name} ({d.key});' for d in keys]
+    return '\n\n'.join(tables), '\n'.join(indexes)
+
+
+def load_database(tables, db_path, dimensions=DIMENSIONS, facts=FACTS):
+    """Bulk load the surrogate-keyed tables into a fresh SQLite file; returns row counts and checks.
+
+    Fact rows with the unknown member key 0 have no dimension row, so they
+    are what foreign_key_violations counts.
+    """
+    from load_sqlite import connect_for_load, insert_tables
+    table_sql, index_sql = star_schema_sql(dimensions, facts)
+    prepared = {}
+    for name, frame in tables.items():
+        # dates as ISO text and float32 as the decimals they were read from, like load_sqlite
+        dates = {c: frame[c].dt.strftime('%Y-%m-%d') for c in frame.columns
+                 if pd.api.types.is_datetime64_any_dtype(frame[c])}
+        prepared[name] = widen_floats(frame.assign(**dates))
+
+    with contextlib.closing(connect_for_load(db_path, table_sql)) as conn:
+        conn.execute('BEGIN')
+        rows = insert_tables(conn, prepared, [dim.name for dim in dimensions] + [fact.name for fact in facts])
+        conn.execute('COMMIT')
+        conn.executescript(index_sql)
+        conn.execute('ANALYZE')
+        violations = len(conn.execute('PRAGMA foreign_key_check').fetchall())
+        conn.execute('PRAGMA synchronous=NORMAL')
+    return {'rows': rows, 'foreign_key_violations': violations}
+
+
+def write_star_schema(tables, out_dir=PROCESSED_DIR, db_path=None):
+    """Write every table through its star_<table> schema (schemas.py); returns the enforced tables."""
+    os.makedirs(out_dir, exist_ok=True)
+    written = {name: write_table(frame, f'star_{name}', os.path.join(out_dir, f'{name}.csv'))
+               for name, frame in tables.items()}
+    if db_path:
+        print(f"Database {db_path}: {load_database(written, db_path)}")
+    return written
+
+
+# -----------------------------
+# Benchmark against drop_duplicates + merge per dimension
+# -----------------------------
+
+def merge_surrogate_keys(fact, columns, dim_source):
+    """What create_schema2.py used to do: number the distinct rows, merge them back, drop the natural key."""
+    dim = dim_source[columns].dropna(how='all').drop_duplicates().reset_index(drop=True)
+    dim['key'] = dim.index + 1
+    return fact.merge(dim, on=columns, how='left').drop(columns=columns)
+
+
+def benchmark(tables, factor=100):
+    """Time and trace the memory of both approaches on the fact tables replicated `factor` times."""
+    from load_sqlite import scale_tables
+    scaled = scale_tables(tables, factor)
+    by_name = {dim.name: dim for dim in DIMENSIONS}
+    dims = {dim.name: build_dimension(dim, scaled[dim.name], empty_registry(dim))[0] for dim in DIMENSIONS}
+
+    def merged():
+        for fact in FACTS:
+            frame = scaled[fact.name]
+            for dim_name, columns in fact.foreign_keys.items():
+                frame = merge_surrogate_keys(frame, columns, scaled[dim_name])
+
+    def factorized():
+        for fact in FACTS:
+            build_fact(fact, scaled[fact.name], dims, by_name)
+
+    results = {'fact_rows': sum(len(scaled[fact.name]) for fact in FACTS)}
+    for name, fn in [('merge', merged), ('factorize', factorized)]:
+        start = time.perf_counter()
+        fn()
+        results[f'{name}_seconds'] = round(time.perf_counter() - start, 3)
+        tracemalloc.start()
+        fn()
+        results[f'{name}_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        tracemalloc.stop()
+    return results
 
 
 if __name__ == '__main__':
-    fact, dbuild, dvt, ddate = process_data_for_star_schema(RAW_DATA_PATH)
-    print('\nProcessing complete.')
+    parser = argparse.ArgumentParser(description='Build the surrogate-keyed star schema from the cleaned tables.')
+    parser.add_argument('--output', default=PROCESSED_DIR, help='directory for the dimension and fact csvs')
+    parser.add_argument('--db', help='also write the tables to this SQLite file')
+    parser.add_argument('--reset-keys', action='store_true', help='forget the key registries and renumber every dimension')
+    parser.add_argument('--benchmark', type=int, default=0, metavar='FACTOR',
+                        help='compare with drop_duplicates + merge on the tables replicated FACTOR times')
+    args = parser.parse_args()
+
+    from load_sqlite import build_tables
+    tables = build_tables()
+
+    if args.benchmark:
+        print(benchmark(tables, args.benchmark))
+        raise SystemExit(0)
+
+    if args.reset_keys:
+        for dim in DIMENSIONS:
+            path = KEYS_DIR / f'{dim.name}.csv'
+            if path.exists():
+                path.unlink()
+
+    start = time.perf_counter()
+    star, stats = build_star_schema(tables)
+    write_star_schema(star, args.output, args.db)
+    for name, frame in star.items():
+        print(f"{name}: {len(frame)} rows")
+    print(f"New keys: {stats['new_keys']}")
+    if stats['unknown_members']:
+        print(f"Fact rows with an unknown member (key {UNKNOWN_KEY}): {stats['unknown_members']}")
+    print(f"Built in {time.perf_counter() - start:.2f}s -> {args.output}")
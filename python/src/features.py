@@ -0,0 +1,61 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+from config import STAR_SCHEMA_DB
+
+# -----------------------------
+# NTA feature table
+# One row per NTA: the prioritization measures joined with the precomputed
+# coverage numbers of one census month (fact_food_site_coverage), read in a
+# single query from the star schema database.
+# -----------------------------
+
+# inputs of the coverage classifier
+FEATURE_COLUMNS = ['weighted_score', 'food_insecure_percentage', 'supply_gap', 'vulnerable_population_percentage']
+
+COVERAGE_COLUMNS = [
+    'pantry_site_count', 'kitchen_site_count', 'total_sites', 'weekend_site_count', 'weekday_site_count',
+    'sheltered_population', 'coverage_ratio',
+]
+
+FEATURES_SQL = """
+SELECT p.nta_id, m.nta_name, m.cdta_id, m.boro_name, c.date_id,
+       {features}, {coverage}
+FROM fact_neighborhood_prioritization p
+JOIN dim_map m ON m.nta_id = p.nta_id
+LEFT JOIN fact_food_site_coverage c ON c.nta_id = p.nta_id AND c.date_id = ?
+ORDER BY p.nta_id
+"""
+
+
+def ensure_database(db_path=STAR_SCHEMA_DB):
+    """Build the star schema database from the cleaned csvs if it does not exist yet."""
+    if not os.path.exists(db_path):
+        from coverage import sync_database
+        sync_database(db_path)
+    return db_path
+
+
+def nta_feature_table(db_path=STAR_SCHEMA_DB, date_id=None):
+    """Prioritization features and coverage of every NTA for one month (latest by default)."""
+    conn = sqlite3.connect(ensure_database(db_path))
+    try:
+        if date_id is None:
+            date_id = conn.execute('SELECT MAX(date_id) FROM fact_food_site_coverage').fetchone()[0]
+        sql = FEATURES_SQL.format(features=', '.join(f'p.{c}' for c in FEATURE_COLUMNS),
+                                  coverage=', '.join(f'c.{c}' for c in COVERAGE_COLUMNS))
+        return pd.read_sql_query(sql, conn, params=(date_id,))
+    finally:
+        conn.close()
+
+
+def coverage_labels(features, threshold=None):
+    """1 = high coverage (coverage_ratio at or above the threshold, the median by default).
+
+    Returns (labels, threshold); NTAs without a coverage ratio get NaN.
+    """
+    ratio = features['coverage_ratio']
+    threshold = ratio.median() if threshold is None else threshold
+    return (ratio >= threshold).astype(float).where(ratio.notna()), threshold
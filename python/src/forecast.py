@@ -0,0 +1,299 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from config import DATA_DIR
+from create_schema import cdta_id_from_district
+from schemas import read_table
+
+# -----------------------------
+# ARIMAX forecasts of shelter demand per community district
+# One monthly series per district (CDTA) with month-of-year harmonics as the
+# exogenous regressors. Months missing from the census (2019-02, 2019-03 and
+# 2019-07) stay in the index as NaN: the state space model skips them in the
+# likelihood instead of fitting to interpolated values. Fits run in a process
+# pool and their parameters are cached on disk keyed by the sha256 of the
+# series and the model order; when a series grows by a month the previous
+# parameters of the same district and order are used as start values (or
+# re-applied without optimizing), so only the new data is really fitted.
+# AICs of differently differenced series are not comparable, so the
+# differencing order d of each district is fixed first by an augmented
+# Dickey-Fuller test and only orders with that d are fitted and compared.
+# -----------------------------
+
+CACHE_DIR = DATA_DIR / 'cache' / 'arimax'
+TARGET_COLUMNS = ['family_with_children_commercial_hotel', 'family_with_children_shelter', 'family_cluster']
+DEFAULT_ORDERS = [(p, d, q) for p, d, q in itertools.product(range(3), range(2), range(3))]
+UNIT_ROOT_ALPHA = 0.05          # ADF p-value below which a series is taken as stationary (d=0)
+RESULT_COLUMNS = ['cdta_id', 'order', 'mode', 'params', 'aic', 'bic', 'llf', 'nobs', 'converged', 'seconds']
+
+
+# -----------------------------
+# Series
+# -----------------------------
+
+def district_series(census, target='total'):
+    """Monthly (months x cdta_id) frame of one census column ('total' sums all three).
+
+    The index covers every month from the first to the last report, so
+    months without a report are NaN rows rather than silently skipped.
+    """
+    census = census.assign(cdta_id=cdta_id_from_district(census['borough'], census['community_districts']),
+                           month=pd.to_datetime(census['report_date']).dt.to_period('M'))
+    census = census.dropna(subset=['cdta_id'])
+    values = census[TARGET_COLUMNS].sum(axis=1) if target == 'total' else census[target]
+    panel = values.groupby([census['month'], census['cdta_id']]).sum().unstack('cdta_id')
+    months = pd.period_range(panel.index.min(), panel.index.max(), freq='M')
+    return panel.reindex(months)
+
+
+def missing_months(panel):
+    """Months with no report for any district."""
+    return panel.index[panel.isna().all(axis=1)]
+
+
+def seasonal_exog(index):
+    """Annual sine/cosine pair: the exogenous part of the ARIMAX."""
+    angle = 2 * np.pi * np.asarray(index.month) / 12
+    return np.column_stack([np.sin(angle), np.cos(angle)])
+
+
+def series_key(values, start, order):
+    """Cache key of one fit: the series values (NaNs included), its first month and the order."""
+    digest = hashlib.sha256(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+    digest.update(f'{start}|{tuple(order)}|harmonic1'.encode())
+    return digest.hexdigest()
+
+
+# -----------------------------
+# Parameter cache: one json per fit plus an index of the latest fit per (district, order)
+# -----------------------------
+
+class FitCache:
+    def __init__(self, path=CACHE_DIR):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.index_path = os.path.join(path, 'latest.json')
+        self.latest = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.latest = json.load(f)
+
+    @staticmethod
+    def _latest_key(cdta_id, order):
+        return f'{cdta_id}|{tuple(order)}'
+
+    def get(self, key):
+        path = os.path.join(self.path, f'{key}.json')
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def previous(self, cdta_id, order):
+        """Most recent fit of the same district and order (for warm starts)."""
+        key = self.latest.get(self._latest_key(cdta_id, order))
+        return self.get(key) if key else None
+
+    def put(self, key, fit):
+        with open(os.path.join(self.path, f'{key}.json'), 'w') as f:
+            json.dump(fit, f)
+        self.latest[self._latest_key(fit['cdta_id'], fit['order'])] = key
+
+    def save_index(self):
+        with open(self.index_path, 'w') as f:
+            json.dump(self.latest, f, indent=1, sort_keys=True)
+
+
+# -----------------------------
+# Fitting (module-level so it runs in worker processes)
+# -----------------------------
+
+def _model(values, index, order):
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+    return SARIMAX(values, exog=seasonal_exog(index), order=order, trend='c' if order[1] == 0 else 'n')
+
+
+def fit_one(task):
+    """Fit one (district, order); task = (cdta_id, values, months, order, start_params, mode).
+
+    mode 'cold' optimizes from default start values, 'warm' optimizes from
+    start_params, 'filter' re-applies start_params to the new data without
+    optimizing; its result is not a fit, so converged is None and fit_grid
+    does not cache it.
+    """
+    cdta_id, values, index, order, start_params, mode = task
+    start = time.perf_counter()
+    result = {'cdta_id': cdta_id, 'order': list(order), 'mode': mode}
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            model = _model(values, index, order)
+            if mode == 'filter':
+                fitted = model.filter(np.asarray(start_params))
+            else:
+                fitted = model.fit(start_params=start_params, disp=False, maxiter=200)
+        result.update(params=[float(v) for v in fitted.params], aic=float(fitted.aic), bic=float(fitted.bic),
+                      llf=float(fitted.llf), nobs=int(fitted.nobs),
+                      converged=bool(fitted.mle_retvals.get('converged', True)) if mode != 'filter' else None)
+    except Exception as exc:  # a degenerate series should not stop the grid
+        result.update(params=None, aic=np.inf, bic=np.inf, llf=None, nobs=0, converged=False, error=str(exc))
+    result['seconds'] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def differencing_order(values, candidates=(0, 1), alpha=UNIT_ROOT_ALPHA):
+    """Smallest d in candidates whose differenced series rejects a unit root (ADF), else the largest."""
+    from statsmodels.tsa.stattools import adfuller
+    candidates = sorted(candidates)
+    for d in candidates[:-1]:
+        # difference on the monthly index so no difference spans a gap month
+        series = np.diff(values, n=d)
+        series = series[~np.isnan(series)]
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                p_value = adfuller(series, autolag='AIC')[1]
+        except (ValueError, np.linalg.LinAlgError):
+            continue
+        if p_value < alpha:
+            return d
+    return candidates[-1]
+
+
+def fit_grid(panel, orders=DEFAULT_ORDERS, workers=None, cache=None, update='warm'):
+    """Fit every district x order, in parallel, reusing the cache.
+
+    update -- what to do when only an older fit of the same district and
+              order is cached: 'warm' refits from its parameters, 'filter'
+              keeps its parameters and only runs the filter on the new data
+              (not cached, so the next update still starts from the last
+              real fit), 'cold' ignores it.
+    Only the orders whose d matches differencing_order() of the district are
+    fitted; the chosen d is in the 'd' column of the results.
+    Returns (results frame, stats dict with the total wall time).
+    """
+    cache = cache if cache is not None else FitCache()
+    start = time.perf_counter()
+    rows, tasks, keys, constant, chosen_d = [], [], [], [], {}
+    d_candidates = sorted({order[1] for order in orders})
+    for cdta_id in panel.columns:
+        series = panel[cdta_id]
+        # leading/trailing months before the district first reported are not gaps
+        series = series.loc[series.first_valid_index():series.last_valid_index()]
+        values = series.to_numpy(dtype=float)
+        if np.nanstd(values) == 0:
+            # e.g. districts that never house families: nothing to model
+            constant.append(cdta_id)
+            continue
+        chosen_d[cdta_id] = differencing_order(values, d_candidates)
+        for order in orders:
+            if order[1] != chosen_d[cdta_id]:
+                continue
+            key = series_key(values, series.index[0], order)
+            cached = cache.get(key)
+            if cached is not None:
+                rows.append(dict(cached, mode='cached', seconds=0.0))
+                continue
+            previous = cache.previous(cdta_id, order) if update != 'cold' else None
+            mode, start_params = 'cold', None
+            if previous is not None and previous.get('params') is not None:
+                mode, start_params = update, previous['params']
+            tasks.append((cdta_id, values, series.index, order, start_params, mode))
+            keys.append(key)
+
+    if tasks:
+        if workers == 1:
+            fitted = [fit_one(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                fitted = list(pool.map(fit_one, tasks, chunksize=max(1, len(tasks) // (4 * (os.cpu_count() or 1)))))
+        for key, result in zip(keys, fitted):
+            # filtered results keep the older fit's parameters: caching them under
+            # this series' key would pass them off as fitted on it
+            if result['params'] is not None and result['mode'] != 'filter':
+                cache.put(key, {k: v for k, v in result.items() if k not in ('mode', 'seconds')})
+            rows.append(result)
+        cache.save_index()
+
+    # an empty grid (every district constant) still has the result columns
+    results = pd.DataFrame(rows) if rows else pd.DataFrame(columns=RESULT_COLUMNS)
+    results['order'] = results['order'].map(tuple)
+    results['d'] = results['cdta_id'].map(chosen_d)
+    stats = {
+        'districts': panel.shape[1],
+        'constant_series_skipped': constant,
+        'orders': len(orders),
+        'districts_by_d': pd.Series(chosen_d, dtype=int).value_counts().sort_index().to_dict(),
+        'fits': len(results),
+        'wall_seconds': round(time.perf_counter() - start, 3),
+        'fit_cpu_seconds': round(float(results['seconds'].sum()), 3),
+    }
+    stats.update(results['mode'].value_counts().to_dict())
+    return results, stats
+
+
+def best_orders(results):
+    """Lowest-AIC order per district among the orders with the district's chosen d."""
+    ok = results[np.isfinite(results['aic']) & (results['order'].str[1] == results['d'])]
+    return ok.loc[ok.groupby('cdta_id')['aic'].idxmin(), ['cdta_id', 'order', 'd', 'aic', 'bic', 'converged']]
+
+
+def forecast(panel, cdta_id, order, params, steps=12):
+    """Mean forecast and 95% interval for the next `steps` months from cached parameters."""
+    series = panel[cdta_id]
+    series = series.loc[series.first_valid_index():series.last_valid_index()]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        fitted = _model(series.to_numpy(dtype=float), series.index, order).filter(np.asarray(params))
+        future = pd.period_range(series.index[-1] + 1, periods=steps, freq='M')
+        prediction = fitted.get_forecast(steps, exog=seasonal_exog(future))
+    interval = prediction.conf_int(alpha=0.05)
+    return pd.DataFrame({'month': future, 'mean': prediction.predicted_mean,
+                         'lower': interval[:, 0], 'upper': interval[:, 1]})
+
+
+def parse_orders(text):
+    """'0-2,0-1,0-2' -> every (p, d, q) in those ranges; '1,1,1' -> [(1, 1, 1)]"""
+    ranges = []
+    for part in text.split(','):
+        low, _, high = part.partition('-')
+        ranges.append(range(int(low), int(high or low) + 1))
+    if len(ranges) != 3:
+        raise ValueError(f"Orders must be p,d,q ranges like 0-2,0-1,0-2: {text!r}")
+    return list(itertools.product(*ranges))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fit ARIMAX models of shelter demand for every community district.')
+    parser.add_argument('--orders', default='0-2,0-1,0-2', help='p,d,q ranges of the order grid')
+    parser.add_argument('--target', default='total', choices=['total'] + TARGET_COLUMNS)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (1 = serial)')
+    parser.add_argument('--update', default='warm', choices=['warm', 'filter', 'cold'],
+                        help='how to refit a district whose series gained months since it was cached')
+    parser.add_argument('--forecast', type=int, default=0, metavar='STEPS',
+                        help='also forecast STEPS months for every district with its best order')
+    args = parser.parse_args()
+
+    panel = district_series(read_table('shelter_census_clean'), args.target)
+    print(f"{panel.shape[1]} districts x {len(panel)} months; "
+          f"months without a report: {[str(m) for m in missing_months(panel)]}")
+
+    results, stats = fit_grid(panel, parse_orders(args.orders), workers=args.workers, update=args.update)
+    best = best_orders(results)
+    print(best.to_string(index=False))
+    print(f"\nGrid stats: {stats}")
+
+    if args.forecast:
+        params = results.set_index(['cdta_id', 'order'])['params']
+        frames = [forecast(panel, row.cdta_id, row.order, params[(row.cdta_id, row.order)], args.forecast)
+                  .assign(cdta_id=row.cdta_id) for row in best.itertuples()]
+        print(pd.concat(frames).to_string(index=False))
@@ -0,0 +1,403 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import DIM_MAP_CLEAN, GEO_TILE_DIR
+from spatial_join import parse_wkt_multipolygon
+
+# -----------------------------
+# Simplified NTA geometries per zoom level
+# dim_map.the_geom_wkt holds the full-resolution NTA boundaries, far more
+# detail than a map view can show, and every render used to parse and ship
+# all of it. Here the WKT is parsed once and simplified for a few zoom
+# levels, each written as a GeoJSON FeatureCollection keyed by nta_id with
+# the bounding box of every NTA precomputed in index.csv.
+#
+# Simplifying each polygon on its own would move a shared border one way in
+# one NTA and another way in its neighbour, leaving gaps and overlaps. So
+# the rings are first cut into arcs at the vertices where the set of
+# neighbouring polygons changes (as TopoJSON does); each distinct arc is
+# simplified once with Douglas-Peucker and both neighbours are rebuilt from
+# the same simplified arc, which keeps shared borders identical.
+# -----------------------------
+
+ZOOMS = (8, 10, 12, 14)
+TOLERANCE_PX = 0.5              # allowed displacement in screen pixels at each zoom
+TILE_SIZE = 256                 # pixels per web-map tile
+COORD_SCALE = 10**7             # vertices are matched on a 1e-7 degree (~1 cm) grid
+NYC_REFERENCE_LAT = 40.7        # lon is scaled by cos(lat) so tolerances are isotropic
+INDEX_FILE = 'index.csv'
+
+
+def pixel_degrees(zoom):
+    """Width of one screen pixel in degrees of longitude at a web-map zoom level."""
+    return 360.0 / (TILE_SIZE * 2**zoom)
+
+
+def tile_path(zoom, tile_dir=GEO_TILE_DIR):
+    return os.path.join(tile_dir, f'nta_z{zoom}.geojson')
+
+
+# -----------------------------
+# Arcs shared between rings
+# -----------------------------
+
+def _vertex_keys(ring):
+    """One int64 per vertex from its quantized (lon, lat)."""
+    q = np.round(ring * COORD_SCALE).astype(np.int64)
+    return (q[:, 0] << 32) ^ (q[:, 1] & 0xFFFFFFFF)
+
+
+def _open_ring(ring):
+    """Ring without its closing vertex."""
+    return ring[:-1] if len(ring) > 1 and np.array_equal(ring[0], ring[-1]) else ring
+
+
+def find_junctions(rings):
+    """Keys of the vertices where a ring meets a different set of neighbours.
+
+    A vertex on a border shared by two NTAs has the same two neighbouring
+    vertices in both rings; where the border ends the neighbours differ.
+    """
+    keys, pairs_lo, pairs_hi = [], [], []
+    for ring in rings:
+        k = _vertex_keys(_open_ring(ring))
+        prev, nxt = np.roll(k, 1), np.roll(k, -1)
+        keys.append(k)
+        pairs_lo.append(np.minimum(prev, nxt))
+        pairs_hi.append(np.maximum(prev, nxt))
+    neighbours = pd.DataFrame({'key': np.concatenate(keys), 'lo': np.concatenate(pairs_lo),
+                               'hi': np.concatenate(pairs_hi)}).drop_duplicates()
+    counts = neighbours['key'].value_counts()
+    return set(counts.index[counts > 1])
+
+
+class Topology:
+    """Rings of every polygon expressed as sequences of shared arcs."""
+
+    def __init__(self, geometries):
+        """geometries: list (one per NTA) of parse_wkt_multipolygon() results."""
+        rings = [ring for polygons in geometries for polygon in polygons for ring in polygon]
+        junctions = find_junctions(rings) if rings else set()
+        self.arcs = []              # (n, 2) float arrays, quantized to the vertex grid
+        self._arc_ids = {}
+        self.geometries = [[[self._ring_arcs(ring, junctions) for ring in polygon] for polygon in polygons]
+                           for polygons in geometries]
+
+    def _arc_id(self, points, keys):
+        """Signed reference to the canonical copy of an arc (negative = reversed)."""
+        forward = tuple(keys) <= tuple(keys[::-1])
+        canonical = tuple(keys) if forward else tuple(keys[::-1])
+        arc_id = self._arc_ids.get(canonical)
+        if arc_id is None:
+            arc_id = self._arc_ids[canonical] = len(self.arcs)
+            self.arcs.append(points if forward else points[::-1])
+        # ~arc_id (= -arc_id - 1) marks a reversed use, 0 included
+        return arc_id if forward else ~arc_id
+
+    def _ring_arcs(self, ring, junctions):
+        ring = np.round(_open_ring(ring) * COORD_SCALE) / COORD_SCALE
+        keys = _vertex_keys(ring)
+        cuts = np.flatnonzero(np.isin(keys, list(junctions))) if junctions else np.empty(0, dtype=int)
+        if len(cuts) == 0:
+            # a ring that touches nobody (or a hole filled by one other NTA):
+            # start it at its smallest vertex so both copies become the same arc
+            cuts = np.array([int(np.argmin(keys))])
+        # rotate so the ring starts at a junction, then close it
+        order = np.concatenate([np.arange(cuts[0], len(ring)), np.arange(0, cuts[0] + 1)])
+        ring, keys = ring[order], keys[order]
+        bounds = np.append(cuts - cuts[0], len(ring) - 1)
+        return [self._arc_id(ring[a:b + 1], keys[a:b + 1].tolist()) for a, b in zip(bounds[:-1], bounds[1:])]
+
+    def simplified_arcs(self, tolerance):
+        """Every arc simplified once, in the planar coordinates used for the tolerance."""
+        scale = np.array([np.cos(np.radians(NYC_REFERENCE_LAT)), 1.0])
+        return [arc[douglas_peucker(arc * scale, tolerance)] for arc in self.arcs]
+
+    def build(self, arcs, decimals):
+        """GeoJSON MultiPolygon coordinates per NTA from (simplified) arcs; None when nothing is left."""
+        result = []
+        for polygons in self.geometries:
+            coordinates = []
+            for polygon in polygons:
+                rings = [_join_arcs(arcs, ring, decimals) for ring in polygon]
+                # a ring with fewer than 4 vertices is below one pixel at this zoom
+                if len(rings[0]) < 4:
+                    continue
+                coordinates.append([ring.tolist() for ring in rings if len(ring) >= 4])
+            result.append(coordinates or None)
+        return result
+
+
+def _join_arcs(arcs, refs, decimals):
+    parts = [arcs[ref] if ref >= 0 else arcs[~ref][::-1] for ref in refs]
+    ring = np.vstack([parts[0]] + [part[1:] for part in parts[1:]]).round(decimals)
+    # rounding can merge neighbouring vertices
+    keep = np.ones(len(ring), dtype=bool)
+    keep[1:] = np.any(ring[1:] != ring[:-1], axis=1)
+    return ring[keep]
+
+
+def douglas_peucker(points, tolerance):
+    """Indices of the vertices Douglas-Peucker keeps (always both ends)."""
+    n = len(points)
+    if n <= 2:
+        return np.arange(n)
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j <= i + 1:
+            continue
+        start, end = points[i], points[j]
+        inner = points[i + 1:j] - start
+        dx, dy = end - start
+        length = np.hypot(dx, dy)
+        # a closed arc starts and ends at the same vertex: distance to that vertex
+        distance = (np.abs(dx * inner[:, 1] - dy * inner[:, 0]) / length if length
+                    else np.hypot(inner[:, 0], inner[:, 1]))
+        k = int(np.argmax(distance))
+        if distance[k] > tolerance:
+            k += i + 1
+            keep[k] = True
+            stack.extend([(i, k), (k, j)])
+    return np.flatnonzero(keep)
+
+
+# -----------------------------
+# Building and loading the tiles
+# -----------------------------
+
+def bounding_boxes(nta_ids, geometries):
+    rows = []
+    for nta_id, polygons in zip(nta_ids, geometries):
+        points = np.vstack([polygon[0] for polygon in polygons]) if polygons else np.full((1, 2), np.nan)
+        lon_min, lat_min = points.min(axis=0)
+        lon_max, lat_max = points.max(axis=0)
+        rows.append((nta_id, lon_min, lat_min, lon_max, lat_max))
+    return pd.DataFrame(rows, columns=['nta_id', 'lon_min', 'lat_min', 'lon_max', 'lat_max'])
+
+
+def feature_collection(nta_ids, coordinates, boxes):
+    features = []
+    for nta_id, coords, box in zip(nta_ids, coordinates, boxes):
+        features.append({'type': 'Feature', 'id': nta_id, 'bbox': box,
+                         'properties': {'nta_id': nta_id},
+                         'geometry': None if coords is None else {'type': 'MultiPolygon', 'coordinates': coords}})
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def build_tiles(dim_map, zooms=ZOOMS, tile_dir=GEO_TILE_DIR):
+    """Parse the WKT once, write one simplified GeoJSON per zoom and index.csv; returns the index."""
+    nta_ids = dim_map['nta_id'].astype(str).tolist()
+    geometries = [parse_wkt_multipolygon(wkt) for wkt in dim_map['the_geom_wkt']]
+    topology = Topology(geometries)
+    index = bounding_boxes(nta_ids, geometries)
+    boxes = index[['lon_min', 'lat_min', 'lon_max', 'lat_max']].round(6).to_numpy().tolist()
+    boxes = [None if np.isnan(box[0]) else box for box in boxes]
+
+    os.makedirs(tile_dir, exist_ok=True)
+    scale = np.cos(np.radians(NYC_REFERENCE_LAT))
+    for zoom in zooms:
+        pixel = pixel_degrees(zoom)
+        # enough decimals to place a vertex within a tenth of a pixel
+        decimals = int(np.ceil(-np.log10(pixel / 10)))
+        coordinates = topology.build(topology.simplified_arcs(TOLERANCE_PX * pixel * scale), decimals)
+        with open(tile_path(zoom, tile_dir), 'w') as f:
+            json.dump(feature_collection(nta_ids, coordinates, boxes), f, separators=(',', ':'))
+        index[f'vertices_z{zoom}'] = [sum(len(ring) for polygon in coords for ring in polygon) if coords else 0
+                                      for coords in coordinates]
+    index['vertices_full'] = [sum(len(ring) for polygon in polygons for ring in polygon) for polygons in geometries]
+    index.to_csv(os.path.join(tile_dir, INDEX_FILE), index=False)
+    return index
+
+
+def available_zooms(tile_dir=GEO_TILE_DIR):
+    if not os.path.isdir(tile_dir):
+        return []
+    return sorted(int(name[len('nta_z'):-len('.geojson')]) for name in os.listdir(tile_dir)
+                  if name.startswith('nta_z') and name.endswith('.geojson'))
+
+
+def pick_zoom(zoom, tile_dir=GEO_TILE_DIR):
+    """The most detailed precomputed zoom not finer than `zoom` (the coarsest one below them all)."""
+    zooms = available_zooms(tile_dir)
+    if not zooms:
+        raise FileNotFoundError(f"No geometry tiles in {tile_dir}; run python python/src/geo_tiles.py")
+    return max([z for z in zooms if z <= zoom], default=zooms[0])
+
+
+def load_tiles(zoom, bbox=None, nta_ids=None, tile_dir=GEO_TILE_DIR):
+    """GeoJSON FeatureCollection of the NTAs at (the nearest precomputed) zoom.
+
+    bbox    -- optional (lon_min, lat_min, lon_max, lat_max) viewport; only NTAs
+               whose precomputed bounding box intersects it are returned
+    nta_ids -- optional list of NTAs to keep
+    """
+    with open(tile_path(pick_zoom(zoom, tile_dir), tile_dir)) as f:
+        collection = json.load(f)
+    if bbox is None and nta_ids is None:
+        return collection
+    index = pd.read_csv(os.path.join(tile_dir, INDEX_FILE), dtype={'nta_id': str})
+    keep = pd.Series(True, index=index.index)
+    if bbox is not None:
+        lon_min, lat_min, lon_max, lat_max = bbox
+        keep &= ((index['lon_max'] >= lon_min) & (index['lon_min'] <= lon_max)
+                 & (index['lat_max'] >= lat_min) & (index['lat_min'] <= lat_max))
+    if nta_ids is not None:
+        keep &= index['nta_id'].isin([str(n) for n in nta_ids])
+    wanted = set(index.loc[keep, 'nta_id'])
+    collection['features'] = [feature for feature in collection['features'] if feature['id'] in wanted]
+    return collection
+
+
+# -----------------------------
+# Benchmark: full-resolution WKT vs precomputed tiles
+# -----------------------------
+
+def full_resolution_payload(dim_map):
+    """What a map view had to do before: parse every WKT and serialize it all as GeoJSON."""
+    nta_ids = dim_map['nta_id'].astype(str).tolist()
+    coordinates = [[[ring.tolist() for ring in polygon] for polygon in parse_wkt_multipolygon(wkt)] or None
+                   for wkt in dim_map['the_geom_wkt']]
+    return json.dumps(feature_collection(nta_ids, coordinates, [None] * len(nta_ids)), separators=(',', ':'))
+
+
+def _densify(ring, detail, noise, seed):
+    """Insert `detail` slightly jittered vertices into every edge, the same way for both sides of a border."""
+    parts = [ring[:1]]
+    t = np.linspace(0, 1, detail + 2)[1:-1, None]
+    for start, end in zip(ring[:-1], ring[1:]):
+        keys = sorted(_vertex_keys(np.array([start, end])).tolist())
+        rng = np.random.default_rng([seed] + [k & 0xFFFFFFFFFFFF for k in keys])
+        # both neighbours walk a shared edge in opposite directions: generate it
+        # from its smaller end and reverse it for the other side
+        forward = _vertex_keys(start[None])[0] == keys[0]
+        a, b = (start, end) if forward else (end, start)
+        points = a + t * (b - a) + rng.normal(0, noise, (detail, 2))
+        parts += [points if forward else points[::-1], end[None]]
+    return np.vstack(parts)
+
+
+def synthetic_dim_map(scale=1, detail=0, noise=2e-5, seed=0):
+    """dim_map-shaped frame with synthetic.nta_grid boundaries.
+
+    detail -- extra vertices per edge, jittered by `noise` degrees, to mimic
+              densely digitized boundaries (the real ones have thousands of
+              vertices per NTA, the synthetic grid a few dozen)
+    """
+    from synthetic import BASE_NTAS, nta_grid, ring_wkt
+    rings = nta_grid(BASE_NTAS * scale, seed)
+    if detail:
+        rings = [_densify(ring, detail, noise, seed) for ring in rings]
+    return pd.DataFrame({'nta_id': [f'NTA{i:05d}' for i in range(len(rings))],
+                         'the_geom_wkt': [ring_wkt(ring) for ring in rings]})
+
+
+def unshared_border_km(rings):
+    """Length of the edges that belong to only one ring, in km.
+
+    Where two NTAs meet, each border edge appears in both rings, so only the
+    outer boundary of the city should be left; gaps and overlaps from
+    simplifying neighbours differently add to it.
+    """
+    from access import project_km
+    from spatial_join import ring_edges
+    edges = ring_edges(rings)
+    q = np.round(edges * COORD_SCALE).astype(np.int64)
+    a, b = (q[:, 0] << 32) ^ (q[:, 1] & 0xFFFFFFFF), (q[:, 2] << 32) ^ (q[:, 3] & 0xFFFFFFFF)
+    once = ~pd.DataFrame({'lo': np.minimum(a, b), 'hi': np.maximum(a, b)}).duplicated(keep=False).to_numpy()
+    start, end = project_km(edges[once, 1], edges[once, 0]), project_km(edges[once, 3], edges[once, 2])
+    return float(np.hypot(*(end - start).T).sum())
+
+
+def check_shared_borders(dim_map, tile_dir=GEO_TILE_DIR):
+    """{'full' or zoom: unshared_border_km} for the source geometries and every precomputed zoom."""
+    rings = [ring for wkt in dim_map['the_geom_wkt'] for polygon in parse_wkt_multipolygon(wkt) for ring in polygon]
+    result = {'full': round(unshared_border_km(rings), 2)}
+    for zoom in available_zooms(tile_dir):
+        with open(tile_path(zoom, tile_dir)) as f:
+            features = json.load(f)['features']
+        rings = [np.array(ring) for feature in features if feature['geometry']
+                 for polygon in feature['geometry']['coordinates'] for ring in polygon]
+        result[zoom] = round(unshared_border_km(rings), 2)
+    return result
+
+
+def benchmark(dim_map, zooms=ZOOMS, tile_dir=None):
+    """Payload bytes and time to produce + decode it, full resolution vs every precomputed zoom.
+
+    tile_dir -- where the benchmark tiles are written; a temporary directory
+                by default, so the pipeline's tiles in GEO_TILE_DIR are never replaced
+    """
+    if tile_dir is None:
+        with tempfile.TemporaryDirectory() as tmp:
+            return benchmark(dim_map, zooms, tmp)
+    start = time.perf_counter()
+    payload = full_resolution_payload(dim_map)
+    produce = time.perf_counter() - start
+    start = time.perf_counter()
+    json.loads(payload)
+    results = [{'geometry': 'full', 'bytes': len(payload), 'produce_ms': round(produce * 1000, 1),
+                'decode_ms': round((time.perf_counter() - start) * 1000, 1)}]
+
+    start = time.perf_counter()
+    index = build_tiles(dim_map, zooms, tile_dir)
+    print(f"Precomputed {len(zooms)} zooms in {time.perf_counter() - start:.2f}s "
+          f"({index['vertices_full'].sum()} full-resolution vertices)")
+    for zoom in zooms:
+        start = time.perf_counter()
+        with open(tile_path(zoom, tile_dir)) as f:
+            payload = f.read()
+        produce = time.perf_counter() - start
+        start = time.perf_counter()
+        json.loads(payload)
+        results.append({'geometry': f'z{zoom}', 'bytes': len(payload), 'produce_ms': round(produce * 1000, 1),
+                        'decode_ms': round((time.perf_counter() - start) * 1000, 1),
+                        'vertices': int(index[f'vertices_z{zoom}'].sum())})
+    return pd.DataFrame(results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute simplified NTA geometries per zoom level.')
+    parser.add_argument('--zooms', type=int, nargs='+', default=list(ZOOMS))
+    parser.add_argument('--output', default=None,
+                        help='tile directory (default: GEO_TILE_DIR, or a temporary one with --synthetic/--benchmark)')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='compare payload size and time with the full-resolution WKT')
+    parser.add_argument('--synthetic', type=int, metavar='DETAIL',
+                        help='use synthetic.nta_grid boundaries with DETAIL extra vertices per edge instead of dim_map.csv')
+    parser.add_argument('--check', action='store_true', help='verify that neighbouring NTAs still share their borders')
+    args = parser.parse_args()
+
+    if args.synthetic is not None:
+        dim_map = synthetic_dim_map(detail=args.synthetic)
+    elif os.path.exists(DIM_MAP_CLEAN):
+        from schemas import read_table
+        dim_map = read_table('dim_map', columns=['nta_id', 'the_geom_wkt'])
+    else:
+        raise SystemExit(f"{DIM_MAP_CLEAN} not found; build it with create_schema.py or pass --synthetic N")
+
+    # synthetic and benchmark tiles never go to GEO_TILE_DIR: the geo_tiles
+    # pipeline stage would keep serving them to the app as up to date
+    scratch = args.synthetic is not None or args.benchmark
+    if scratch and args.output is not None and os.path.abspath(args.output) == os.path.abspath(GEO_TILE_DIR):
+        parser.error(f"--synthetic and --benchmark must not write to the pipeline's tiles in {GEO_TILE_DIR}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output = args.output or (tmp if scratch else GEO_TILE_DIR)
+        if args.benchmark:
+            print(benchmark(dim_map, args.zooms, output).to_string(index=False))
+        else:
+            start = time.perf_counter()
+            index = build_tiles(dim_map, args.zooms, output)
+            print(f"{len(index)} NTAs, {len(args.zooms)} zooms in {time.perf_counter() - start:.2f}s -> {output}")
+            print(index[[c for c in index.columns if c.startswith('vertices_')]].sum().to_string())
+        if args.check:
+            print(f"Border km not shared with a neighbour: {check_shared_borders(dim_map, output)}")
@@ -0,0 +1,295 @@
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import DATA_DIR, EFAP_RAW
+from create_schema import boro_map
+from schemas import read_raw
+
+# -----------------------------
+# Concurrent, cached Geoclient batch geocoder
+# Replaces the row-by-row df.apply(geocode_geoclient) loop from
+# efap_clean.ipynb: addresses are deduplicated on the normalized
+# full_address, looked up in a persistent SQLite cache, and only the misses
+# are sent to Geoclient from a thread pool sharing one pooled session, with a
+# global rate limit and exponential backoff on 429/5xx responses.
+# -----------------------------
+
+GEOCLIENT_URL = 'https://api.nyc.gov/geo/geoclient/v2/address.json'
+GEOCODE_CACHE = DATA_DIR / 'cache' / 'geocode_cache.sqlite'
+
+# fallback when DISTBORO is blank or unknown (e.g. 601 WEST 114TH STREET)
+zip_prefix_boro = {
+    '100': 'Manhattan', '101': 'Manhattan', '102': 'Manhattan',
+    '103': 'Staten Island',
+    '104': 'Bronx',
+    '112': 'Brooklyn',
+    '110': 'Queens', '111': 'Queens', '113': 'Queens', '114': 'Queens', '116': 'Queens',
+}
+
+# results worth keeping: Geoclient answered (or the address could not be parsed)
+CACHED_STATUS = ('ok', 'no_match', 'unparsed')
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+_HOUSE_STREET_RE = re.compile(r'^\s*(?:\(\w+\)\s*)?(\d+[A-Z]?(?:-\d+[A-Z]?)*)-?\s+(.+)$')
+_NOTES_RE = re.compile(r'\(.*?\)|@.*$|\s-\s.*$')
+
+
+# -----------------------------
+# Address preparation
+# -----------------------------
+
+def full_address(distadd, distzip):
+    """Geocoder-friendly address, the same string efap_clean.ipynb builds."""
+    zipcode = distzip.astype(str).str.strip().str.split('-').str[0]
+    return distadd.astype(str).str.strip().str.upper() + ', NEW YORK, NY ' + zipcode
+
+
+def split_address(address):
+    """Split a DISTADD value into (house number, street); notes in () and '@ cross street' are dropped."""
+    match = _HOUSE_STREET_RE.match(str(address).upper())
+    if match is None:
+        return None, None
+    street = _NOTES_RE.sub('', match.group(2))
+    street = re.sub(r'\s+', ' ', street).strip(' ,.')
+    return match.group(1), street
+
+
+def prepare_addresses(efap):
+    """One row per unique full_address with the Geoclient request fields."""
+    zip_boro = efap['DISTZIP'].astype(str).str.strip().str[:3].map(zip_prefix_boro)
+    addresses = pd.DataFrame({
+        'full_address': full_address(efap['DISTADD'], efap['DISTZIP']),
+        'distadd': efap['DISTADD'],
+        'borough': efap['DISTBORO'].astype(str).str.strip().map(boro_map).fillna(zip_boro),
+    }).drop_duplicates('full_address').reset_index(drop=True)
+    parts = addresses['distadd'].map(split_address)
+    addresses['house_number'] = parts.str[0]
+    addresses['street'] = parts.str[1]
+    return addresses.drop(columns=['distadd'])
+
+
+# -----------------------------
+# Persistent cache
+# -----------------------------
+
+class GeocodeCache:
+    """SQLite cache of Geoclient results keyed by normalized full_address.
+
+    Misses where Geoclient answered but found no match are cached too (with
+    status 'no_match') so reruns do not keep asking for the same bad address;
+    only CACHED_STATUS results are stored or served, so transport errors and
+    HTTP errors (a bad GEOCLIENT_KEY, an outage) are never cached.
+    """
+
+    def __init__(self, path=GEOCODE_CACHE):
+        self.path = path
+        if str(path) != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS geocode_cache (
+                full_address TEXT PRIMARY KEY,
+                nta_id       TEXT,
+                latitude     REAL,
+                longitude    REAL,
+                status       TEXT NOT NULL,
+                fetched_at   REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def get_many(self, addresses):
+        """Return {full_address: row dict} for the addresses already cached."""
+        found = {}
+        addresses = list(addresses)
+        for start in range(0, len(addresses), 500):  # stay under SQLite's variable limit
+            batch = addresses[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            # rows with other statuses (written by older versions) count as misses
+            rows = self.conn.execute(
+                f'SELECT full_address, nta_id, latitude, longitude, status '
+                f'FROM geocode_cache WHERE full_address IN ({placeholders}) '
+                f'AND status IN ({",".join("?" * len(CACHED_STATUS))})', batch + list(CACHED_STATUS))
+            for address, nta_id, lat, lon, status in rows:
+                found[address] = {'nta_id': nta_id, 'latitude': lat, 'longitude': lon, 'status': status}
+        return found
+
+    def put_many(self, results):
+        """Store {full_address: row dict} results in one transaction."""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO geocode_cache VALUES (?, ?, ?, ?, ?, ?)',
+                [(address, r['nta_id'], r['latitude'], r['longitude'], r['status'], now)
+                 for address, r in results.items() if r is not None and r['status'] in CACHED_STATUS])
+
+    def close(self):
+        self.conn.close()
+
+
+# -----------------------------
+# Rate limited concurrent client
+# -----------------------------
+
+class RateLimiter:
+    """Thread-safe limiter spacing requests at most `rate` per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class GeoclientGeocoder:
+    """Geoclient address lookups over one pooled requests.Session."""
+
+    def __init__(self, base_url=GEOCLIENT_URL, api_key=None, workers=8, rate=20.0,
+                 max_retries=4, backoff=0.5, timeout=10):
+        self.base_url = base_url
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        api_key = api_key or os.environ.get('GEOCLIENT_KEY')
+        if api_key:
+            self.session.headers['Ocp-Apim-Subscription-Key'] = api_key
+
+    def lookup(self, house_number, street, borough):
+        """Geocode one address; returns a result dict, or None when Geoclient gave no usable answer.
+
+        Transport failures, HTTP errors other than 200 and bodies that are not
+        JSON all return None, like a failed request: nothing is cached for them.
+        """
+        if not house_number or not street or not isinstance(borough, str):
+            return {'nta_id': None, 'latitude': None, 'longitude': None, 'status': 'unparsed'}
+        params = {'houseNumber': house_number, 'street': street, 'borough': borough}
+        for attempt in range(self.max_retries + 1):
+            self.limiter.wait()
+            try:
+                r = self.session.get(self.base_url, params=params, timeout=self.timeout)
+            except requests.RequestException:
+                r = None
+            if r is not None and r.status_code not in RETRY_STATUS:
+                break
+            if attempt == self.max_retries:
+                return None
+            retry_after = r.headers.get('Retry-After') if r is not None else None
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else self.backoff * 2 ** attempt
+            time.sleep(delay)
+
+        if r.status_code != 200:
+            return None
+        try:
+            a = r.json().get('address')
+        except (ValueError, AttributeError):
+            return None
+        if not a or a.get('latitude') is None:
+            return {'nta_id': None, 'latitude': None, 'longitude': None, 'status': 'no_match'}
+        return {'nta_id': a.get('nta'), 'latitude': a.get('latitude'),
+                'longitude': a.get('longitude'), 'status': 'ok'}
+
+    def lookup_many(self, addresses):
+        """Geocode a prepared address frame concurrently; returns {full_address: result}."""
+        rows = addresses[['full_address', 'house_number', 'street', 'borough']].itertuples(index=False)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {row.full_address: pool.submit(self.lookup, row.house_number, row.street, row.borough)
+                       for row in rows}
+        return {address: future.result() for address, future in futures.items()}
+
+
+def geocode_efap(efap, geocoder=None, cache=None):
+    """Add nta_id, latitude and longitude to the raw EFAP frame.
+
+    Only addresses missing from the cache hit the API. Returns the enriched
+    frame and a stats dict with the cache hit rate and throughput.
+    """
+    start = time.perf_counter()
+    geocoder = geocoder or GeoclientGeocoder()
+    # a cache opened here is closed here; a caller's cache stays open
+    owns_cache = cache is None
+    cache = GeocodeCache() if owns_cache else cache
+
+    try:
+        addresses = prepare_addresses(efap)
+        cached = cache.get_many(addresses['full_address'])
+        misses = addresses[~addresses['full_address'].isin(cached)]
+
+        fetch_start = time.perf_counter()
+        fetched = geocoder.lookup_many(misses) if len(misses) else {}
+        fetch_seconds = time.perf_counter() - fetch_start
+        failed = [address for address, result in fetched.items() if result is None]
+        fetched = {address: result for address, result in fetched.items() if result is not None}
+        cache.put_many(fetched)
+    finally:
+        if owns_cache:
+            cache.close()
+
+    results = pd.DataFrame.from_dict({**cached, **fetched}, orient='index')
+    results = results.reindex(columns=['nta_id', 'latitude', 'longitude', 'status'])
+    keys = full_address(efap['DISTADD'], efap['DISTZIP'])
+    out = efap.copy()
+    out['full_address'] = keys
+    out = out.join(results, on='full_address')
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        'rows': len(efap),
+        'unique_addresses': len(addresses),
+        'cache_hits': len(cached),
+        'cache_hit_rate': len(cached) / len(addresses) if len(addresses) else 1.0,
+        'fetched': len(fetched),
+        'failed': len(failed),
+        'matched': int(out['latitude'].notna().sum()),
+        'fetch_seconds': round(fetch_seconds, 3),
+        'requests_per_second': round(len(misses) / fetch_seconds, 1) if len(misses) and fetch_seconds else None,
+        'total_seconds': round(elapsed, 3),
+    }
+    return out, stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Geocode EFAP sites with Geoclient, using a persistent cache.')
+    parser.add_argument('--input', default=EFAP_RAW, help='raw EFAP csv (DISTADD, DISTBORO, DISTZIP)')
+    parser.add_argument('--output', default=None, help='where to write ID, nta_id, latitude, longitude')
+    parser.add_argument('--cache', default=GEOCODE_CACHE, help='SQLite cache file')
+    parser.add_argument('--base-url', default=GEOCLIENT_URL, help='Geoclient endpoint')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=20.0, help='max requests per second across all workers')
+    args = parser.parse_args()
+
+    efap = read_raw('efap_raw', args.input)
+    geocoder = GeoclientGeocoder(base_url=args.base_url, workers=args.workers, rate=args.rate)
+    cache = GeocodeCache(args.cache)
+    geocoded, stats = geocode_efap(efap, geocoder, cache)
+    cache.close()
+
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+    if args.output:
+        geocoded[['ID', 'nta_id', 'latitude', 'longitude']].to_csv(args.output, index=False)
+        print(f"Saved geocoded sites to {args.output}")
@@ -0,0 +1,130 @@
+import csv
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from config import RUN_REPORT_DIR
+
+# -----------------------------
+# Stage instrumentation
+# Wraps each cleaning step with a timer, a background thread that samples
+# the resident set size (so the peak inside a step is seen, not just the
+# value at its end) and the row counts going in and out. The records of a
+# run are written as a JSON report and a flat CSV next to it in
+# data/reports, one pair per run name, overwritten by the next run.
+# -----------------------------
+
+SAMPLE_INTERVAL = 0.01      # seconds between RSS samples
+REPORT_COLUMNS = ['stage', 'seconds', 'rows_in', 'rows_out', 'dropped', 'rss_start_mb', 'peak_rss_mb',
+                  'peak_growth_mb']
+
+
+def rss_mb():
+    """Current resident set size; falls back to the peak where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+
+
+class PeakSampler:
+    """Samples rss_mb() on a daemon thread until stop(); returns (start, peak) in MB."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_mb())
+
+    def start(self):
+        self.start_mb = self.peak = rss_mb()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_mb())
+        return self.start_mb, self.peak
+
+
+@contextmanager
+def measure(name, rows_in=None):
+    """Time one step; yields its record so the caller can fill in rows_out."""
+    record = {'stage': name, 'rows_in': rows_in, 'rows_out': None}
+    sampler = PeakSampler().start()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = round(time.perf_counter() - start, 4)
+        start_mb, peak_mb = sampler.stop()
+        record['rss_start_mb'] = round(start_mb, 2)
+        record['peak_rss_mb'] = round(peak_mb, 2)
+        record['peak_growth_mb'] = round(peak_mb - start_mb, 2)
+        if record['rows_in'] is not None and record['rows_out'] is not None:
+            record['dropped'] = record['rows_in'] - record['rows_out']
+
+
+class RunReport:
+    """Instrumentation records of one run (create_schema.py, pipeline.py, ...)."""
+
+    def __init__(self, run):
+        self.run = run
+        self.started_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.records = []
+
+    @contextmanager
+    def step(self, name, rows_in=None):
+        with measure(name, rows_in) as record:
+            yield record
+        self.records.append(record)
+
+    def call(self, name, fn, frame, *args, **kwargs):
+        """fn(frame, ...) as a step, with len(frame) in and len(result) out."""
+        with self.step(name, len(frame)) as record:
+            result = fn(frame, *args, **kwargs)
+            record['rows_out'] = len(result)
+        return result
+
+    def add(self, record):
+        """Append a record measured elsewhere (e.g. in a worker process)."""
+        self.records.append(record)
+
+    def write(self, out_dir=RUN_REPORT_DIR):
+        """Write <run>_report.json and <run>_report.csv; returns the two paths."""
+        os.makedirs(out_dir, exist_ok=True)
+        json_path = os.path.join(out_dir, f'{self.run}_report.json')
+        csv_path = os.path.join(out_dir, f'{self.run}_report.csv')
+        summary = {
+            'run': self.run,
+            'started_at': self.started_at,
+            'total_seconds': round(sum(r['seconds'] for r in self.records), 4),
+            'peak_rss_mb': max((r['peak_rss_mb'] for r in self.records), default=None),
+            'stages': self.records,
+        }
+        with open(json_path, 'w') as f:
+            json.dump(summary, f, indent=2)
+        with open(csv_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(self.records)
+        return json_path, csv_path
+
+    def format(self):
+        lines = [f"{'stage':<24}{'seconds':>9}{'rows in':>10}{'rows out':>10}{'peak MB':>10}"]
+        for r in self.records:
+            rows_in = '' if r['rows_in'] is None else r['rows_in']
+            rows_out = '' if r['rows_out'] is None else r['rows_out']
+            lines.append(f"{r['stage']:<24}{r['seconds']:>9.3f}{rows_in:>10}{rows_out:>10}{r['peak_rss_mb']:>10.1f}")
+        return '\n'.join(lines)
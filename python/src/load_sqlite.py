@@ -0,0 +1,302 @@
+import argparse
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from config import (
+    REPO_ROOT, DIM_MAP_CLEAN, STAR_SCHEMA_DB,
+)
+from create_schema import borough_codes, cdta_id_from_district
+from schemas import read_table, widen_floats
+
+# -----------------------------
+# Bulk SQLite loader for the star schema
+# Creates the tables declared in sql/data_processing.sql (keys and
+# constraints included, unlike to_sql(if_exists='replace')), bulk-inserts
+# every table with executemany inside a single transaction using fast-load
+# pragmas, and only then builds the FK indexes and runs ANALYZE.
+# -----------------------------
+
+SCHEMA_SQL = REPO_ROOT / 'sql' / 'data_processing.sql'
+DB_PATH = STAR_SCHEMA_DB
+INDEX_MARKER = '-- 4. INDEXES'
+
+# load order respects the foreign keys
+TABLE_ORDER = [
+    'dim_date', 'dim_map', 'dim_cdta', 'dim_program_schedule', 'bridge_efap_site_nta',
+    'fact_neighborhood_prioritization', 'fact_food_site_coverage', 'fact_agg_shelter_cdta_year',
+]
+
+# analytic queries timed before and after indexing; shelter_vs_sites_per_cdta_month
+# returns every fact row, so indexes only shorten its per-CDTA site count subquery
+QUERIES = {
+    'sites_per_nta_with_priority': """
+        SELECT p.nta_id, p.weighted_score, COUNT(b.efap_id) AS sites
+        FROM fact_neighborhood_prioritization p
+        LEFT JOIN bridge_efap_site_nta b ON b.nta_id = p.nta_id
+        GROUP BY p.nta_id, p.weighted_score
+    """,
+    'pantry_weekend_sites_per_cdta': """
+        SELECT m.cdta_id,
+               SUM(s.has_pantry_access) AS pantry_sites,
+               SUM(s.weekend_available) AS weekend_sites
+        FROM dim_map m
+        JOIN bridge_efap_site_nta b ON b.nta_id = m.nta_id
+        JOIN dim_program_schedule s ON s.efap_id = b.efap_id
+        GROUP BY m.cdta_id
+    """,
+    'latest_shelter_by_cdta': """
+        SELECT f.cdta_id, c.boro_name,
+               f.family_with_children_shelter + f.family_with_children_commercial_hotel + f.family_cluster AS families
+        FROM fact_agg_shelter_cdta_year f
+        JOIN dim_cdta c ON c.cdta_id = f.cdta_id
+        WHERE f.date_id = (SELECT MAX(date_id) FROM dim_date)
+    """,
+    'shelter_vs_sites_per_cdta_month': """
+        SELECT f.cdta_id, f.date_id, f.family_with_children_shelter, COALESCE(s.sites, 0) AS sites
+        FROM fact_agg_shelter_cdta_year f
+        LEFT JOIN (
+            SELECT m.cdta_id, COUNT(b.efap_id) AS sites
+            FROM dim_map m
+            JOIN bridge_efap_site_nta b ON b.nta_id = m.nta_id
+            GROUP BY m.cdta_id
+        ) s ON s.cdta_id = f.cdta_id
+    """,
+    'shelter_trend_one_cdta': """
+        SELECT d.report_date, f.family_with_children_shelter
+        FROM fact_agg_shelter_cdta_year f
+        JOIN dim_date d ON d.date_id = f.date_id
+        WHERE f.cdta_id = 'BX05'
+        ORDER BY f.date_id
+    """,
+}
+
+
+# -----------------------------
+# Schema
+# -----------------------------
+
+def read_schema(path=SCHEMA_SQL):
+    """Split the schema file into (table DDL, index DDL)."""
+    with open(path) as f:
+        sql = f.read()
+    tables, _, indexes = sql.partition(INDEX_MARKER)
+    return tables, indexes
+
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+# -----------------------------
+# Building the table rows from the cleaned csvs
+# -----------------------------
+
+def _dim_map_from_ids(nta_ids):
+    """Minimal dim_map rows when dim_map.csv has not been built (no NTA raw file)."""
+    codes = {code: name for name, code in borough_codes.items()}
+    boro_numbers = {'MN': 1, 'BX': 2, 'BK': 3, 'QN': 4, 'SI': 5}
+    nta_ids = pd.Series(sorted(set(nta_ids)), dtype=object)
+    return pd.DataFrame({
+        'nta_id': nta_ids,
+        'nta_name': nta_ids,
+        'cdta_id': nta_ids.str[:4],
+        'cdta_name': None,
+        'boro_code': nta_ids.str[:2].map(boro_numbers),
+        'boro_name': nta_ids.str[:2].map(codes),
+        'the_geom_wkt': None,
+    })
+
+
+def build_tables(prioritization=None, census=None, efap=None, mapping=None, dim_map=None):
+    """Return {table name: DataFrame} for every table in the star schema.
+
+    The cleaned frames default to the csvs in data/clean; passing them in
+    lets the benchmarks load synthetic data.
+    """
+    prioritization = read_table('prioritization_clean') if prioritization is None else prioritization
+    census = read_table('shelter_census_clean') if census is None else census.copy()
+    census['report_date'] = pd.to_datetime(census['report_date'])
+    efap = read_table('efap_cleaned') if efap is None else efap
+    mapping = read_table('efap_nta_mapping') if mapping is None else mapping
+    # float32 measures go into REAL columns as the decimals they were read from
+    prioritization = widen_floats(prioritization)
+
+    if dim_map is None and os.path.exists(DIM_MAP_CLEAN):
+        dim_map = read_table('dim_map')
+    elif dim_map is None:
+        print(f"{DIM_MAP_CLEAN} not found; building placeholder dim_map rows from the NTA ids in use")
+        dim_map = _dim_map_from_ids(pd.concat([prioritization['nta_id'], mapping['nta_id']]))
+
+    census['cdta_id'] = cdta_id_from_district(census['borough'], census['community_districts'])
+    census = census.dropna(subset=['cdta_id'])
+    census['date_id'] = census['report_date'].dt.year * 100 + census['report_date'].dt.month
+
+    dim_date = census[['date_id', 'report_date']].drop_duplicates('date_id').sort_values('date_id')
+    dim_date = dim_date.assign(report_date=dim_date['report_date'].dt.strftime('%Y-%m-%d'),
+                               year=dim_date['report_date'].dt.year,
+                               month=dim_date['report_date'].dt.month)
+
+    # CDTAs from dim_map plus any census district dim_map does not know about
+    dim_cdta = dim_map[['cdta_id', 'cdta_name', 'boro_code', 'boro_name']].drop_duplicates('cdta_id')
+    extra = census.loc[~census['cdta_id'].isin(dim_cdta['cdta_id']), ['cdta_id', 'borough']].drop_duplicates('cdta_id')
+    boro_numbers = dict(zip(dim_cdta['boro_name'], dim_cdta['boro_code']))
+    if len(extra):
+        # typed like dim_cdta so the all-missing cdta_name does not decide the concatenated dtype
+        dim_cdta = pd.concat([dim_cdta, pd.DataFrame({
+            'cdta_id': extra['cdta_id'].astype(object),
+            'cdta_name': pd.Series(None, index=extra.index, dtype=dim_cdta['cdta_name'].dtype),
+            'boro_code': extra['borough'].map(boro_numbers).astype(dim_cdta['boro_code'].dtype),
+            'boro_name': extra['borough'].astype(object)})], ignore_index=True)
+
+    shelter = (census.groupby(['cdta_id', 'date_id'], as_index=False)
+               .agg(boro=('borough', 'first'),
+                    family_with_children_commercial_hotel=('family_with_children_commercial_hotel', 'sum'),
+                    family_with_children_shelter=('family_with_children_shelter', 'sum'),
+                    family_cluster=('family_cluster', 'sum')))
+
+    return {
+        'dim_date': dim_date,
+        'dim_map': dim_map,
+        'dim_cdta': dim_cdta,
+        'dim_program_schedule': efap,
+        'bridge_efap_site_nta': mapping[['efap_id', 'nta_id']].drop_duplicates(),
+        'fact_neighborhood_prioritization': prioritization,
+        'fact_agg_shelter_cdta_year': shelter,
+    }
+
+
+def scale_tables(tables, factor):
+    """Replicate every table `factor` times with offset keys, for load-time testing.
+
+    Text keys get a '~k' suffix and integer keys an offset, consistently
+    across tables, so foreign keys still resolve in the scaled copy.
+    """
+    if factor <= 1:
+        return tables
+    scaled = {}
+    for name, df in tables.items():
+        copies = []
+        for k in range(factor):
+            copy = df.copy()
+            for col in ('nta_id', 'cdta_id'):
+                if col in copy and k:
+                    copy[col] = copy[col].astype(str) + f'~{k}'
+            if 'efap_id' in copy and k:
+                copy['efap_id'] = copy['efap_id'] + k * 10_000_000
+            if 'date_id' in copy and k:
+                copy['date_id'] = copy['date_id'] + k * 1_000_000
+            copies.append(copy)
+        scaled[name] = pd.concat(copies, ignore_index=True) if copies else df
+    return scaled
+
+
+# -----------------------------
+# Loading
+# -----------------------------
+
+def _rows(df, columns):
+    """Plain Python tuples for executemany (numpy scalars and NaN converted)."""
+    df = df.reindex(columns=columns)
+    df = df.astype(object).where(df.notna(), None)
+    return list(df.itertuples(index=False, name=None))
+
+
+def time_queries(conn, repeat=3):
+    timings = {}
+    for name, sql in QUERIES.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(sql).fetchall()
+        timings[name] = round((time.perf_counter() - start) / repeat * 1000, 2)
+    return timings
+
+
+def connect_for_load(db_path, table_sql):
+    """Fresh database with the tables of `table_sql` and fast-load pragmas (autocommit; BEGIN/COMMIT yourself)."""
+    if str(db_path) != ':memory:':
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(f'{db_path}{suffix}'):
+                os.remove(f'{db_path}{suffix}')
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    # fast-load settings: the file is rebuilt from the csvs if a load is interrupted
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-200000')
+    conn.execute('PRAGMA foreign_keys=OFF')
+    conn.executescript(table_sql)
+    return conn
+
+
+def insert_tables(conn, tables, order):
+    """executemany every table in `order` into its declared columns; returns {table: rows inserted}."""
+    row_counts = {}
+    for table in order:
+        df = tables.get(table)
+        if df is None or df.empty:
+            row_counts[table] = 0
+            continue
+        columns = table_columns(conn, table)
+        placeholders = ', '.join('?' * len(columns))
+        rows = _rows(df, columns)
+        conn.executemany(f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders})', rows)
+        row_counts[table] = len(rows)
+    return row_counts
+
+
+def load_star_schema(db_path=DB_PATH, tables=None, time_unindexed=False, coverage=True):
+    """(Re)create the database and bulk load it; returns timing stats.
+
+    coverage -- also materialize fact_food_site_coverage (NTA x month) from the loaded tables
+    """
+    tables = tables if tables is not None else build_tables()
+    table_sql, index_sql = read_schema()
+    stats = {}
+    conn = connect_for_load(db_path, table_sql)
+
+    start = time.perf_counter()
+    conn.execute('BEGIN')
+    row_counts = insert_tables(conn, tables, TABLE_ORDER)
+    if coverage:
+        from coverage import refresh_coverage
+        row_counts['fact_food_site_coverage'] = refresh_coverage(conn)
+    conn.execute('COMMIT')
+    stats['load_seconds'] = round(time.perf_counter() - start, 3)
+    stats['rows'] = row_counts
+
+    if time_unindexed:
+        conn.execute('ANALYZE')
+        stats['query_ms_without_indexes'] = time_queries(conn)
+
+    start = time.perf_counter()
+    conn.executescript(index_sql)
+    conn.execute('ANALYZE')
+    stats['index_seconds'] = round(time.perf_counter() - start, 3)
+
+    violations = conn.execute('PRAGMA foreign_key_check').fetchall()
+    stats['foreign_key_violations'] = len(violations)
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA foreign_keys=ON')
+    stats['query_ms'] = time_queries(conn)
+    conn.close()
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bulk load the cleaned tables into the SQLite star schema.')
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--scale', type=int, default=1, help='replicate the data N times (load-time testing)')
+    parser.add_argument('--compare-indexes', action='store_true', help='also time the queries before indexing')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    data = scale_tables(build_tables(), args.scale)
+    print(f"Prepared tables in {time.perf_counter() - start:.2f}s")
+    # the NTA x month cross product of a scaled copy is not meaningful (and huge)
+    stats = load_star_schema(args.db, data, time_unindexed=args.compare_indexes, coverage=args.scale <= 1)
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+    print(f"Database written to {args.db}")
@@ -0,0 +1,74 @@
+import argparse
+import os
+import time
+
+import joblib
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import StratifiedKFold, cross_validate
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from config import COVERAGE_MODEL, STAR_SCHEMA_DB
+from features import FEATURE_COLUMNS, coverage_labels, nta_feature_table
+
+# -----------------------------
+# Coverage classifier
+# Logistic regression on the NTA prioritization measures predicting whether
+# an NTA has high food site coverage (coverage ratio at or above the median
+# of the latest census month). The fitted pipeline is saved together with
+# its feature list and label threshold so the app and batch scoring can load
+# it once and score without refitting.
+# -----------------------------
+
+
+def build_model():
+    return make_pipeline(StandardScaler(), LogisticRegression(class_weight='balanced', max_iter=1000))
+
+
+def train_model(features):
+    """Fit the classifier on an NTA feature table; returns the artifact dict."""
+    labels, threshold = coverage_labels(features)
+    train = features[labels.notna()]
+    y = labels[labels.notna()].astype(int)
+    X = train[FEATURE_COLUMNS]
+
+    folds = StratifiedKFold(n_splits=5, shuffle=True, random_state=0)
+    scores = cross_validate(build_model(), X, y, cv=folds, scoring=['accuracy', 'roc_auc'])
+    model = build_model().fit(X, y)
+    return {
+        'model': model,
+        'features': FEATURE_COLUMNS,
+        'threshold': float(threshold),
+        'date_id': int(features['date_id'].dropna().iloc[0]),
+        'trained_rows': len(train),
+        'cv_accuracy': round(scores['test_accuracy'].mean(), 3),
+        'cv_roc_auc': round(scores['test_roc_auc'].mean(), 3),
+        'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def save_model(artifact, path=COVERAGE_MODEL):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    joblib.dump(artifact, path)
+    return path
+
+
+def load_model(path=COVERAGE_MODEL):
+    return joblib.load(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train the high/low coverage logistic regression.')
+    parser.add_argument('--db', default=STAR_SCHEMA_DB)
+    parser.add_argument('--output', default=COVERAGE_MODEL)
+    args = parser.parse_args()
+
+    artifact = train_model(nta_feature_table(args.db))
+    print(f"Saved model to {save_model(artifact, args.output)}")
+    for key, value in artifact.items():
+        if key != 'model':
+            print(f"{key}: {value}")
+    coefs = artifact['model'][-1].coef_[0]
+    print("\nStandardized coefficients:")
+    for name, coef in zip(artifact['features'], coefs):
+        print(f"  {name}: {coef:+.3f}")
@@ -0,0 +1,194 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from access import SiteTrees, nta_origins, project_km
+from config import COVERAGE_MODEL, DIM_MAP_CLEAN, PRIORITIZATION_RAW, STAR_SCHEMA_DB
+from features import nta_feature_table
+from schemas import read_table
+
+# -----------------------------
+# In-memory NTA lookups for the app
+# Everything a page view needs is computed once at start-up: the model score
+# of every NTA (one vectorized predict_proba call), coverage rank, and the k
+# nearest EFAP sites (one KD-tree query, access.SiteTrees). Selecting an NTA
+# is then a dict lookup.
+# -----------------------------
+
+def nta_centroids(nta_ids, sites):
+    """(lat, lon) reference point per NTA.
+
+    The area-weighted centroid of the NTA geometry when dim_map.csv is
+    available, else the NTA's point in the prioritization file (as
+    access.nta_origins), else the mean location of the sites mapped to the
+    NTA (NaN for NTAs with none of these).
+    """
+    points = pd.DataFrame(index=pd.Index(nta_ids, name='nta_id'), columns=['lat', 'lon'], dtype=float)
+    if os.path.exists(DIM_MAP_CLEAN):
+        from spatial_join import parse_wkt_multipolygon
+        dim_map = read_table('dim_map', columns=['nta_id', 'the_geom_wkt'])
+        for nta_id, wkt in zip(dim_map['nta_id'], dim_map['the_geom_wkt']):
+            if nta_id not in points.index or not isinstance(wkt, str):
+                continue
+            area = cx = cy = 0.0
+            for polygon in parse_wkt_multipolygon(wkt):
+                x, y = polygon[0][:, 0], polygon[0][:, 1]
+                cross = x * np.roll(y, -1) - np.roll(x, -1) * y
+                area += cross.sum() / 2
+                cx += ((x + np.roll(x, -1)) * cross).sum() / 6
+                cy += ((y + np.roll(y, -1)) * cross).sum() / 6
+            if area:
+                points.loc[nta_id] = [cy / area, cx / area]
+    if os.path.exists(PRIORITIZATION_RAW):
+        origins = nta_origins().drop_duplicates('nta_id').set_index('nta_id')[['lat', 'lon']]
+        points = points.fillna(origins.reindex(points.index))
+    by_sites = sites.groupby('nta_id')[['lat', 'lon']].mean()
+    return points.fillna(by_sites.reindex(points.index))
+
+
+class NTALookup:
+    """Precomputed per-NTA answers.
+
+    features -- nta_feature_table() frame
+    sites    -- one row per EFAP site with efap_id, program_name, access_type,
+                weekend_available, nta_id, lat, lon
+    artifact -- model artifact from model_training (optional; without it
+                there is no high_coverage_probability column)
+    k        -- number of nearest sites kept per NTA
+    """
+
+    def __init__(self, features, sites, artifact=None, k=5):
+        features = features.reset_index(drop=True).copy()
+        features['coverage_rank'] = features['coverage_ratio'].rank(ascending=False, method='min')
+        if artifact is not None:
+            X = features[artifact['features']]
+            features['high_coverage_probability'] = artifact['model'].predict_proba(X)[:, 1]
+            features['predicted_high_coverage'] = (features['high_coverage_probability'] >= 0.5).astype(int)
+        self.features = features
+        self.has_model = artifact is not None
+        self.nta_ids = features['nta_id'].tolist()
+
+        sites = sites.dropna(subset=['lat', 'lon']).reset_index(drop=True)
+        centroids = nta_centroids(self.nta_ids, sites)
+        located = centroids['lat'].notna().to_numpy()
+        k = min(k, len(sites))
+        distances = np.full((len(centroids), k), np.inf)
+        nearest = np.full((len(centroids), k), -1)
+        if k and located.any():
+            trees = SiteTrees(sites)
+            origins = project_km(centroids['lat'].to_numpy()[located], centroids['lon'].to_numpy()[located])
+            distances[located], nearest[located] = trees.knn(origins, k)
+
+        site_columns = ['efap_id', 'program_name', 'access_type', 'weekend_available', 'nta_id', 'lat', 'lon']
+        self.profiles, self.nearest = {}, {}
+        for row, record in enumerate(features.to_dict('records')):
+            nta_id = record['nta_id']
+            self.profiles[nta_id] = record
+            found = nearest[row] >= 0
+            picked = sites.iloc[nearest[row][found]][site_columns].reset_index(drop=True)
+            self.nearest[nta_id] = picked.assign(distance_km=distances[row][found].round(2))
+
+    def label(self, nta_id):
+        record = self.profiles[nta_id]
+        name = record.get('nta_name')
+        return f"{nta_id} - {name}" if name and name != nta_id else nta_id
+
+    def lookup(self, nta_id):
+        """(profile dict, nearest sites frame) for one NTA."""
+        return self.profiles[nta_id], self.nearest[nta_id]
+
+
+def load_sites():
+    # the access flags are what access.SiteTrees builds its subset trees from
+    efap = read_table('efap_cleaned', columns=['efap_id', 'program_name', 'access_type', 'has_pantry_access',
+                                               'has_kitchen_access', 'weekend_available'])
+    mapping = read_table('efap_nta_mapping')
+    return mapping.merge(efap, on='efap_id', how='left')
+
+
+def load_artifact(model_path=COVERAGE_MODEL):
+    """(artifact, source): the saved model, or (None, 'missing') when none has been saved.
+
+    The model is never fitted here: cross-validated training would blow the
+    app's cold-start budget. Run model_training.py to save one.
+    """
+    if not os.path.exists(model_path):
+        print(f"No model at {model_path}; run python/src/model_training.py to add the model scores")
+        return None, 'missing'
+    from model_training import load_model
+    return load_model(model_path), 'saved'
+
+
+def build_lookup(db_path=STAR_SCHEMA_DB, model_path=COVERAGE_MODEL, k=5):
+    """Build the NTALookup; returns (lookup, {step: seconds})."""
+    timings = {}
+    start = time.perf_counter()
+    features = nta_feature_table(db_path)
+    timings['features'] = time.perf_counter() - start
+
+    step = time.perf_counter()
+    artifact, source = load_artifact(model_path)
+    timings[f'model ({source})'] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    sites = load_sites()
+    timings['sites'] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    lookup = NTALookup(features, sites, artifact, k=k)
+    timings['precompute'] = time.perf_counter() - step
+    timings['total'] = time.perf_counter() - start
+    return lookup, {key: round(value, 4) for key, value in timings.items()}
+
+
+# -----------------------------
+# Benchmark: cold start in a fresh interpreter, then every NTA once
+# -----------------------------
+
+def _measure():
+    start = time.perf_counter()
+    lookup, timings = build_lookup()
+    cold = time.perf_counter() - start
+    per_lookup = []
+    for nta_id in lookup.nta_ids:
+        step = time.perf_counter()
+        lookup.lookup(nta_id)
+        per_lookup.append(time.perf_counter() - step)
+    print(json.dumps({'cold_start_s': round(cold, 3), 'steps': timings, 'ntas': len(lookup.nta_ids),
+                      'lookup_ms_mean': round(np.mean(per_lookup) * 1000, 4),
+                      'lookup_ms_max': round(np.max(per_lookup) * 1000, 4)}))
+
+
+def benchmark():
+    """Import + build time in a fresh process (what a cold app start pays) and lookup latency."""
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, __file__, '--measure'], capture_output=True, text=True,
+                         check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    result['process_s'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the per-NTA lookups used by deployment/app.py.')
+    parser.add_argument('--benchmark', action='store_true', help='time a cold build and every NTA lookup')
+    parser.add_argument('--measure', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        _measure()
+    elif args.benchmark:
+        result = benchmark()
+        for key, value in result.items():
+            print(f"{key}: {value}")
+        print(f"targets: cold start < 2s -> {'ok' if result['process_s'] < 2 else 'MISSED'}, "
+              f"interaction < 100ms -> {'ok' if result['lookup_ms_max'] < 100 else 'MISSED'}")
+    else:
+        lookup, timings = build_lookup()
+        print(f"Built lookups for {len(lookup.nta_ids)} NTAs: {timings}")
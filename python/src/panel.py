@@ -0,0 +1,200 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import SHELTER_CENSUS_CLEAN, SHELTER_PANEL_DIR
+from create_schema import cdta_id_from_district
+from schemas import read_table
+
+# -----------------------------
+# Shelter census panel cube
+# The long shelter census table reshaped once into a dense float32 array
+# with axes (district, month, facility type):
+#   district -- borough + community district as a CDTA code ('BK01'), sorted,
+#               so the districts of a borough are contiguous
+#   month    -- every month from the first to the last report (YYYYMM); the
+#               months without a report are NaN and flagged in month_mask
+#   facility -- the three family shelter columns
+# Slices are numpy views, and rolling means, year-over-year deltas and
+# borough totals are single vectorized operations. The arrays are stored as
+# .npy files so they can be memory-mapped instead of rebuilt.
+# -----------------------------
+
+FACILITY_TYPES = ['family_with_children_commercial_hotel', 'family_with_children_shelter', 'family_cluster']
+
+
+class ShelterPanel:
+    def __init__(self, values, month_mask, districts, months):
+        self.values = values                    # (n_districts, n_months, n_facilities) float32
+        self.month_mask = month_mask            # (n_months,) True where a census was reported
+        self.districts = list(districts)        # CDTA codes, borough-sorted
+        self.months = np.asarray(months)        # YYYYMM ints, consecutive months
+        self.facilities = list(FACILITY_TYPES)
+        self._district_pos = {d: i for i, d in enumerate(self.districts)}
+        self._month_pos = {int(m): i for i, m in enumerate(self.months)}
+
+    @property
+    def boroughs(self):
+        return [d[:2] for d in self.districts]
+
+    # -- slicing (views) --
+
+    def _pos(self, key, positions):
+        if key is None:
+            return slice(None)
+        if isinstance(key, slice):
+            start = positions[key.start] if key.start is not None else None
+            stop = positions[key.stop] + 1 if key.stop is not None else None
+            return slice(start, stop)
+        return positions[key]
+
+    def sel(self, district=None, month=None, facility=None):
+        """Label-based view, e.g. sel('BX05'), sel(month=slice(202001, 202012)), sel(facility='family_cluster').
+
+        Month slices include both ends. Scalars drop their axis.
+        """
+        facility_pos = {f: i for i, f in enumerate(self.facilities)}
+        return self.values[self._pos(district, self._district_pos), self._pos(month, self._month_pos),
+                           self._pos(facility, facility_pos)]
+
+    def total(self):
+        """(district, month) total across facility types (NaN for missing months)."""
+        return self.values.sum(axis=2)
+
+    # -- vectorized time-series operations --
+
+    def rolling_mean(self, window=3, min_periods=1):
+        """Trailing mean over `window` months for every district and facility.
+
+        Missing months are skipped (cumulative sums of values and of
+        observation counts); NaN where fewer than min_periods months exist.
+        """
+        observed = ~np.isnan(self.values)
+        filled = np.where(observed, self.values, 0).astype(np.float64)
+        zero = np.zeros_like(filled[:, :1])
+        sums = np.concatenate([zero, filled.cumsum(axis=1)], axis=1)
+        counts = np.concatenate([zero, observed.cumsum(axis=1, dtype=np.float64)], axis=1)
+        window_sum = sums[:, window:] - sums[:, :-window]
+        window_count = counts[:, window:] - counts[:, :-window]
+        # the first window-1 months have shorter windows
+        head_sum, head_count = sums[:, 1:window], counts[:, 1:window]
+        window_sum = np.concatenate([head_sum, window_sum], axis=1)
+        window_count = np.concatenate([head_count, window_count], axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = window_sum / window_count
+        return np.where(window_count >= min_periods, mean, np.nan).astype(np.float32)
+
+    def yoy_delta(self):
+        """values - values 12 months earlier; the first 12 months are NaN."""
+        delta = np.full_like(self.values, np.nan)
+        np.subtract(self.values[:, 12:], self.values[:, :-12], out=delta[:, 12:])
+        return delta
+
+    def borough_rollup(self):
+        """(borough labels, (n_boroughs, n_months, n_facilities) sums); missing months stay NaN."""
+        boroughs = self.boroughs
+        starts = [i for i, b in enumerate(boroughs) if i == 0 or b != boroughs[i - 1]]
+        sums = np.add.reduceat(np.nan_to_num(self.values), starts, axis=0)
+        sums[:, ~self.month_mask] = np.nan
+        return [boroughs[i] for i in starts], sums
+
+    def to_frame(self, values=None):
+        """Long frame (district, month, facility -> value) of the cube or of a derived array."""
+        values = self.values if values is None else values
+        index = pd.MultiIndex.from_product([self.districts, self.months, self.facilities],
+                                           names=['cdta_id', 'date_id', 'facility'])
+        return pd.Series(values.reshape(-1), index=index, name='value').reset_index()
+
+    # -- persistence --
+
+    def save(self, path=SHELTER_PANEL_DIR):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'values.npy'), self.values)
+        np.save(os.path.join(path, 'month_mask.npy'), self.month_mask)
+        with open(os.path.join(path, 'axes.json'), 'w') as f:
+            json.dump({'districts': self.districts, 'months': [int(m) for m in self.months],
+                       'facilities': self.facilities}, f)
+        return path
+
+    @classmethod
+    def load(cls, path=SHELTER_PANEL_DIR, mmap=True):
+        """Load a saved panel; with mmap the values are memory-mapped read-only."""
+        with open(os.path.join(path, 'axes.json')) as f:
+            axes = json.load(f)
+        if axes['facilities'] != FACILITY_TYPES:
+            raise ValueError(f"Panel at {path} has facility axis {axes['facilities']}, expected {FACILITY_TYPES}")
+        values = np.load(os.path.join(path, 'values.npy'), mmap_mode='r' if mmap else None)
+        month_mask = np.load(os.path.join(path, 'month_mask.npy'))
+        return cls(values, month_mask, axes['districts'], axes['months'])
+
+
+def build_panel(census):
+    """Build the cube from the cleaned shelter census frame."""
+    report_date = pd.to_datetime(census['report_date'])
+    census = census.assign(cdta_id=cdta_id_from_district(census['borough'], census['community_districts']),
+                           date_id=report_date.dt.year * 100 + report_date.dt.month)
+    census = census.dropna(subset=['cdta_id'])
+    cells = census.groupby(['cdta_id', 'date_id'])[FACILITY_TYPES].sum()
+
+    districts = sorted(cells.index.get_level_values('cdta_id').unique())
+    reported = cells.index.get_level_values('date_id')
+    first, last = pd.Period(str(reported.min()), 'M'), pd.Period(str(reported.max()), 'M')
+    months = np.array([p.year * 100 + p.month for p in pd.period_range(first, last, freq='M')])
+
+    values = np.full((len(districts), len(months), len(FACILITY_TYPES)), np.nan, dtype=np.float32)
+    d = pd.Index(districts).get_indexer(cells.index.get_level_values('cdta_id'))
+    m = pd.Index(months).get_indexer(reported)
+    values[d, m] = cells.to_numpy(dtype=np.float32)
+    month_mask = np.isin(months, reported.unique())
+    return ShelterPanel(values, month_mask, districts, months)
+
+
+def build_and_save(census_path=SHELTER_CENSUS_CLEAN, path=SHELTER_PANEL_DIR):
+    panel = build_panel(read_table('shelter_census_clean', census_path))
+    panel.save(path)
+    return panel
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the district x month x facility shelter panel.')
+    parser.add_argument('--input', default=SHELTER_CENSUS_CLEAN)
+    parser.add_argument('--output', default=SHELTER_PANEL_DIR)
+    parser.add_argument('--benchmark', action='store_true', help='compare with the equivalent pandas groupby/pivot')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    panel = build_and_save(args.input, args.output)
+    print(f"Built {panel.values.shape} panel in {time.perf_counter() - start:.3f}s -> {args.output}")
+    missing = panel.months[~panel.month_mask]
+    print(f"Months without a report: {missing.tolist()}")
+
+    if args.benchmark:
+        def timed(fn, repeat=20):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                fn()
+            return round((time.perf_counter() - start) / repeat * 1000, 3)
+
+        census = read_table('shelter_census_clean', args.input)
+        census['cdta_id'] = cdta_id_from_district(census['borough'], census['community_districts'])
+
+        def pandas_rolling():
+            wide = census.pivot_table(index='report_date', columns='cdta_id', values=FACILITY_TYPES, aggfunc='sum')
+            return wide.rolling(3, min_periods=1).mean()
+
+        def pandas_boroughs():
+            return census.groupby(['report_date', 'borough'], observed=True)[FACILITY_TYPES].sum()
+
+        mapped = ShelterPanel.load(args.output)
+        print({
+            'load_mmap_ms': timed(lambda: ShelterPanel.load(args.output)),
+            'pandas_pivot_rolling_ms': timed(pandas_rolling),
+            'panel_rolling_ms': timed(lambda: mapped.rolling_mean(3)),
+            'pandas_borough_groupby_ms': timed(pandas_boroughs),
+            'panel_borough_rollup_ms': timed(mapped.borough_rollup),
+            'panel_yoy_ms': timed(mapped.yoy_delta),
+        })
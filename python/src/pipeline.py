@@ -0,0 +1,358 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pandas as pd
+
+import create_schema
+from instrument import RunReport, measure
+from schemas import read_raw, read_table, write_table
+from config import (
+    REPO_ROOT, CLEAN_DIR, PRIORITIZATION_RAW, SHELTER_CENSUS_RAW, NTA_RAW, EFAP_RAW,
+    PRIORITIZATION_CLEAN, SHELTER_CENSUS_CLEAN, DIM_MAP_CLEAN, EFAP_CLEAN, EFAP_NTA_MAPPING,
+    EFAP_SCHEDULE, STAR_SCHEMA_DB, SHELTER_PANEL_DIR, GEO_TILE_DIR,
+)
+
+# -----------------------------
+# Incremental pipeline runner
+# create_schema.py cleans every dataset on every run. Here each dataset is a
+# stage with declared inputs and outputs; raw inputs (and the code of the
+# stage) are fingerprinted with sha256 and a stage is skipped when nothing it
+# reads has changed since its last successful run. Stages that do not depend
+# on each other run in parallel processes. Every stage that runs is timed
+# and its peak memory sampled (instrument.py); the records go to
+# data/reports/pipeline_report.json / .csv.
+# -----------------------------
+
+SRC_DIR = Path(__file__).resolve().parent
+MANIFEST_PATH = CLEAN_DIR / '.pipeline_manifest.json'
+
+
+@dataclass
+class Stage:
+    name: str
+    inputs: list
+    outputs: list
+    run: object
+    code: list = field(default_factory=lambda: [SRC_DIR / 'create_schema.py', SRC_DIR / 'schemas.py'])
+    options: list = field(default_factory=list)     # run_pipeline options passed on to run
+
+
+# -----------------------------
+# Stage bodies (module-level so they can run in worker processes); each
+# returns (rows read, rows written) for the run report
+# -----------------------------
+
+def run_prioritization(force=False):
+    raw = read_raw('prioritization_raw')
+    clean = write_table(create_schema.clean_prioritization(raw), 'prioritization_clean')
+    return len(raw), len(clean)
+
+
+def run_shelter_census(force=False):
+    # chunked, incremental: only months newer than the store are parsed
+    from census_ingest import ingest_census
+    from panel import build_and_save
+    stats = ingest_census(full=force)
+    print(f"Shelter census ingest: {stats}")
+    # dense district x month x facility cube for the time-series work
+    print(f"Shelter panel: {build_and_save().values.shape}")
+    return stats['rows_read'], stats['rows_written']
+
+
+def run_nta(force=False):
+    raw = read_raw('nta_raw')
+    return len(raw), len(write_table(create_schema.clean_nta(raw), 'dim_map'))
+
+
+def run_efap(force=False):
+    raw = read_raw('efap_raw')
+    return len(raw), len(write_table(create_schema.clean_efap(raw), 'efap_cleaned'))
+
+
+def run_efap_schedule(force=False):
+    from schedule import schedule_frame
+    raw = read_raw('efap_raw')
+    return len(raw), len(write_table(schedule_frame(raw), 'efap_schedule'))
+
+
+def keep_previous_mapping(mapping, previous, efap_ids):
+    """Mapping plus the previous rows of the sites still in efap_ids that were not located this run.
+
+    Rows follow the order of efap_ids.
+    """
+    kept = previous[previous['efap_id'].isin(efap_ids) & ~previous['efap_id'].isin(mapping['efap_id'])]
+    merged = pd.concat([mapping, kept], ignore_index=True) if len(kept) else mapping
+    order = pd.Index(efap_ids).get_indexer(merged['efap_id'])
+    return merged.iloc[order.argsort(kind='stable')].reset_index(drop=True), len(kept)
+
+
+def run_efap_nta_mapping(force=False, allow_fewer_sites=False):
+    # allow_fewer_sites lets the mapping lose sites that were removed from the
+    # export; it is separate from force so a forced rebuild during a
+    # Geoclient outage still keeps the previous mapping
+    # imported here so the other stages do not need requests installed
+    from geocode import geocode_efap
+    from spatial_join import NTAIndex, build_efap_nta_mapping
+
+    raw = read_raw('efap_raw')
+    geocoded, stats = geocode_efap(raw)
+    print(f"Geocoding: {stats}")
+    sites = geocoded.rename(columns={'ID': 'efap_id', 'latitude': 'lat', 'longitude': 'lon'})
+    mapping = build_efap_nta_mapping(sites, NTAIndex(read_table('dim_map')))
+
+    # a missing GEOCLIENT_KEY or an outage fails every lookup: sites that were
+    # not located this run keep their previous row instead of disappearing
+    if os.path.exists(EFAP_NTA_MAPPING):
+        previous = read_table('efap_nta_mapping')
+        mapping, kept = keep_previous_mapping(mapping, previous, raw['ID'].dropna().astype(int))
+        if kept:
+            print(f"Kept the previous NTA of {kept} sites that were not located this run")
+        if len(mapping) < len(previous) and not allow_fewer_sites:
+            raise RuntimeError(f"The new EFAP -> NTA mapping has {len(mapping)} sites, fewer than the "
+                               f"{len(previous)} in {EFAP_NTA_MAPPING}; not overwriting it (rerun with "
+                               f"--allow-fewer-sites if sites were removed from the EFAP export)")
+    return len(raw), len(write_table(mapping, 'efap_nta_mapping'))
+
+
+def run_geo_tiles(force=False):
+    # simplified NTA geometries per zoom level for the map views
+    from geo_tiles import build_tiles
+    dim_map = read_table('dim_map', columns=['nta_id', 'the_geom_wkt'])
+    index = build_tiles(dim_map)
+    print(f"Geometry tiles: {len(index)} NTAs")
+    return len(dim_map), len(index)
+
+
+def run_star_schema(force=False):
+    # only the changed rows and the coverage rows they affect are rewritten
+    from coverage import sync_database
+    from load_sqlite import build_tables, load_star_schema
+    tables = build_tables()
+    stats = load_star_schema(tables=tables) if force else sync_database(tables=tables)
+    print(f"Star schema: {stats}")
+    # rows out: rows written to the database (a sync rewrites only what changed)
+    loaded = stats.get('created', stats)
+    if 'rows' in loaded:
+        written = sum(loaded['rows'].values())
+    else:
+        written = sum(c['upserted'] for c in stats['changes'].values()) + stats['coverage_rows_written']
+    return sum(len(frame) for frame in tables.values()), written
+
+
+STAGES = [
+    Stage('prioritization', [PRIORITIZATION_RAW], [PRIORITIZATION_CLEAN], run_prioritization),
+    Stage('shelter_census', [SHELTER_CENSUS_RAW], [SHELTER_CENSUS_CLEAN, SHELTER_PANEL_DIR / 'values.npy'],
+          run_shelter_census, code=[SRC_DIR / 'census_ingest.py', SRC_DIR / 'panel.py', SRC_DIR / 'schemas.py']),
+    Stage('nta', [NTA_RAW], [DIM_MAP_CLEAN], run_nta),
+    Stage('efap', [EFAP_RAW], [EFAP_CLEAN], run_efap),
+    Stage('efap_schedule', [EFAP_RAW], [EFAP_SCHEDULE], run_efap_schedule,
+          code=[SRC_DIR / 'schedule.py', SRC_DIR / 'schemas.py']),
+    Stage('efap_nta_mapping', [EFAP_RAW, DIM_MAP_CLEAN], [EFAP_NTA_MAPPING], run_efap_nta_mapping,
+          code=[SRC_DIR / 'geocode.py', SRC_DIR / 'spatial_join.py', SRC_DIR / 'schemas.py'],
+          options=['allow_fewer_sites']),
+    Stage('geo_tiles', [DIM_MAP_CLEAN], [GEO_TILE_DIR / 'index.csv'], run_geo_tiles,
+          code=[SRC_DIR / 'geo_tiles.py', SRC_DIR / 'spatial_join.py', SRC_DIR / 'schemas.py']),
+    Stage('star_schema', [PRIORITIZATION_CLEAN, SHELTER_CENSUS_CLEAN, EFAP_CLEAN, EFAP_NTA_MAPPING, DIM_MAP_CLEAN],
+          [STAR_SCHEMA_DB], run_star_schema,
+          code=[SRC_DIR / 'load_sqlite.py', SRC_DIR / 'coverage.py', SRC_DIR / 'schemas.py',
+                REPO_ROOT / 'sql' / 'data_processing.sql']),
+]
+
+
+# -----------------------------
+# Fingerprints
+# -----------------------------
+
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return {'files': {}, 'stages': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def _key(path):
+    return os.path.relpath(path, REPO_ROOT)
+
+
+def file_hash(path, manifest):
+    """sha256 of a file, reusing the stored hash while size and mtime are unchanged."""
+    stat = os.stat(path)
+    key = _key(path)
+    known = manifest['files'].get(key)
+    if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+        return known['sha256']
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    manifest['files'][key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+    return digest.hexdigest()
+
+
+def stage_fingerprint(stage, manifest):
+    files = list(stage.inputs) + list(stage.code)
+    return {_key(path): file_hash(path, manifest) for path in files}
+
+
+def is_up_to_date(stage, fingerprint, manifest):
+    previous = manifest['stages'].get(stage.name)
+    return (previous is not None
+            and previous['fingerprint'] == fingerprint
+            and all(os.path.exists(path) for path in stage.outputs))
+
+
+def stage_waves(stages):
+    """Group stages into waves; a stage runs after every stage producing one of its inputs."""
+    produced_by = {str(out): stage.name for stage in stages for out in stage.outputs}
+    remaining = {stage.name: stage for stage in stages}
+    done, waves = set(), []
+    while remaining:
+        wave = [stage for stage in remaining.values()
+                if all(produced_by.get(str(path)) in done | {None} for path in stage.inputs)]
+        if not wave:
+            raise ValueError(f"Cyclic stage dependencies: {sorted(remaining)}")
+        waves.append(wave)
+        for stage in wave:
+            done.add(stage.name)
+            del remaining[stage.name]
+    return waves
+
+
+def _refresh_columnar_cache(outputs):
+    try:
+        from columnar_cache import refresh_cache
+    except ImportError:
+        print("pyarrow not installed; skipping the columnar cache")
+        return
+    refresh_cache(outputs)
+
+
+def _timed(name, run, force, outputs, verbose=False, options=None):
+    # set here as well so worker processes pick it up
+    create_schema.VERBOSE = verbose
+    with measure(name) as record:
+        counts = run(force=force, **(options or {}))
+        if counts is not None:
+            record['rows_in'], record['rows_out'] = (int(n) for n in counts)
+        _refresh_columnar_cache(outputs)
+    return record
+
+
+# -----------------------------
+# Runner
+# -----------------------------
+
+def run_pipeline(only=None, force=False, workers=None, dry_run=False, manifest_path=MANIFEST_PATH,
+                 verbose=False, report=None, allow_fewer_sites=False):
+    """Run the stages whose inputs changed; returns {stage name: status}.
+
+    only    -- optional list of stage names to consider (their upstream stages are not forced)
+    force   -- rebuild even when fingerprints match
+    workers -- process pool size for independent stages (1 runs everything in-process)
+    dry_run -- only report what would run
+    verbose -- print the exploratory diagnostics of the cleaning functions
+    report  -- optional instrument.RunReport collecting a record per stage that ran
+    allow_fewer_sites -- let the EFAP -> NTA mapping shrink (force never does)
+    """
+    stages = [stage for stage in STAGES if only is None or stage.name in only]
+    manifest = load_manifest(manifest_path)
+    options = {'allow_fewer_sites': allow_fewer_sites}
+    results = {}
+
+    def args(stage):
+        return (stage.name, stage.run, force, stage.outputs, verbose,
+                {name: options[name] for name in stage.options})
+
+    for wave in stage_waves(stages):
+        to_run = []
+        for stage in wave:
+            missing = [str(path) for path in stage.inputs if not os.path.exists(path)]
+            if missing:
+                results[stage.name] = 'missing input: ' + ', '.join(missing)
+                continue
+            fingerprint = stage_fingerprint(stage, manifest)
+            if not force and is_up_to_date(stage, fingerprint, manifest):
+                results[stage.name] = 'up to date'
+                continue
+            to_run.append((stage, fingerprint))
+
+        if dry_run:
+            results.update({stage.name: 'would run' for stage, _ in to_run})
+            continue
+
+        # a failed stage does not discard its siblings: every stage of the wave
+        # is collected on its own and the failure re-raised once the finished
+        # ones are in the manifest
+        outcomes = []
+        if len(to_run) > 1 and workers != 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [(stage, fingerprint, pool.submit(_timed, *args(stage))) for stage, fingerprint in to_run]
+                for stage, fingerprint, future in futures:
+                    try:
+                        outcomes.append((stage, fingerprint, future.result(), None))
+                    except Exception as exc:
+                        outcomes.append((stage, fingerprint, None, exc))
+        else:
+            for stage, fingerprint in to_run:
+                try:
+                    outcomes.append((stage, fingerprint, _timed(*args(stage)), None))
+                except Exception as exc:
+                    outcomes.append((stage, fingerprint, None, exc))
+
+        failures = []
+        for stage, fingerprint, record, error in outcomes:
+            if error is not None:
+                failures.append(error)
+                results[stage.name] = f'failed: {error!r}'
+                continue
+            if report is not None:
+                report.add(record)
+            seconds = record['seconds']
+            manifest['stages'][stage.name] = {'fingerprint': fingerprint, 'seconds': round(seconds, 3),
+                                              'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+            results[stage.name] = f'rebuilt in {seconds:.2f}s'
+        # save after every wave so a later failure does not lose finished work
+        save_manifest(manifest, manifest_path)
+        if failures:
+            for name, status in results.items():
+                print(f"{name}: {status}")
+            raise failures[0]
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild the cleaned datasets whose raw inputs changed.')
+    parser.add_argument('stages', nargs='*', help=f"stages to consider (default: all of {[s.name for s in STAGES]})")
+    parser.add_argument('--force', action='store_true', help='rebuild even if inputs are unchanged')
+    parser.add_argument('--workers', type=int, default=None, help='parallel worker processes (1 = serial)')
+    parser.add_argument('--dry-run', action='store_true', help='only show which stages would run')
+    parser.add_argument('--verbose', action='store_true', help='print the exploratory diagnostics of every dataset')
+    parser.add_argument('--allow-fewer-sites', action='store_true',
+                        help='let the EFAP -> NTA mapping drop sites that were removed from the EFAP export')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = RunReport('pipeline')
+    statuses = run_pipeline(only=args.stages or None, force=args.force, workers=args.workers, dry_run=args.dry_run,
+                            verbose=args.verbose or create_schema.VERBOSE, report=report,
+                            allow_fewer_sites=args.allow_fewer_sites)
+    print("\n\n--- Pipeline summary ---")
+    for name, status in statuses.items():
+        print(f"{name}: {status}")
+    print(f"Total: {time.perf_counter() - start:.2f}s")
+    if report.records:
+        print(report.format())
+        print(f"Report saved to {report.write()[0]}")
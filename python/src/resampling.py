@@ -0,0 +1,197 @@
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from config import STAR_SCHEMA_DB
+from features import coverage_labels, nta_feature_table
+
+# -----------------------------
+# Permutation and bootstrap tests for coverage differences
+# With ~200 NTAs the group comparisons (priority vs non-priority, one
+# borough vs the rest, high vs low shelter concentration) are tested by
+# resampling. Resamples are drawn as index matrices, a batch of B
+# permutations is one (B, n) array, and the group means come from a single
+# gather + sum per batch. Each batch has its own child of one SeedSequence,
+# so results are identical whatever the number of worker processes.
+# Proportion tests are the same test on a 0/1 value.
+# -----------------------------
+
+BATCH_SIZE = 2000
+
+
+def _batches(n_resamples, batch_size):
+    sizes = [batch_size] * (n_resamples // batch_size)
+    if n_resamples % batch_size:
+        sizes.append(n_resamples % batch_size)
+    return sizes
+
+
+def _permutation_batch(args):
+    """Null distribution of mean(group) - mean(rest) for one batch of permutations."""
+    values, n_group, size, seed = args
+    rng = np.random.default_rng(seed)
+    # argsort of uniform keys gives a (size, n) matrix of independent permutations
+    index = np.argsort(rng.random((size, len(values))), axis=1)[:, :n_group]
+    group_sum = values[index].sum(axis=1)
+    return group_sum / n_group - (values.sum() - group_sum) / (len(values) - n_group)
+
+
+def _bootstrap_batch(args):
+    """Bootstrap distribution of mean(group) - mean(rest), resampling within each group."""
+    group_values, rest_values, size, seed = args
+    rng = np.random.default_rng(seed)
+    group_mean = group_values[rng.integers(0, len(group_values), (size, len(group_values)))].mean(axis=1)
+    rest_mean = rest_values[rng.integers(0, len(rest_values), (size, len(rest_values)))].mean(axis=1)
+    return group_mean - rest_mean
+
+
+def _run(worker, jobs, workers):
+    if workers == 1 or len(jobs) == 1:
+        return np.concatenate([worker(job) for job in jobs])
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return np.concatenate(list(pool.map(worker, jobs)))
+
+
+def _clean(values, group):
+    values = np.asarray(values, dtype=np.float64)
+    group = np.asarray(group, dtype=bool)
+    keep = ~np.isnan(values)
+    values, group = values[keep], group[keep]
+    if group.all() or not group.any():
+        raise ValueError("Both sides of the split need at least one value")
+    return values, group
+
+
+def permutation_test(values, group, n_resamples=10_000, seed=0, workers=1, batch_size=BATCH_SIZE):
+    """Two-sided permutation test of mean(values[group]) - mean(values[~group]).
+
+    Returns (observed difference, p-value, null distribution). NaN values are dropped.
+    """
+    values, group = _clean(values, group)
+    observed = values[group].mean() - values[~group].mean()
+    sizes = _batches(n_resamples, batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    null = _run(_permutation_batch, [(values, int(group.sum()), size, s) for size, s in zip(sizes, seeds)], workers)
+    p_value = (np.sum(np.abs(null) >= abs(observed) - 1e-12) + 1) / (len(null) + 1)
+    return observed, p_value, null
+
+
+def bootstrap_ci(values, group, n_resamples=10_000, alpha=0.05, seed=0, workers=1, batch_size=BATCH_SIZE):
+    """Percentile bootstrap confidence interval of mean(values[group]) - mean(values[~group])."""
+    values, group = _clean(values, group)
+    sizes = _batches(n_resamples, batch_size)
+    seeds = np.random.SeedSequence([seed, 1]).spawn(len(sizes))
+    jobs = [(values[group], values[~group], size, s) for size, s in zip(sizes, seeds)]
+    diffs = _run(_bootstrap_batch, jobs, workers)
+    low, high = np.quantile(diffs, [alpha / 2, 1 - alpha / 2])
+    return low, high, diffs
+
+
+# -----------------------------
+# Splits of the NTA feature table
+# -----------------------------
+
+def split_masks(features, by, quantile=0.75):
+    """{label: boolean mask} for a split of the NTAs.
+
+    by -- 'weighted_score' / 'shelter' (NTAs at or above the quantile vs the
+    rest) or 'borough' (each borough vs the rest of the city).
+    """
+    if by == 'borough':
+        return {f'{boro} vs rest': (features['boro_name'] == boro).to_numpy()
+                for boro in sorted(features['boro_name'].dropna().unique())}
+    column = {'weighted_score': 'weighted_score', 'shelter': 'sheltered_population'}[by]
+    cutoff = features[column].quantile(quantile)
+    return {f'{column} >= q{quantile:g} ({cutoff:.2f})': (features[column] >= cutoff).to_numpy()}
+
+
+def compare(features, by, value='coverage_ratio', n_resamples=10_000, alpha=0.05, seed=0, workers=1,
+            quantile=0.75):
+    """Permutation p-value and bootstrap CI of the difference in `value` for every group of a split."""
+    rows = []
+    for label, mask in split_masks(features, by, quantile).items():
+        values = features[value].to_numpy(dtype=float)
+        observed, p_value, _ = permutation_test(values, mask, n_resamples, seed, workers)
+        low, high, _ = bootstrap_ci(values, mask, n_resamples, alpha, seed, workers)
+        valid = ~np.isnan(values)
+        rows.append({
+            'split': label, 'value': value,
+            'n_group': int((mask & valid).sum()), 'n_rest': int((~mask & valid).sum()),
+            'mean_group': np.nanmean(values[mask]), 'mean_rest': np.nanmean(values[~mask]),
+            'difference': observed, 'p_value': p_value,
+            f'ci{int((1 - alpha) * 100)}_low': low, f'ci{int((1 - alpha) * 100)}_high': high,
+        })
+    return pd.DataFrame(rows)
+
+
+# -----------------------------
+# Benchmark against a per-resample pandas loop
+# -----------------------------
+
+def naive_permutation_test(values, group, n_resamples, seed=0):
+    """Reference implementation: one shuffle and groupby per permutation."""
+    frame = pd.DataFrame({'value': values, 'group': group}).dropna()
+    means = frame.groupby('group')['value'].mean()
+    observed = means[True] - means[False]
+    rng = np.random.default_rng(seed)
+    null = []
+    for _ in range(n_resamples):
+        shuffled = frame.assign(group=rng.permutation(frame['group'].to_numpy()))
+        means = shuffled.groupby('group')['value'].mean()
+        null.append(means[True] - means[False])
+    null = np.array(null)
+    return observed, (np.sum(np.abs(null) >= abs(observed) - 1e-12) + 1) / (n_resamples + 1)
+
+
+def benchmark(features, n_resamples=10_000, naive_resamples=1_000, workers=None):
+    values = features['coverage_ratio'].to_numpy(dtype=float)
+    mask = next(iter(split_masks(features, 'weighted_score').values()))
+    results = {}
+
+    start = time.perf_counter()
+    _, p_naive = naive_permutation_test(values, mask, naive_resamples)
+    naive = time.perf_counter() - start
+    results['naive_loop_per_1k_s'] = round(naive / naive_resamples * 1000, 4)
+
+    for n_workers in sorted({1, workers or 1}):
+        start = time.perf_counter()
+        _, p_value, _ = permutation_test(values, mask, n_resamples, workers=n_workers)
+        elapsed = time.perf_counter() - start
+        results[f'batched_{n_workers}_workers_per_1k_s'] = round(elapsed / n_resamples * 1000, 4)
+        results[f'batched_{n_workers}_workers_p_value'] = round(p_value, 4)
+    results['naive_p_value'] = round(p_naive, 4)
+    results['speedup'] = round(results['naive_loop_per_1k_s'] / results['batched_1_workers_per_1k_s'], 1)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Permutation / bootstrap tests of coverage differences between NTA groups.')
+    parser.add_argument('--by', nargs='+', default=['weighted_score', 'borough', 'shelter'],
+                        choices=['weighted_score', 'borough', 'shelter'])
+    parser.add_argument('--value', default='coverage_ratio',
+                        help="column to compare; 'high_coverage' tests the proportion of high-coverage NTAs")
+    parser.add_argument('--resamples', type=int, default=10_000)
+    parser.add_argument('--quantile', type=float, default=0.75)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--db', default=STAR_SCHEMA_DB)
+    parser.add_argument('--benchmark', action='store_true', help='time batched resampling against a pandas loop')
+    args = parser.parse_args()
+
+    features = nta_feature_table(args.db)
+    features['high_coverage'] = coverage_labels(features)[0]
+
+    if args.benchmark:
+        for key, value in benchmark(features, args.resamples, workers=args.workers).items():
+            print(f"{key}: {value}")
+    else:
+        start = time.perf_counter()
+        results = pd.concat([compare(features, by, args.value, args.resamples, seed=args.seed,
+                                     workers=args.workers, quantile=args.quantile) for by in args.by])
+        pd.set_option('display.width', 200)
+        print(results.round(4).to_string(index=False))
+        print(f"\n{args.resamples} permutations + {args.resamples} bootstrap resamples per split "
+              f"in {time.perf_counter() - start:.2f}s")
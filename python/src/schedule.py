@@ -0,0 +1,297 @@
+import argparse
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import EFAP_RAW, EFAP_SCHEDULE
+from schemas import read_raw, read_table, write_table
+
+# -----------------------------
+# EFAP schedule parser
+# weekday_available / weekend_available only say whether a day name appears
+# somewhere in DAYS. Here each DAYS string ("MON-FRI 10:30AM-12:30PM",
+# "TUE,WED,THUR 1:30-3PM", "M,W/TU,TH 9A-2P/11A-2P") is compiled into a 7 x 48
+# half-hour bitmap: one uint64 per weekday (Monday first) with bit k set when
+# the site is open during slot k (k=0 is 00:00-00:30). Questions like "open
+# Saturday after 5pm" or "open hours per week" become bitwise operations on an
+# (n_sites, 7) uint64 array.
+# -----------------------------
+
+DAY_NAMES = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+SLOTS_PER_DAY = 48
+
+DAY_ALIASES = {
+    'M': 0, 'MO': 0, 'MON': 0,
+    'TU': 1, 'TUE': 1, 'TUES': 1,
+    'W': 2, 'WE': 2, 'WED': 2,
+    'TH': 3, 'THU': 3, 'THUR': 3, 'THURS': 3,
+    'F': 4, 'FR': 4, 'FRI': 4,
+    'SA': 5, 'SAT': 5,
+    'SU': 6, 'SUN': 6,
+}
+
+# week-of-month qualifiers: parentheticals made of week numbers, ordinals and
+# LAST ("(1,3)", "(2ND)", "(1, LAST)", "(4TH ONLY)") and a bare "1ST SAT"
+_WEEKS_RE = re.compile(r'\(\s*,?\s*(?:(?:\d(?:ST|ND|RD|TH)?|LAST)\s*[,&]?\s*)+(?:ONLY\s*)?\)')
+_ORDINAL_RE = re.compile(r'\b\d(?:ST|ND|RD|TH)\b\s*')
+# any other parenthetical is a note and says nothing about the week:
+# "(INFO BY ZIP CODE IN ALPHA ORDER)", "(SR ONLY)", "(CLOSED 5TH WED)"
+_NOTE_RE = re.compile(r'\([^)]*\)')
+_TIME_RE = re.compile(
+    r'(?P<sh>\d{1,2})(?::(?P<sm>\d{1,2}))?\s*(?P<sp>[AP])?M?\s*-\s*:?'
+    r'(?P<eh>\d{1,2})(?::(?P<em>\d{1,2}))?\s*(?P<ep>[AP])?M?$')
+
+
+# -----------------------------
+# Parsing
+# -----------------------------
+
+def _parse_days(text):
+    """'MON-WED,FRI' -> [0, 1, 2, 4]; returns None when a token is not a day."""
+    days = []
+    for token in re.split(r'[,&]', text):
+        token = token.strip()
+        if not token:
+            continue
+        parts = [p.strip() for p in token.split('-')]
+        if len(parts) == 1:
+            if parts[0] not in DAY_ALIASES:
+                return None
+            days.append(DAY_ALIASES[parts[0]])
+        elif len(parts) == 2 and parts[0] in DAY_ALIASES and parts[1] in DAY_ALIASES:
+            first, last = DAY_ALIASES[parts[0]], DAY_ALIASES[parts[1]]
+            days.extend((first + i) % 7 for i in range((last - first) % 7 + 1))  # SUN-THUR wraps
+        else:
+            return None
+    return sorted(set(days)) or None
+
+
+def _to_minutes(hour, minute, meridiem):
+    hour = int(hour) % 12
+    if minute:
+        # '10:3A' is a typo for 10:30
+        minute = int(minute) * 10 if len(minute) == 1 else int(minute)
+    else:
+        minute = 0
+    return (hour + (12 if meridiem == 'P' else 0)) * 60 + minute
+
+
+def _parse_range(text):
+    """'9-11:30AM' -> (540, 690) minutes after midnight, or None."""
+    match = _TIME_RE.match(text.strip())
+    if match is None:
+        return None
+    g = match.groupdict()
+    sp, ep = g['sp'], g['ep']
+    if ep is None and sp is None:
+        # no AM/PM at all: assume daytime hours (8-11 morning, 12-7 afternoon)
+        sp = 'A' if 8 <= int(g['sh']) <= 11 else 'P'
+        ep = 'A' if 8 <= int(g['eh']) <= 11 else 'P'
+    elif ep is None:
+        ep = sp
+    elif sp is None:
+        sp = ep
+    start = _to_minutes(g['sh'], g['sm'], sp)
+    end = _to_minutes(g['eh'], g['em'], ep)
+    if start >= end and g['sp'] is None:
+        # '11-1PM', '9-5PM': the start is in the morning
+        start = _to_minutes(g['sh'], g['sm'], 'A')
+    if start >= end and g['ep'] is None:
+        end = _to_minutes(g['eh'], g['em'], 'P')
+    if start >= end or end > 24 * 60:
+        return None
+    return start, end
+
+
+def _slot_bits(start, end):
+    """uint64 with the half-hour slots overlapping [start, end) minutes set."""
+    first, last = start // 30, -(-end // 30)
+    return ((1 << last) - 1) ^ ((1 << first) - 1)
+
+
+def parse_schedule(text):
+    """Compile one DAYS string.
+
+    Returns (bits, status, monthly): bits is a list of 7 ints (Monday first),
+    status is 'ok', 'partial' (some day/hour groups could not be read) or
+    'unparsed', and monthly flags week-of-month qualifiers like "SAT (2,4)",
+    which the weekly bitmap treats as every week.
+    """
+    bits = [0] * 7
+    if not isinstance(text, str) or not text.strip():
+        return bits, 'unparsed', False
+    s = text.upper()
+    monthly = bool(_WEEKS_RE.search(s))
+    s = _NOTE_RE.sub('', _WEEKS_RE.sub('', s))
+    monthly = monthly or bool(_ORDINAL_RE.search(s))
+    s = _ORDINAL_RE.sub('', s)
+
+    first_digit = re.search(r'\d', s)
+    if first_digit is None:
+        return bits, 'unparsed', monthly
+    day_groups = s[:first_digit.start()].strip().split('/')
+    hour_groups = s[first_digit.start():].strip().split('/')
+
+    # "TUE,FRI/ 1-3PM/1-3:30PM": an empty day group repeats the previous one
+    for i in range(1, len(day_groups)):
+        if not day_groups[i].strip():
+            day_groups[i] = day_groups[i - 1]
+
+    if len(day_groups) == len(hour_groups):
+        pairs = list(zip(day_groups, hour_groups))
+    elif len(hour_groups) == 1:
+        pairs = [(days, hour_groups[0]) for days in day_groups]
+    elif len(day_groups) == 1:
+        pairs = [(day_groups[0], hours) for hours in hour_groups]
+    else:
+        return bits, 'unparsed', monthly
+
+    failed = 0
+    for day_text, hour_text in pairs:
+        days = _parse_days(day_text)
+        ranges = [_parse_range(part) for part in hour_text.split('&')]
+        if days is None or not ranges or any(r is None for r in ranges):
+            failed += 1
+            continue
+        mask = 0
+        for start, end in ranges:
+            mask |= _slot_bits(start, end)
+        for day in days:
+            bits[day] |= mask
+
+    if failed == len(pairs):
+        return bits, 'unparsed', monthly
+    return bits, ('partial' if failed else 'ok'), monthly
+
+
+def parse_schedules(days):
+    """Compile a Series of DAYS strings.
+
+    Each distinct string is parsed once. Returns the (n, 7) uint64 bitmap and
+    a report frame with the original text, status and monthly flag per row.
+    """
+    codes, uniques = pd.factorize(days, use_na_sentinel=False)
+    parsed = [parse_schedule(text) for text in uniques]
+    unique_bits = np.array([p[0] for p in parsed], dtype=np.uint64).reshape(-1, 7)
+    report = pd.DataFrame({
+        'DAYS': np.asarray(days, dtype=object),
+        'schedule_status': np.array([p[1] for p in parsed], dtype=object)[codes],
+        'monthly': np.array([p[2] for p in parsed], dtype=bool)[codes],
+    })
+    return unique_bits[codes], report
+
+
+# -----------------------------
+# Vectorized queries on the bitmap
+# -----------------------------
+
+def time_to_slot(value):
+    """'17:30' -> 35"""
+    hour, _, minute = str(value).partition(':')
+    return (int(hour) * 60 + int(minute or 0)) // 30
+
+
+def window_mask(start='00:00', end='24:00'):
+    """uint64 mask of the slots in [start, end)."""
+    return np.uint64(((1 << time_to_slot(end)) - 1) ^ ((1 << time_to_slot(start)) - 1))
+
+
+def open_during(bits, day, start='00:00', end='24:00'):
+    """Boolean array: site is open at some point on `day` ('sat' or 5) between start and end."""
+    day = DAY_NAMES.index(day.lower()[:3]) if isinstance(day, str) else day
+    return (bits[:, day] & window_mask(start, end)) != 0
+
+
+def popcount(values):
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values).astype(np.int64)
+    table = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+    return table[values.view(np.uint8)].reshape(values.shape + (8,)).sum(axis=-1)
+
+
+def hours_per_week(bits):
+    """Open hours per week for each site."""
+    return popcount(bits).sum(axis=1) / 2
+
+
+def weekday_weekend_flags(bits):
+    """(weekday_available, weekend_available) 0/1 arrays derived from the bitmap."""
+    return (bits[:, :5] != 0).any(axis=1).astype(int), (bits[:, 5:] != 0).any(axis=1).astype(int)
+
+
+def hours_per_week_by_group(bits, groups):
+    """Total open hours per week for each group label (e.g. nta_id)."""
+    codes, labels = pd.factorize(groups)
+    totals = np.bincount(codes[codes >= 0], weights=hours_per_week(bits)[codes >= 0], minlength=len(labels))
+    return pd.Series(totals, index=labels, name='open_hours_per_week')
+
+
+# -----------------------------
+# Persistence
+# -----------------------------
+
+def schedule_frame(efap):
+    """efap_id, status flags and one uint64 column per weekday for the raw EFAP frame."""
+    bits, report = parse_schedules(efap['DAYS'])
+    frame = pd.DataFrame({'efap_id': efap['ID'].to_numpy(),
+                          'schedule_status': report['schedule_status'],
+                          'monthly': report['monthly'].astype(int)})
+    for i, day in enumerate(DAY_NAMES):
+        frame[day] = bits[:, i]
+    return frame
+
+
+def load_schedule_bits(path=EFAP_SCHEDULE):
+    """Read efap_schedule.csv back into (efap_ids, (n, 7) uint64 bitmap)."""
+    frame = read_table('efap_schedule', path)
+    return frame['efap_id'].to_numpy(), frame[DAY_NAMES].to_numpy(dtype=np.uint64)
+
+
+def benchmark(days, repeat=20):
+    """Time the regex flag path against compiling and querying the bitmap."""
+    def regex_path():
+        clean = days.str.upper()
+        clean.str.contains('MON|TUE|WED|THU|FRI', regex=True, na=False).astype(int)
+        clean.str.contains('SAT|SUN', regex=True, na=False).astype(int)
+
+    def timed(fn):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        return (time.perf_counter() - start) / repeat * 1000
+
+    bits, _ = parse_schedules(days)
+    return {
+        'rows': len(days),
+        'regex_flags_ms': round(timed(regex_path), 3),
+        'compile_bitmap_ms': round(timed(lambda: parse_schedules(days)), 3),
+        'bitmap_flags_ms': round(timed(lambda: weekday_weekend_flags(bits)), 3),
+        'bitmap_sat_after_5pm_ms': round(timed(lambda: open_during(bits, 'sat', '17:00')), 3),
+        'bitmap_hours_per_week_ms': round(timed(lambda: hours_per_week(bits)), 3),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compile EFAP DAYS strings into a weekly half-hour bitmap.')
+    parser.add_argument('--input', default=EFAP_RAW)
+    parser.add_argument('--output', default=EFAP_SCHEDULE)
+    parser.add_argument('--benchmark', type=int, default=0, metavar='SCALE',
+                        help='also time regex vs bitmap on the DAYS column repeated SCALE times')
+    args = parser.parse_args()
+
+    efap = read_raw('efap_raw', args.input)
+    frame = write_table(schedule_frame(efap), 'efap_schedule', args.output)
+    print(f"Saved {len(frame)} schedules to {args.output}")
+    print(frame['schedule_status'].value_counts())
+
+    problems = frame['schedule_status'] != 'ok'
+    if problems.any():
+        print("\nSchedules that could not be fully parsed:")
+        print(efap.loc[problems.to_numpy(), ['ID', 'DAYS']].to_string(index=False))
+
+    if args.benchmark:
+        days = pd.concat([efap['DAYS']] * args.benchmark, ignore_index=True)
+        print(f"\nBenchmark: {benchmark(days)}")
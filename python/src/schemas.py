@@ -0,0 +1,452 @@
+import argparse
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import CategoricalDtype
+
+from config import (
+    PRIORITIZATION_RAW, SHELTER_CENSUS_RAW, NTA_RAW, EFAP_RAW,
+    PRIORITIZATION_CLEAN, SHELTER_CENSUS_CLEAN, DIM_MAP_CLEAN, EFAP_CLEAN, EFAP_NTA_MAPPING, EFAP_SCHEDULE,
+    PROCESSED_DIR,
+)
+
+# -----------------------------
+# Schema registry
+# One place that declares every table's columns, dtypes and key, for the
+# raw NYC Open Data exports and for the cleaned csvs.
+#
+# Cleaned tables use compact dtypes: categoricals for repeated labels
+# (borough, access_type, program_name), int8 for the 0/1 flags, nullable
+# Int16 for community district numbers (no more "8.0"), float32 for scores,
+# percentages and head counts, and real datetimes. Columns that need the
+# digits keep float64 (supply_gap has 11 significant digits, lat/lon need
+# ~1e-6 degrees). read_table / write_table / enforce apply a schema.
+#
+# The surrogate-keyed star schema of create_schema2.py is registered as
+# star_<table>: int32 keys, the cleaned tables' dtypes for the attributes and
+# integer head counts in the aggregated shelter fact.
+#
+# Raw exports are only validated: missing columns, values that no longer
+# parse (a new date format, text in a count column), unknown codes in a
+# closed category (a new borough or facility TYPE) and duplicate keys raise
+# SchemaDriftError before anything is cleaned.
+# -----------------------------
+
+PERCENT = 'percent'         # raw text like '35.99%'
+
+
+class SchemaDriftError(ValueError):
+    """A table no longer matches its declared schema."""
+
+
+@dataclass
+class TableSchema:
+    name: str
+    columns: dict                                   # column -> dtype, in output order
+    key: list = field(default_factory=list)
+    dates: dict = field(default_factory=dict)       # column -> strptime format
+    path: object = None
+    thousands: str = None                           # separator used by the raw export
+
+
+BOROUGHS = ['Bronx', 'Brooklyn', 'Manhattan', 'Queens', 'Staten Island']
+FLAG = 'int8'
+
+SCHEMAS = {schema.name: schema for schema in [
+    # raw exports
+    TableSchema('prioritization_raw', {
+        'Weighted.Score': 'float64',
+        'NTA': 'str',
+        'NTA.Name': 'str',
+        'Geometry': 'str',
+        'Latitude (generated)': 'float64',
+        'Longitude (generated)': 'float64',
+        'Food.Insecure.Percentage Rank': 'Int64',
+        'Food.Insecure.Percentage': PERCENT,
+        'Rank': 'Int64',
+        'sg abv ca Rank': 'Int64',
+        'Sg Abv Ca': 'float64',
+        'Unemployment.Rate Rank': 'Int64',
+        'Unemployment.Rate': PERCENT,
+        'Vulnerable.Population.Percentage Rank': 'Int64',
+        'Vulnerable.Population.Percentage': PERCENT,
+    }, key=['NTA'], path=PRIORITIZATION_RAW),
+    TableSchema('shelter_census_raw', {
+        'Report Date': 'datetime64[ns]',
+        'Borough': CategoricalDtype(BOROUGHS + ['Westchester']),
+        'Community Districts': 'Int64',
+        'Census Type': 'str',
+        'Adult Family Commercial Hotel': 'float64',
+        'Adult Family Shelter': 'float64',
+        'Adult Shelter': 'float64',
+        'Adult Shelter Commercial Hotel': 'float64',
+        'Family Cluster': 'float64',
+        'Family with Children Commercial Hotel': 'float64',
+        'Family with Children Shelter': 'float64',
+    }, key=['Report Date', 'Borough', 'Community Districts'], dates={'Report Date': '%m/%d/%Y'},
+        path=SHELTER_CENSUS_RAW, thousands=','),
+    TableSchema('nta_raw', {
+        'the_geom': 'str',
+        'BoroCode': 'Int64',
+        'BoroName': CategoricalDtype(BOROUGHS),
+        'NTA2020': 'str',
+        'NTAName': 'str',
+        'CDTA2020': 'str',
+        'CDTAName': 'str',
+    }, key=['NTA2020'], path=NTA_RAW),
+    TableSchema('efap_raw', {
+        'ID': 'Int64',
+        'TYPE': CategoricalDtype(['FP', 'FPH', 'FPK', 'FPM', 'FPV', 'SK', 'SKK', 'SKM']),
+        'PROGRAM': 'str',
+        'PHONE': 'str',
+        'DISTADD': 'str',
+        'DISTBORO': CategoricalDtype(['BK', 'BX', 'NY', 'QN', 'SI']),
+        'DISTZIP': 'str',
+        'DAYS': 'str',
+    }, key=['ID'], path=EFAP_RAW),
+
+    # cleaned tables
+    TableSchema('prioritization_clean', {
+        'nta_id': 'str',
+        'weighted_score': 'float32',
+        'food_insecure_percentage': 'float32',
+        'supply_gap': 'float64',
+        'vulnerable_population_percentage': 'float32',
+    }, key=['nta_id'], path=PRIORITIZATION_CLEAN),
+    TableSchema('shelter_census_clean', {
+        'report_date': 'datetime64[ns]',
+        'borough': CategoricalDtype(BOROUGHS + ['Westchester']),
+        'community_districts': 'Int16',
+        'family_with_children_commercial_hotel': 'float32',
+        'family_with_children_shelter': 'float32',
+        'family_cluster': 'float32',
+    }, key=['report_date', 'borough', 'community_districts'], dates={'report_date': '%Y-%m-%d'},
+        path=SHELTER_CENSUS_CLEAN),
+    TableSchema('dim_map', {
+        'nta_id': 'str',
+        'nta_name': 'str',
+        'cdta_id': 'category',
+        'cdta_name': 'category',
+        'boro_code': 'Int8',
+        'boro_name': CategoricalDtype(BOROUGHS),
+        'the_geom_wkt': 'str',
+    }, key=['nta_id'], path=DIM_MAP_CLEAN),
+    TableSchema('efap_cleaned', {
+        'efap_id': 'int32',
+        'program_name': 'category',
+        'access_type': CategoricalDtype(['Kitchen', 'Pantry', 'Pantry + Kitchen']),
+        'has_pantry_access': FLAG,
+        'has_kitchen_access': FLAG,
+        'weekday_available': FLAG,
+        'weekend_available': FLAG,
+    }, key=['efap_id'], path=EFAP_CLEAN),
+    TableSchema('efap_nta_mapping', {
+        'efap_id': 'int32',
+        'nta_id': 'str',
+        'lat': 'float64',
+        'lon': 'float64',
+    }, key=['efap_id'], path=EFAP_NTA_MAPPING),
+    TableSchema('efap_schedule', {
+        'efap_id': 'int32',
+        'schedule_status': CategoricalDtype(['ok', 'partial', 'unparsed']),
+        'monthly': FLAG,
+        **{day: 'uint64' for day in ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']},
+    }, key=['efap_id'], path=EFAP_SCHEDULE),
+
+    # surrogate-keyed star schema (create_schema2.py); fact rows may share the
+    # unknown-member key 0, so only the dimensions declare a key
+    TableSchema('star_dim_map', {
+        'map_key': 'int32',
+        'nta_id': 'str',
+        'nta_name': 'str',
+        'cdta_id': 'category',
+        'cdta_name': 'category',
+        'boro_code': 'Int8',
+        'boro_name': CategoricalDtype(BOROUGHS),
+        'the_geom_wkt': 'str',
+    }, key=['map_key'], path=PROCESSED_DIR / 'dim_map.csv'),
+    TableSchema('star_dim_cdta', {
+        'cdta_key': 'int32',
+        'cdta_id': 'str',
+        'cdta_name': 'str',
+        'boro_code': 'Int8',
+        'boro_name': CategoricalDtype(BOROUGHS),
+    }, key=['cdta_key'], path=PROCESSED_DIR / 'dim_cdta.csv'),
+    TableSchema('star_dim_program_schedule', {
+        'program_key': 'int32',
+        'efap_id': 'int32',
+        'program_name': 'category',
+        'access_type': CategoricalDtype(['Kitchen', 'Pantry', 'Pantry + Kitchen']),
+        'has_pantry_access': FLAG,
+        'has_kitchen_access': FLAG,
+        'weekend_available': FLAG,
+        'weekday_available': FLAG,
+    }, key=['program_key'], path=PROCESSED_DIR / 'dim_program_schedule.csv'),
+    TableSchema('star_dim_date', {
+        'date_key': 'int32',
+        'date_id': 'int32',
+        'report_date': 'datetime64[ns]',
+        'year': 'int16',
+        'month': 'int8',
+    }, key=['date_key'], dates={'report_date': '%Y-%m-%d'}, path=PROCESSED_DIR / 'dim_date.csv'),
+    TableSchema('star_fact_neighborhood_prioritization', {
+        'map_key': 'int32',
+        'weighted_score': 'float32',
+        'food_insecure_percentage': 'float32',
+        'supply_gap': 'float64',
+        'vulnerable_population_percentage': 'float32',
+    }, path=PROCESSED_DIR / 'fact_neighborhood_prioritization.csv'),
+    TableSchema('star_fact_agg_shelter_cdta_year', {
+        'cdta_key': 'int32',
+        'date_key': 'int32',
+        'family_with_children_commercial_hotel': 'int32',
+        'family_with_children_shelter': 'int32',
+        'family_cluster': 'int32',
+    }, path=PROCESSED_DIR / 'fact_agg_shelter_cdta_year.csv'),
+    TableSchema('star_bridge_efap_site_nta', {
+        'program_key': 'int32',
+        'map_key': 'int32',
+    }, path=PROCESSED_DIR / 'bridge_efap_site_nta.csv'),
+]}
+
+
+def get_schema(schema):
+    if isinstance(schema, TableSchema):
+        return schema
+    if schema not in SCHEMAS:
+        raise KeyError(f"No schema registered for {schema!r}; known tables: {sorted(SCHEMAS)}")
+    return SCHEMAS[schema]
+
+
+# -----------------------------
+# Validation and conversion
+# -----------------------------
+
+def _is_integer(dtype):
+    return isinstance(dtype, str) and dtype.lower().startswith(('int', 'uint'))
+
+
+def _convert_values(series, dtype, schema):
+    if series.name in schema.dates:
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return series.astype(dtype)
+        return pd.to_datetime(series, format=schema.dates[series.name], errors='coerce').astype(dtype)
+    if dtype == 'str':
+        if series.dtype == object:
+            return series
+        return series.where(series.isna(), series.astype(str))
+    if isinstance(dtype, CategoricalDtype) or dtype == 'category':
+        return series.astype(object).astype(dtype)
+
+    if dtype == PERCENT:
+        series = series.astype(str).str.rstrip('%').where(series.notna())
+    elif series.dtype == object and schema.thousands:
+        series = series.str.replace(schema.thousands, '', regex=False)
+    numeric = pd.to_numeric(series, errors='coerce')
+    if dtype == PERCENT:
+        return numeric
+    if _is_integer(dtype):
+        # fractions and values outside the type's range do not fit
+        limits = np.iinfo(np.dtype(dtype.lower()))
+        numeric = numeric.where((numeric == np.round(numeric)) & numeric.between(limits.min, limits.max))
+        if numeric.isna().any() and dtype[0].islower():
+            return numeric      # plain integer dtypes cannot hold missing values
+    return numeric.astype(dtype)
+
+
+def _convert(series, dtype, schema):
+    """Series cast to dtype; values that do not convert become missing (reported by validate)."""
+    categorical = isinstance(dtype, CategoricalDtype) or dtype == 'category'
+    if series.dtype == object and dtype != 'str' and not categorical:
+        # text columns (dates, counts with thousands separators) repeat a few
+        # distinct values: parse each one once
+        codes, uniques = pd.factorize(series)
+        if len(uniques) < len(series) // 2:
+            parsed = _convert_values(pd.Series(np.append(uniques, None), name=series.name), dtype, schema)
+            result = parsed.iloc[codes]         # code -1 (missing) picks the appended None
+            result.index = series.index
+            if _is_integer(dtype) and not result.isna().any():
+                result = result.astype(dtype)
+            return result
+    return _convert_values(series, dtype, schema)
+
+
+def validate(frame, schema, columns=None):
+    """Raise SchemaDriftError when `frame` does not match the schema; returns the converted columns.
+
+    Checks that every declared column is present, that values convert to the
+    declared dtype without new missing values (unknown categories included)
+    and that the key is unique and complete. Extra columns are ignored.
+    """
+    schema = get_schema(schema)
+    wanted = [c for c in schema.columns if columns is None or c in columns]
+    missing = [c for c in wanted if c not in frame.columns]
+    if missing:
+        unexpected = [c for c in frame.columns if c not in schema.columns]
+        raise SchemaDriftError(f"{schema.name}: missing columns {missing}"
+                               + (f" (unexpected columns: {unexpected})" if unexpected else ''))
+
+    converted, problems = {}, []
+    for column in wanted:
+        values = _convert(frame[column], schema.columns[column], schema)
+        lost = values.isna() & frame[column].notna()
+        if lost.any():
+            examples = frame.loc[lost, column].astype(str).unique()[:5].tolist()
+            problems.append(f"{column} ({schema.columns[column]}): {int(lost.sum())} values do not fit, e.g. {examples}")
+        elif _is_integer(schema.columns[column]) and schema.columns[column][0].islower() and values.isna().any():
+            problems.append(f"{column} ({schema.columns[column]}): {int(values.isna().sum())} missing values")
+        converted[column] = values
+    if problems:
+        raise SchemaDriftError(f"{schema.name}: " + '; '.join(problems))
+
+    key = [k for k in schema.key if k in converted]
+    if key and len(key) == len(schema.key):
+        keys = pd.DataFrame({k: converted[k] for k in key})
+        if len(key) == 1 and keys[key[0]].isna().any():
+            raise SchemaDriftError(f"{schema.name}: {int(keys[key[0]].isna().sum())} rows without {key[0]}")
+        duplicated = keys.duplicated()
+        if duplicated.any():
+            raise SchemaDriftError(f"{schema.name}: {int(duplicated.sum())} duplicate keys {key}, "
+                                   f"e.g. {keys[duplicated].head(3).to_dict('records')}")
+    return converted
+
+
+def enforce(frame, schema, columns=None):
+    """Frame with exactly the schema's columns (or the given subset), in order and in the declared dtypes."""
+    schema = get_schema(schema)
+    converted = validate(frame, schema, columns)
+    return pd.DataFrame(converted, index=frame.index)
+
+
+def widen_floats(frame):
+    """float32 columns back to float64 through their shortest decimal form (35.99 stays 35.99, not 35.9900016)."""
+    frame = frame.copy()
+    for column in frame.columns[frame.dtypes == np.float32]:
+        frame[column] = frame[column].astype(str).astype(np.float64)
+    return frame
+
+
+# -----------------------------
+# Readers and writers
+# -----------------------------
+
+def _read_dtypes(schema, columns):
+    """read_csv dtypes that cannot lose information; everything else is converted by enforce."""
+    dtypes = {}
+    for column in columns:
+        dtype = schema.columns[column]
+        if column in schema.dates or dtype == PERCENT:
+            continue
+        if dtype == 'str' or isinstance(dtype, CategoricalDtype) or dtype == 'category':
+            dtypes[column] = str
+    return dtypes
+
+
+def _read_cached(name, columns):
+    try:
+        from columnar_cache import read_cached
+    except ImportError:     # pyarrow is optional; the csv is always there
+        return None
+    return read_cached(name, columns)
+
+
+def read_table(name, path=None, columns=None, cache=True, **options):
+    """Read a cleaned csv in its declared dtypes, failing fast on drift.
+
+    cache -- serve the table from its Arrow cache (columnar_cache.py) when
+             that is at least as new as the csv; the cache is written from
+             frames that already passed the schema
+    """
+    schema = get_schema(name)
+    columns = list(schema.columns) if columns is None else list(columns)
+    if cache and not options and (path is None or os.path.abspath(path) == os.path.abspath(schema.path)):
+        cached = _read_cached(schema.name, columns)
+        if cached is not None:
+            return cached
+    frame = pd.read_csv(path or schema.path, usecols=lambda c: c in columns,
+                        dtype=_read_dtypes(schema, columns), **options)
+    return enforce(frame, schema, columns)
+
+
+def read_raw(name, path=None, columns=None, **options):
+    """Read a raw export as the cleaning code expects it (pandas' own dtypes) after validating it.
+
+    columns -- optional list of declared columns; only those are read and validated
+    """
+    schema = get_schema(name)
+    if columns is not None:
+        validate_header(name, path)
+        options['usecols'] = columns
+    frame = pd.read_csv(path or schema.path, **options)
+    validate(frame, schema, columns)
+    return frame
+
+
+def validate_header(name, path=None):
+    """Check only the column names of a raw export (for the chunked readers)."""
+    schema = get_schema(name)
+    header = pd.read_csv(path or schema.path, nrows=0).columns
+    missing = [c for c in schema.columns if c not in header]
+    if missing:
+        raise SchemaDriftError(f"{schema.name}: missing columns {missing}")
+
+
+def write_table(frame, name, path=None, **options):
+    """Enforce the schema and write the csv; returns the enforced frame."""
+    schema = get_schema(name)
+    frame = enforce(frame, schema)
+    date_format = next(iter(schema.dates.values()), None)
+    frame.to_csv(path or schema.path, index=False, date_format=date_format, **options)
+    return frame
+
+
+# -----------------------------
+# Memory report
+# -----------------------------
+
+def memory_report(names=None):
+    """Deep memory of each cleaned csv read with pandas defaults vs read_table."""
+    rows = []
+    for name in names or [n for n in SCHEMAS if not n.endswith('_raw')]:
+        schema = SCHEMAS[name]
+        if not schema.path.exists():
+            continue
+        default = pd.read_csv(schema.path)
+        before = default.memory_usage(deep=True).sum()
+        after = read_table(name).memory_usage(deep=True).sum()
+        rows.append({'table': name, 'rows': len(default),
+                     'default_kb': round(before / 1024, 1), 'schema_kb': round(after / 1024, 1),
+                     'reduction_pct': round(100 * (1 - after / before), 1)})
+    report = pd.DataFrame(rows)
+    if len(report):
+        total = report[['default_kb', 'schema_kb']].sum()
+        report.loc[len(report)] = {'table': 'total', 'rows': report['rows'].sum(), **total.round(1).to_dict(),
+                                   'reduction_pct': round(100 * (1 - total['schema_kb'] / total['default_kb']), 1)}
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Validate the raw exports and cleaned csvs against the schema registry.')
+    parser.add_argument('--memory', action='store_true', help='only print the per-table memory report')
+    args = parser.parse_args()
+
+    if not args.memory:
+        failed = False
+        for name, schema in SCHEMAS.items():
+            if not schema.path.exists():
+                print(f"{name}: {schema.path.name} not found, skipped")
+                continue
+            try:
+                if name.endswith('_raw'):
+                    read_raw(name)
+                else:
+                    read_table(name, cache=False)
+                print(f"{name}: ok")
+            except SchemaDriftError as error:
+                failed = True
+                print(f"{name}: DRIFT - {error}")
+        if failed:
+            raise SystemExit(1)
+    print(memory_report().to_string(index=False))
@@ -0,0 +1,171 @@
+import argparse
+import itertools
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import COVERAGE_MODEL, DATA_DIR, STAR_SCHEMA_DB
+from features import nta_feature_table
+
+# -----------------------------
+# Batch scoring with the coverage classifier
+# Scores a whole feature table (or a what-if grid built from the current NTA
+# features) with one predict_proba call per chunk. Input can be csv or
+# Parquet and is read in chunks, output is written chunk by chunk, so the
+# grid never has to fit in memory.
+# -----------------------------
+
+SCORES_DIR = DATA_DIR / 'scores'
+CHUNKSIZE = 100_000
+
+
+def score_frame(df, artifact):
+    """Add high_coverage_probability and predicted_high_coverage to a feature frame."""
+    missing = [c for c in artifact['features'] if c not in df.columns]
+    if missing:
+        raise ValueError(f"Feature table is missing model features: {missing}")
+    probability = artifact['model'].predict_proba(df[artifact['features']])[:, 1]
+    return df.assign(high_coverage_probability=probability,
+                     predicted_high_coverage=(probability >= 0.5).astype(np.int8))
+
+
+# -----------------------------
+# Inputs
+# -----------------------------
+
+def read_chunks(path, chunksize=CHUNKSIZE):
+    """Yield frames of at most `chunksize` rows from a csv or Parquet file."""
+    if str(path).endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+def parse_scenario(text):
+    """'supply_gap=0.8,1,1.2' -> ('supply_gap', [0.8, 1.0, 1.2])"""
+    column, _, values = text.partition('=')
+    if not values:
+        raise ValueError(f"Scenario must look like column=multiplier,multiplier,...: {text!r}")
+    return column.strip(), [float(v) for v in values.split(',')]
+
+
+def scenario_chunks(features, grid, chunksize=CHUNKSIZE):
+    """Yield the what-if grid in chunks: every NTA under every combination of multipliers.
+
+    grid -- {column: [multiplier, ...]}; a scenario multiplies each column
+    by one of its multipliers. Rows carry scenario_id plus one
+    '<column>_multiplier' column per varied feature.
+    """
+    columns = list(grid)
+    missing = [c for c in columns if c not in features.columns]
+    if missing:
+        raise ValueError(f"Scenario columns not in the feature table: {missing}")
+    combos = np.array(list(itertools.product(*grid.values())), dtype=float).reshape(-1, len(columns))
+    per_chunk = max(1, chunksize // max(len(features), 1))
+    base = features[columns].to_numpy(dtype=float)
+
+    for first in range(0, len(combos), per_chunk):
+        block = combos[first:first + per_chunk]
+        chunk = pd.concat([features] * len(block), ignore_index=True)
+        scenario_ids = np.repeat(np.arange(first, first + len(block)), len(features))
+        multipliers = np.repeat(block, len(features), axis=0)
+        chunk.insert(0, 'scenario_id', scenario_ids)
+        chunk[columns] = np.tile(base, (len(block), 1)) * multipliers
+        for i, column in enumerate(columns):
+            chunk[f'{column}_multiplier'] = multipliers[:, i]
+        yield chunk
+
+
+# -----------------------------
+# Scoring to a file
+# -----------------------------
+
+def parquet_schema(scored, artifact):
+    """Arrow schema for the whole output, fixed from the first chunk.
+
+    Model features and the probability are always float64: pandas infers an
+    integer feature as float64 only in chunks where it has missing values,
+    and every chunk has to match the schema the file was opened with.
+    """
+    import pyarrow as pa
+    schema = pa.Schema.from_pandas(scored, preserve_index=False)
+    for column in [*artifact['features'], 'high_coverage_probability']:
+        i = schema.get_field_index(column)
+        schema = schema.set(i, pa.field(column, pa.float64()))
+    return schema
+
+
+def score_chunks(chunks, artifact, output):
+    """Score each chunk and append it to `output` (.parquet or .csv); returns throughput stats."""
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    parquet = str(output).endswith('.parquet')
+    writer = None
+    rows = 0
+    score_seconds = 0.0
+    start = time.perf_counter()
+    try:
+        for i, chunk in enumerate(chunks):
+            step = time.perf_counter()
+            scored = score_frame(chunk, artifact)
+            score_seconds += time.perf_counter() - step
+            if parquet:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                if writer is None:
+                    writer = pq.ParquetWriter(output, parquet_schema(scored, artifact))
+                writer.write_table(pa.Table.from_pandas(scored, preserve_index=False).cast(writer.schema))
+            else:
+                scored.to_csv(output, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+            rows += len(scored)
+    except BaseException:
+        # never leave a truncated file that looks like a finished run
+        if writer is not None:
+            writer.close()
+            writer = None
+        if os.path.exists(output):
+            os.remove(output)
+        raise
+    finally:
+        if writer is not None:
+            writer.close()
+    total = time.perf_counter() - start
+    return {
+        'rows': rows,
+        'seconds': round(total, 3),
+        'rows_per_second': round(rows / total) if total else None,
+        'scoring_rows_per_second': round(rows / score_seconds) if score_seconds else None,
+        'output': str(output),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Score NTAs (or a what-if grid) with the coverage classifier.')
+    parser.add_argument('--input', help='feature table (.csv or .parquet); default: current NTA features')
+    parser.add_argument('--scenario', action='append', default=[], metavar='COLUMN=M1,M2,...',
+                        help='vary a feature by these multipliers; repeat to build a grid over several features')
+    parser.add_argument('--output', default=SCORES_DIR / 'nta_scores.parquet', help='.parquet or .csv')
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    parser.add_argument('--model', default=COVERAGE_MODEL)
+    parser.add_argument('--db', default=STAR_SCHEMA_DB)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    from model_training import load_model
+    artifact = load_model(args.model)
+    print(f"Loaded model in {time.perf_counter() - start:.2f}s")
+
+    if args.input:
+        chunks = read_chunks(args.input, args.chunksize)
+        if args.scenario:
+            parser.error('--scenario builds its grid from the NTA features; it cannot be combined with --input')
+    else:
+        features = nta_feature_table(args.db)
+        grid = dict(parse_scenario(text) for text in args.scenario)
+        chunks = scenario_chunks(features, grid, args.chunksize) if grid else iter([features])
+
+    for key, value in score_chunks(chunks, artifact, args.output).items():
+        print(f"{key}: {value}")
@@ -0,0 +1,318 @@
+import argparse
+import heapq
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.spatial import cKDTree
+
+from access import SiteTrees, load_sites, nta_origins, project_km
+from coverage import PER_PEOPLE
+
+# -----------------------------
+# Where would new pantries do the most good?
+# Each NTA (its reference point from the prioritization file) counts the
+# EFAP sites within RADIUS_KM. Its demand weight grows with weighted_score
+# and supply_gap, and it needs enough sites to reach a target coverage ratio
+# (sites per 1,000 sheltered people, the CDTA's shelter census split evenly
+# over its NTAs as in fact_food_site_coverage). The objective is
+#
+#     sum over NTAs of weight * min(sites nearby, sites needed) / sites needed
+#
+# which rewards the first sites an under-served NTA gets most and is
+# submodular, so a greedy pick is within (1 - 1/e) of the best set of k.
+#
+# Every site and candidate location is reduced once to the (few) NTAs
+# within its radius, as a sparse site x NTA matrix built from one KD-tree
+# query. Adding or removing a site then only touches the counts of those
+# NTAs, and the lazy greedy solver keeps candidates in a max-heap of stale
+# gains and only re-evaluates the one on top, which is enough because gains
+# can only shrink as sites are added.
+# -----------------------------
+
+RADIUS_KM = 1.0
+DEFAULT_K = 10
+
+
+def load_demand(date_id=None):
+    """Per-NTA reference point, weighted_score, supply_gap and sheltered people (latest month by default)."""
+    from load_sqlite import build_tables
+    tables = build_tables()
+    prioritization = tables['fact_neighborhood_prioritization'][['nta_id', 'weighted_score', 'supply_gap']]
+    shelter = tables['fact_agg_shelter_cdta_year']
+    date_id = shelter['date_id'].max() if date_id is None else date_id
+    month = shelter[shelter['date_id'] == date_id]
+    people = month[['family_with_children_commercial_hotel', 'family_with_children_shelter',
+                    'family_cluster']].fillna(0).sum(axis=1).groupby(month['cdta_id']).sum()
+    dim_map = tables['dim_map'][['nta_id', 'cdta_id']].astype(str)
+    ntas_per_cdta = dim_map['cdta_id'].map(dim_map['cdta_id'].value_counts())
+    dim_map['sheltered'] = dim_map['cdta_id'].map(people).astype(float) / ntas_per_cdta
+
+    demand = nta_origins().merge(prioritization, on='nta_id', how='inner')
+    demand = demand.merge(dim_map[['nta_id', 'sheltered']], on='nta_id', how='left')
+    demand['sheltered'] = demand['sheltered'].fillna(0.0)
+    return demand.reset_index(drop=True)
+
+
+def demand_weights(demand):
+    """weighted_score scaled up by the NTA's share of the positive supply gap (1x to ~2x on average)."""
+    gap = demand['supply_gap'].clip(lower=0).fillna(0).to_numpy(dtype=float)
+    gap_factor = 1 + (gap / gap.mean() if gap.mean() > 0 else 0)
+    return demand['weighted_score'].fillna(0).to_numpy(dtype=float) * gap_factor
+
+
+def candidate_grid(demand, spacing_km=0.5):
+    """Candidate locations on a regular grid over the NTAs' extent (lat, lon arrays)."""
+    lat0, lat1 = demand['lat'].min(), demand['lat'].max()
+    lon0, lon1 = demand['lon'].min(), demand['lon'].max()
+    width_km, height_km = project_km([lat1], [lon1])[0] - project_km([lat0], [lon0])[0]
+    lats = np.linspace(lat0, lat1, max(2, int(height_km / spacing_km) + 1))
+    lons = np.linspace(lon0, lon1, max(2, int(width_km / spacing_km) + 1))
+    lon_grid, lat_grid = np.meshgrid(lons, lats)
+    return lat_grid.ravel(), lon_grid.ravel()
+
+
+def _row_indices(matrix, rows):
+    """Column indices of the given rows of a CSR matrix, concatenated (cheaper than fancy-indexing it)."""
+    rows = np.atleast_1d(rows)
+    if len(rows) == 1:
+        return matrix.indices[matrix.indptr[rows[0]]:matrix.indptr[rows[0] + 1]]
+    return np.concatenate([matrix.indices[matrix.indptr[r]:matrix.indptr[r + 1]] for r in rows] or
+                          [np.empty(0, dtype=matrix.indices.dtype)])
+
+
+class CoverageScenario:
+    """Site counts per NTA under the existing sites, with delta updates for added or removed sites.
+
+    demand  -- frame with lat, lon and sheltered per NTA (load_demand)
+    weights -- demand weight per NTA (demand_weights)
+    sites   -- existing sites with lat / lon (access.load_sites); removable by row position
+    target_ratio -- sites per 1,000 sheltered people an NTA needs; defaults to the
+                    median ratio of the NTAs with sheltered people today
+    """
+
+    def __init__(self, demand, weights, sites, radius_km=RADIUS_KM, target_ratio=None):
+        self.demand = demand.reset_index(drop=True)
+        self.weights = np.asarray(weights, dtype=float)
+        self.radius_km = radius_km
+        self.tree = cKDTree(project_km(self.demand['lat'], self.demand['lon']))
+        self.site_ntas = self.neighbourhoods(sites['lat'], sites['lon'])
+        self.site_active = np.ones(len(sites), dtype=bool)
+        self.counts = np.asarray(self.site_ntas.sum(axis=0)).ravel()
+        self.sheltered = self.demand['sheltered'].to_numpy(dtype=float)
+
+        if target_ratio is None:
+            served = self.sheltered > 0
+            target_ratio = float(np.median(self.counts[served] / self.sheltered[served] * PER_PEOPLE)) if served.any() else 0
+        self.target_ratio = target_ratio
+        self.needed = np.maximum(1, np.ceil(target_ratio * self.sheltered / PER_PEOPLE))
+        self.value = float(self._value(self.counts).sum())
+
+    def neighbourhoods(self, lat, lon):
+        """Sparse (locations x NTAs) 0/1 matrix of the NTAs within radius_km of each location."""
+        hits = self.tree.query_ball_point(project_km(lat, lon), self.radius_km, workers=-1)
+        lengths = np.fromiter((len(h) for h in hits), dtype=np.int64, count=len(hits))
+        indptr = np.concatenate([[0], np.cumsum(lengths)])
+        indices = np.fromiter((i for h in hits for i in h), dtype=np.int64, count=indptr[-1])
+        return sparse.csr_matrix((np.ones(len(indices)), indices, indptr), shape=(len(hits), len(self.demand)))
+
+    def _value(self, counts, ntas=slice(None)):
+        return self.weights[ntas] * np.minimum(counts, self.needed[ntas]) / self.needed[ntas]
+
+    def coverage_ratio(self):
+        """Sites within the radius per 1,000 sheltered people (NaN where nobody is sheltered)."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.sheltered > 0, self.counts / self.sheltered * PER_PEOPLE, np.nan)
+
+    # -- delta updates --------------------------------------------------------
+
+    def delta(self, ntas, change):
+        """Objective change if the counts of `ntas` (repeats allowed) moved by `change` each."""
+        ntas, repeats = np.unique(ntas, return_counts=True)
+        before = self.counts[ntas]
+        return float((self._value(before + change * repeats, ntas) - self._value(before, ntas)).sum())
+
+    def _apply(self, ntas, change):
+        gain = self.delta(ntas, change)
+        np.add.at(self.counts, ntas, change)
+        self.value += gain
+        return gain
+
+    def add(self, neighbourhoods, rows):
+        """Open the candidate locations `rows` of a neighbourhoods() matrix; returns the objective gain."""
+        return self._apply(_row_indices(neighbourhoods, rows), 1)
+
+    def remove_sites(self, positions):
+        """Close existing sites (row positions in `sites`); returns the (negative) objective change."""
+        positions = np.atleast_1d(positions)
+        positions = positions[self.site_active[positions]]
+        self.site_active[positions] = False
+        return self._apply(_row_indices(self.site_ntas, positions), -1)
+
+    def restore_sites(self, positions):
+        positions = np.atleast_1d(positions)
+        positions = positions[~self.site_active[positions]]
+        self.site_active[positions] = True
+        return self._apply(_row_indices(self.site_ntas, positions), 1)
+
+    def what_if(self, neighbourhoods=None, add=(), remove=(), details=True):
+        """Objective change from opening candidates and closing sites, without keeping it.
+
+        With details, also a frame of the affected NTAs and their site counts before and after.
+        """
+        added = _row_indices(neighbourhoods, add) if len(add) else np.empty(0, dtype=np.int64)
+        remove = np.asarray(remove, dtype=int)
+        removed = _row_indices(self.site_ntas, remove[self.site_active[remove]])
+        ntas = np.concatenate([added, removed])
+        change = np.concatenate([np.ones(len(added)), -np.ones(len(removed))])
+        touched, inverse = np.unique(ntas, return_inverse=True)
+        moved = np.bincount(inverse, weights=change, minlength=len(touched))
+        before = self.counts[touched]
+        gain = float((self._value(before + moved, touched) - self._value(before, touched)).sum())
+        if not details:
+            return gain
+        return gain, pd.DataFrame({'nta_id': self.demand['nta_id'].to_numpy()[touched],
+                                   'sites_before': before, 'sites_after': before + moved})
+
+    def marginal(self):
+        """Objective gain of one more site within reach of each NTA."""
+        return self._value(self.counts + 1) - self._value(self.counts)
+
+    def gains(self, neighbourhoods):
+        """Marginal gain of opening each candidate on its own, for all candidates at once."""
+        return np.asarray(neighbourhoods @ self.marginal()).ravel()
+
+
+def lazy_greedy(scenario, neighbourhoods, k=DEFAULT_K):
+    """Pick up to k candidates (rows of `neighbourhoods`) maximizing the coverage objective.
+
+    Opens the picks in `scenario`; returns [(row, gain)] in pick order and
+    the number of gain re-evaluations after the first full pass.
+    """
+    gains = scenario.gains(neighbourhoods)
+    rows = np.flatnonzero(gains > 0)
+    # a list sorted by (-gain, row) already satisfies the heap invariant
+    rows = rows[np.lexsort((rows, -gains[rows]))]
+    heap = list(zip((-gains[rows]).tolist(), rows.tolist(), [0] * len(rows)))
+    indptr, indices = neighbourhoods.indptr, neighbourhoods.indices
+    marginal = scenario.marginal()
+    picks, evaluations = [], 0
+    while heap and len(picks) < k:
+        negative_gain, row, round_seen = heapq.heappop(heap)
+        if round_seen == len(picks):
+            picks.append((row, scenario.add(neighbourhoods, row)))
+            marginal = scenario.marginal()
+            continue
+        # the gain is stale: recompute it and put the candidate back
+        evaluations += 1
+        gain = marginal[indices[indptr[row]:indptr[row + 1]]].sum()
+        if gain > 0:
+            heapq.heappush(heap, (-gain, row, len(picks)))
+    return picks, evaluations
+
+
+def plain_greedy(scenario, neighbourhoods, k=DEFAULT_K):
+    """Reference greedy: re-evaluate every candidate each round."""
+    picks = []
+    for _ in range(k):
+        gains = scenario.gains(neighbourhoods)
+        # a location takes one new site
+        gains[[row for row, _ in picks]] = -np.inf
+        row = int(np.argmax(gains))
+        if gains[row] <= 0:
+            break
+        picks.append((row, scenario.add(neighbourhoods, row)))
+    return picks
+
+
+# -----------------------------
+# Benchmark
+# -----------------------------
+
+def full_recompute(demand, weights, sites, lat, lon, needed, radius_km=RADIUS_KM):
+    """Objective with extra sites by rebuilding the site tree and recounting every NTA."""
+    both = pd.concat([sites[['lat', 'lon']], pd.DataFrame({'lat': lat, 'lon': lon})], ignore_index=True)
+    both['has_pantry_access'] = both['has_kitchen_access'] = both['weekend_available'] = 0
+    counts = SiteTrees(both).count_within(project_km(demand['lat'], demand['lon']), radius_km)
+    return float((weights * np.minimum(counts, needed) / needed).sum())
+
+
+def benchmark(scenario, sites, neighbourhoods, lat, lon, k=DEFAULT_K, n_what_ifs=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    results = {'candidates': neighbourhoods.shape[0], 'ntas': len(scenario.demand), 'sites': len(sites)}
+
+    rows = rng.integers(0, neighbourhoods.shape[0], n_what_ifs)
+    start = time.perf_counter()
+    deltas = [scenario.what_if(neighbourhoods, add=[row], details=False) for row in rows]
+    results['what_if_delta_ms'] = round((time.perf_counter() - start) / n_what_ifs * 1000, 4)
+    start = time.perf_counter()
+    for row, gain in zip(rows[:50], deltas[:50]):
+        recomputed = full_recompute(scenario.demand, scenario.weights, sites, lat[[row]], lon[[row]],
+                                    scenario.needed, scenario.radius_km) - scenario.value
+        assert abs(recomputed - gain) < 1e-6 * max(1, abs(scenario.value)), (row, recomputed, gain)
+    results['what_if_full_ms'] = round((time.perf_counter() - start) / 50 * 1000, 4)
+
+    counts, value = scenario.counts.copy(), scenario.value
+    start = time.perf_counter()
+    picks, evaluations = lazy_greedy(scenario, neighbourhoods, k)
+    results['lazy_greedy_s'] = round(time.perf_counter() - start, 4)
+    results['lazy_re_evaluations'] = evaluations
+    scenario.counts, scenario.value = counts.copy(), value
+    start = time.perf_counter()
+    reference = plain_greedy(scenario, neighbourhoods, k)
+    results['plain_greedy_s'] = round(time.perf_counter() - start, 4)
+    results['plain_evaluations'] = neighbourhoods.shape[0] * len(reference)
+    results['lazy_objective'] = round(float(value) + sum(g for _, g in picks), 4)
+    results['plain_objective'] = round(float(value) + sum(g for _, g in reference), 4)
+    scenario.counts, scenario.value = counts, value
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pick the k new pantry locations that add the most weighted coverage.')
+    parser.add_argument('--k', type=int, default=DEFAULT_K)
+    parser.add_argument('--radius', type=float, default=RADIUS_KM, help='km within which a site serves an NTA')
+    parser.add_argument('--spacing', type=float, default=0.5, help='km between candidate grid points')
+    parser.add_argument('--candidates', help='csv with lat / lon columns of candidate locations (default: a grid)')
+    parser.add_argument('--target-ratio', type=float, help='sites per 1,000 sheltered people an NTA needs')
+    parser.add_argument('--remove', type=int, nargs='*', default=[], metavar='EFAP_ID',
+                        help='close these existing sites before picking')
+    parser.add_argument('--output', help='write the picks to this csv')
+    parser.add_argument('--benchmark', action='store_true', help='time delta what-ifs and lazy vs plain greedy')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    demand = load_demand()
+    sites = load_sites()
+    scenario = CoverageScenario(demand, demand_weights(demand), sites, args.radius, args.target_ratio)
+    if args.candidates:
+        candidates = pd.read_csv(args.candidates)
+        lat, lon = candidates['lat'].to_numpy(), candidates['lon'].to_numpy()
+    else:
+        lat, lon = candidate_grid(demand, args.spacing)
+    neighbourhoods = scenario.neighbourhoods(lat, lon)
+    print(f"{len(demand)} NTAs, {len(sites)} sites, {len(lat)} candidates within {args.radius:g} km; "
+          f"target {scenario.target_ratio:.3f} sites per 1,000 sheltered; objective {scenario.value:.2f} "
+          f"(set up in {time.perf_counter() - start:.2f}s)")
+
+    if args.benchmark:
+        print(benchmark(scenario, sites, neighbourhoods, lat, lon, args.k))
+        raise SystemExit(0)
+
+    if args.remove:
+        positions = np.flatnonzero(sites['efap_id'].isin(args.remove).to_numpy())
+        print(f"Closing {len(positions)} sites changes the objective by {scenario.remove_sites(positions):+.3f}")
+
+    start = time.perf_counter()
+    picks, evaluations = lazy_greedy(scenario, neighbourhoods, args.k)
+    elapsed = time.perf_counter() - start
+    rows = [row for row, _ in picks]
+    result = pd.DataFrame({'rank': np.arange(1, len(picks) + 1), 'lat': lat[rows], 'lon': lon[rows],
+                           'gain': [gain for _, gain in picks],
+                           'ntas_in_reach': np.diff(neighbourhoods.indptr)[rows]})
+    result['objective'] = result['gain'].cumsum() + scenario.value - result['gain'].sum()
+    print(result.to_string(index=False))
+    print(f"Picked {len(picks)} sites in {elapsed * 1000:.1f}ms ({evaluations} gain re-evaluations)")
+    if args.output:
+        result.to_csv(args.output, index=False)
@@ -0,0 +1,240 @@
+import argparse
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import DIM_MAP_CLEAN, EFAP_NTA_MAPPING
+from schemas import read_table, write_table
+
+# -----------------------------
+# Offline point-in-polygon NTA assignment
+# The Geoclient API returns an NTA for each address, but it is slow, rate
+# limited and needs the network. dim_map already carries the NTA 2020
+# boundaries as WKT, so once a site has a lat/lon we can assign its NTA (and
+# CDTA) locally: parse the polygons once, bucket them in a bounding-box grid
+# and run a vectorized even-odd ray test for all points at once.
+# -----------------------------
+
+_POLYGON_SPLIT_RE = re.compile(r'\)\s*\)\s*,\s*\(\s*\(')
+_RING_SPLIT_RE = re.compile(r'\)\s*,\s*\(')
+
+# max number of point x edge comparisons held in memory at once
+_CHUNK_CELLS = 4_000_000
+
+
+def parse_wkt_multipolygon(wkt):
+    """Parse a POLYGON / MULTIPOLYGON WKT string.
+
+    Returns a list of polygons; each polygon is a list of (n, 2) float arrays
+    of (lon, lat) vertices, exterior ring first and holes after.
+    """
+    if not isinstance(wkt, str) or 'EMPTY' in wkt.upper():
+        return []
+    kind, _, body = wkt.strip().partition('(')
+    body = body.strip()[:-1].strip()  # drop the outermost parentheses
+    if kind.strip().upper() == 'MULTIPOLYGON':
+        body = body[1:-1].strip()
+    polygons = []
+    for polygon_text in _POLYGON_SPLIT_RE.split(body[1:-1]):
+        rings = []
+        for ring_text in _RING_SPLIT_RE.split(polygon_text):
+            coords = np.array(ring_text.replace(',', ' ').split(), dtype=float)
+            rings.append(coords.reshape(-1, 2))
+        polygons.append(rings)
+    return polygons
+
+
+def ring_edges(rings):
+    """Stack the edges of every ring as (x0, y0, x1, y1) columns."""
+    edges = []
+    for ring in rings:
+        if len(ring) < 2:
+            continue
+        # WKT rings are closed, but close them anyway to be safe
+        if not np.array_equal(ring[0], ring[-1]):
+            ring = np.vstack([ring, ring[:1]])
+        edges.append(np.hstack([ring[:-1], ring[1:]]))
+    if not edges:
+        return np.empty((0, 4))
+    return np.vstack(edges)
+
+
+def points_in_edges(px, py, edges):
+    """Even-odd ray casting of many points against one polygon's edges."""
+    inside = np.zeros(len(px), dtype=bool)
+    if len(px) == 0 or len(edges) == 0:
+        return inside
+    x0, y0, x1, y1 = (edges[:, i] for i in range(4))
+    # slope of each edge in x per unit y; horizontal edges never straddle
+    dy = y1 - y0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inv_slope = np.where(dy != 0, (x1 - x0) / dy, 0.0)
+    step = max(1, _CHUNK_CELLS // len(edges))
+    for start in range(0, len(px), step):
+        cx = px[start:start + step, None]
+        cy = py[start:start + step, None]
+        straddles = (y0 > cy) != (y1 > cy)
+        x_cross = x0 + (cy - y0) * inv_slope
+        crossings = np.count_nonzero(straddles & (cx < x_cross), axis=1)
+        inside[start:start + step] = (crossings % 2) == 1
+    return inside
+
+
+class NTAIndex:
+    """Grid-bucketed spatial index over the NTA polygons in dim_map."""
+
+    def __init__(self, dim_map, cell_size=0.01):
+        dim_map = dim_map.dropna(subset=['the_geom_wkt']).reset_index(drop=True)
+        self.nta_ids = dim_map['nta_id'].astype(str).str.strip().to_numpy()
+        if 'cdta_id' in dim_map.columns:
+            self.cdta_ids = dim_map['cdta_id'].to_numpy()
+        else:
+            # NTA 2020 codes embed their CDTA, e.g. MN0401 -> MN04
+            self.cdta_ids = np.array([nta[:4] for nta in self.nta_ids], dtype=object)
+
+        self.edges = []
+        bboxes = []
+        for wkt in dim_map['the_geom_wkt']:
+            rings = [ring for polygon in parse_wkt_multipolygon(wkt) for ring in polygon]
+            edges = ring_edges(rings)
+            self.edges.append(edges)
+            if len(edges):
+                xs = np.concatenate([edges[:, 0], edges[:, 2]])
+                ys = np.concatenate([edges[:, 1], edges[:, 3]])
+                bboxes.append([xs.min(), ys.min(), xs.max(), ys.max()])
+            else:
+                bboxes.append([np.inf, np.inf, -np.inf, -np.inf])
+        self.bboxes = np.array(bboxes, dtype=float).reshape(-1, 4)
+        self._build_grid(cell_size)
+
+    def _build_grid(self, cell_size):
+        valid = np.isfinite(self.bboxes).all(axis=1)
+        self.cell_size = cell_size
+        if not valid.any():
+            self.origin = np.zeros(2)
+            self.shape = (0, 0)
+            self.cell_ptr = np.zeros(1, dtype=np.int64)
+            self.cell_polys = np.empty(0, dtype=np.int64)
+            return
+        self.origin = self.bboxes[valid, :2].min(axis=0)
+        extent = self.bboxes[valid, 2:].max(axis=0) - self.origin
+        nx, ny = (np.floor(extent / cell_size).astype(int) + 1)
+        self.shape = (nx, ny)
+
+        # every (cell, polygon) pair whose bounding boxes overlap
+        cells, polys = [], []
+        for poly in np.flatnonzero(valid):
+            ix0, iy0 = np.floor((self.bboxes[poly, :2] - self.origin) / cell_size).astype(int)
+            ix1, iy1 = np.floor((self.bboxes[poly, 2:] - self.origin) / cell_size).astype(int)
+            gx, gy = np.meshgrid(np.arange(ix0, ix1 + 1), np.arange(iy0, iy1 + 1), indexing='ij')
+            flat = (gx * ny + gy).ravel()
+            cells.append(flat)
+            polys.append(np.full(len(flat), poly))
+        cells = np.concatenate(cells)
+        polys = np.concatenate(polys)
+        order = np.argsort(cells, kind='stable')
+        # CSR layout: polygons for cell c are cell_polys[cell_ptr[c]:cell_ptr[c + 1]]
+        self.cell_polys = polys[order]
+        self.cell_ptr = np.zeros(nx * ny + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=nx * ny), out=self.cell_ptr[1:])
+
+    def locate(self, lat, lon):
+        """Return the polygon position for each point (-1 when outside every NTA)."""
+        px = np.asarray(lon, dtype=float)
+        py = np.asarray(lat, dtype=float)
+        result = np.full(len(px), -1, dtype=np.int64)
+        if len(px) == 0 or len(self.cell_polys) == 0:
+            return result
+
+        nx, ny = self.shape
+        ix = np.floor((px - self.origin[0]) / self.cell_size)
+        iy = np.floor((py - self.origin[1]) / self.cell_size)
+        ok = (ix >= 0) & (ix < nx) & (iy >= 0) & (iy < ny)  # NaN coordinates fail here too
+        points = np.flatnonzero(ok)
+        cells = (ix[ok] * ny + iy[ok]).astype(np.int64)
+
+        # expand each point into its cell's candidate polygons
+        starts = self.cell_ptr[cells]
+        counts = self.cell_ptr[cells + 1] - starts
+        pair_point = np.repeat(points, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_poly = self.cell_polys[np.repeat(starts, counts) + offsets]
+
+        # cheap bounding-box rejection before the exact test
+        bbox = self.bboxes[pair_poly]
+        x, y = px[pair_point], py[pair_point]
+        keep = (x >= bbox[:, 0]) & (x <= bbox[:, 2]) & (y >= bbox[:, 1]) & (y <= bbox[:, 3])
+        pair_point, pair_poly = pair_point[keep], pair_poly[keep]
+
+        order = np.argsort(pair_poly, kind='stable')
+        pair_point, pair_poly = pair_point[order], pair_poly[order]
+        bounds = np.flatnonzero(np.diff(pair_poly)) + 1
+        for group in np.split(np.arange(len(pair_poly)), bounds):
+            if len(group) == 0:
+                continue
+            poly = pair_poly[group[0]]
+            pts = pair_point[group]
+            pts = pts[result[pts] < 0]  # NTAs do not overlap, first hit wins
+            inside = points_in_edges(px[pts], py[pts], self.edges[poly])
+            result[pts[inside]] = poly
+        return result
+
+    def assign(self, lat, lon):
+        """Return a DataFrame with nta_id and cdta_id for each point (NaN when unmatched)."""
+        position = self.locate(lat, lon)
+        matched = position >= 0
+        nta_id = np.full(len(position), None, dtype=object)
+        cdta_id = np.full(len(position), None, dtype=object)
+        nta_id[matched] = self.nta_ids[position[matched]]
+        cdta_id[matched] = self.cdta_ids[position[matched]]
+        return pd.DataFrame({'nta_id': nta_id, 'cdta_id': cdta_id})
+
+
+def build_efap_nta_mapping(sites, index, lat_col='lat', lon_col='lon'):
+    """Assign every geocoded EFAP site to an NTA; sites outside every NTA are dropped."""
+    sites = sites.dropna(subset=[lat_col, lon_col])
+    assigned = index.assign(sites[lat_col].to_numpy(), sites[lon_col].to_numpy())
+    mapping = pd.DataFrame({
+        'efap_id': sites['efap_id'].to_numpy(),
+        'nta_id': assigned['nta_id'].to_numpy(),
+        'lat': sites[lat_col].to_numpy(),
+        'lon': sites[lon_col].to_numpy(),
+    })
+    return mapping.dropna(subset=['nta_id']).reset_index(drop=True)
+
+
+def compare_mappings(computed, reference):
+    """Compare a computed efap -> NTA mapping with a reference one; returns the mismatches."""
+    merged = reference.merge(computed[['efap_id', 'nta_id']], on='efap_id', how='left',
+                             suffixes=('_reference', '_computed'))
+    mismatches = merged[merged['nta_id_reference'] != merged['nta_id_computed']]
+    print(f"{len(reference) - len(mismatches)} / {len(reference)} sites match the reference mapping")
+    return mismatches
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Assign lat/lon points to NTAs offline using dim_map geometries.')
+    parser.add_argument('--dim-map', default=DIM_MAP_CLEAN, help='CSV with nta_id, cdta_id and the_geom_wkt')
+    parser.add_argument('--points', default=EFAP_NTA_MAPPING, help='CSV with efap_id, lat and lon columns')
+    parser.add_argument('--output', default=None, help='where to write the efap_id, nta_id, lat, lon mapping')
+    parser.add_argument('--check', action='store_true', help='compare the result with the existing efap_nta_mapping.csv')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    nta_index = NTAIndex(read_table('dim_map', args.dim_map))
+    print(f"Indexed {len(nta_index.nta_ids)} NTAs in {time.perf_counter() - start:.2f}s")
+
+    points = pd.read_csv(args.points)
+    start = time.perf_counter()
+    mapping = build_efap_nta_mapping(points, nta_index)
+    elapsed = time.perf_counter() - start
+    print(f"Assigned {len(mapping)} of {len(points)} points in {elapsed:.3f}s "
+          f"({len(points) / max(elapsed, 1e-9):,.0f} points/s)")
+
+    if args.check:
+        compare_mappings(mapping, read_table('efap_nta_mapping'))
+    if args.output:
+        write_table(mapping, 'efap_nta_mapping', args.output)
+        print(f"Saved mapping to {args.output}")
@@ -0,0 +1,200 @@
+import argparse
+import csv
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import EFAP_RAW, PRIORITIZATION_RAW, SHELTER_CENSUS_RAW
+from create_schema import borough_codes
+
+# -----------------------------
+# Synthetic raw data for scaling benchmarks
+# Writes files with the same names, columns and formats as the raw exports
+# (efap_raw.csv, Individual_Census.csv, Neighborhood Prioritization Map
+# 2024.csv and an NTA file with WKT geometries) at `scale` times the real
+# row counts. Categorical values and schedules are resampled from the real
+# files so the cleaning code meets the same formats. NTAs tile a grid over
+# the city: neighbouring polygons share their wiggly edges exactly, like
+# real boundaries do.
+# -----------------------------
+
+BASE_NTAS = 197
+BASE_DISTRICTS = 59
+BASE_EFAP = 561
+BOROUGHS = ['Manhattan', 'Bronx', 'Brooklyn', 'Queens', 'Staten Island']
+BORO_NUMBERS = {'Manhattan': 1, 'Bronx': 2, 'Brooklyn': 3, 'Queens': 4, 'Staten Island': 5}
+CITY_BBOX = (-74.25, 40.50, -73.70, 40.91)       # lon_min, lat_min, lon_max, lat_max
+EDGE_POINTS = 8                                  # interior vertices per polygon edge
+
+FILE_NAMES = {
+    'efap': os.path.basename(EFAP_RAW),
+    'census': os.path.basename(SHELTER_CENSUS_RAW),
+    'prioritization': os.path.basename(PRIORITIZATION_RAW),
+    'nta': '2020_Neighborhood_Tabulation_Areas_(NTAs).csv',
+}
+
+
+# -----------------------------
+# NTA geometries
+# -----------------------------
+
+def _edge(rng_seed, start, end, amplitude):
+    """Interior points of a jittered edge; the same seed gives the same edge for both neighbours."""
+    rng = np.random.default_rng(rng_seed)
+    t = np.linspace(0, 1, EDGE_POINTS + 2)[1:-1]
+    points = np.outer(1 - t, start) + np.outer(t, end)
+    normal = np.array([-(end[1] - start[1]), end[0] - start[0]])
+    normal = normal / np.linalg.norm(normal)
+    return points + np.outer(rng.uniform(-amplitude, amplitude, len(t)), normal)
+
+
+def nta_grid(n_ntas, seed=0):
+    """Rows, columns and polygon rings (lon, lat arrays) of a grid of n_ntas cells."""
+    lon_min, lat_min, lon_max, lat_max = CITY_BBOX
+    cols = int(np.ceil(np.sqrt(n_ntas * (lon_max - lon_min) / (lat_max - lat_min))))
+    rows = int(np.ceil(n_ntas / cols))
+    xs = np.linspace(lon_min, lon_max, cols + 1)
+    ys = np.linspace(lat_min, lat_max, rows + 1)
+    amplitude = 0.15 * min(xs[1] - xs[0], ys[1] - ys[0])
+
+    # one jittered polyline per grid edge, keyed so neighbours reuse it
+    def horizontal(i, j):   # along y = ys[i] from xs[j] to xs[j + 1]
+        return _edge((seed, 0, i, j), np.array([xs[j], ys[i]]), np.array([xs[j + 1], ys[i]]),
+                     0 if i in (0, rows) else amplitude)
+
+    def vertical(i, j):     # along x = xs[j] from ys[i] to ys[i + 1]
+        return _edge((seed, 1, i, j), np.array([xs[j], ys[i]]), np.array([xs[j], ys[i + 1]]),
+                     0 if j in (0, cols) else amplitude)
+
+    rings = []
+    for k in range(n_ntas):
+        i, j = divmod(k, cols)
+        ring = np.vstack([
+            [[xs[j], ys[i]]], horizontal(i, j),
+            [[xs[j + 1], ys[i]]], vertical(i, j + 1),
+            [[xs[j + 1], ys[i + 1]]], horizontal(i + 1, j)[::-1],
+            [[xs[j], ys[i + 1]]], vertical(i, j)[::-1],
+            [[xs[j], ys[i]]],
+        ])
+        rings.append(ring)
+    return rings
+
+
+def ring_wkt(ring):
+    return 'MULTIPOLYGON (((' + ', '.join(f'{x:.6f} {y:.6f}' for x, y in ring) + ')))'
+
+
+# -----------------------------
+# Tables
+# -----------------------------
+
+def nta_table(scale, seed=0):
+    """Synthetic NTA file: about 3.3 NTAs per community district, like the real data."""
+    n_ntas = BASE_NTAS * scale
+    n_districts = BASE_DISTRICTS * scale
+    district = np.arange(n_ntas) * n_districts // n_ntas
+    borough = np.array(BOROUGHS)[district % 5]
+    number = district // 5 + 1
+    cdta = [f'{borough_codes[b]}{n:02d}' for b, n in zip(borough, number)]
+    within = pd.Series(cdta).groupby(cdta).cumcount().to_numpy() + 1
+    nta_ids = [f'{c}{w:02d}' for c, w in zip(cdta, within)]
+    rings = nta_grid(n_ntas, seed)
+    return pd.DataFrame({
+        'the_geom': [ring_wkt(r) for r in rings],
+        'BoroCode': [BORO_NUMBERS[b] for b in borough],
+        'BoroName': borough,
+        'CountyFIPS': '000',
+        'NTA2020': nta_ids,
+        'NTAName': [f'Synthetic {n}' for n in nta_ids],
+        'NTAAbbrev': nta_ids,
+        'NTAType': 0,
+        'CDTA2020': cdta,
+        'CDTAName': [f'{c} Synthetic District' for c in cdta],
+        'Shape_Leng': 0.0,
+        'Shape_Area': 0.0,
+    }), rings
+
+
+def census_table(scale, rng):
+    """Every district x every real report month, newest first, with the real quoting."""
+    real = pd.read_csv(SHELTER_CENSUS_RAW, dtype=str)
+    months = real['Report Date'].drop_duplicates().tolist()      # newest first already
+    n_districts = BASE_DISTRICTS * scale
+    district = np.arange(n_districts)
+    borough = np.array(BOROUGHS)[district % 5]
+    number = district // 5 + 1
+
+    rows = len(months) * n_districts
+    frame = pd.DataFrame({
+        'Report Date': np.repeat(months, n_districts),
+        'Borough': np.tile(borough, len(months)),
+        'Community Districts': np.tile(number, len(months)).astype(str),
+        'Census Type': 'Individuals',
+    })
+    counts = real.columns[4:]
+    for column in counts:
+        values = pd.to_numeric(real[column].str.replace(',', ''), errors='coerce').dropna().to_numpy()
+        sampled = rng.choice(values, rows).astype(int)
+        # the export writes thousands with a comma ("1,234")
+        frame[column] = [f'{v:,}' for v in sampled]
+    return frame
+
+
+def efap_table(scale, rng):
+    """EFAP rows resampled from the real file with fresh unique IDs."""
+    real = pd.read_csv(EFAP_RAW, dtype={'DISTZIP': str})
+    sample = real.iloc[rng.integers(0, len(real), BASE_EFAP * scale)].reset_index(drop=True)
+    sample['ID'] = 80000 + np.arange(len(sample))
+    return sample
+
+
+def prioritization_table(nta, rings, rng):
+    """One prioritization row per synthetic NTA, measures resampled from the real file."""
+    real = pd.read_csv(PRIORITIZATION_RAW)
+    sample = real.iloc[rng.integers(0, len(real), len(nta))].reset_index(drop=True)
+    sample['NTA'] = nta['NTA2020'].to_numpy()
+    sample['NTA.Name'] = nta['NTAName'].to_numpy()
+    centers = np.array([ring[:-1].mean(axis=0) for ring in rings])
+    sample['Latitude (generated)'] = centers[:, 1]
+    sample['Longitude (generated)'] = centers[:, 0]
+    return sample
+
+
+def site_points(n, rng):
+    """Random site coordinates inside the synthetic city (stand-in for geocoding)."""
+    lon_min, lat_min, lon_max, lat_max = CITY_BBOX
+    return rng.uniform(lat_min, lat_max, n), rng.uniform(lon_min, lon_max, n)
+
+
+def generate(scale, out_dir, seed=0):
+    """Write the four synthetic raw files to out_dir; returns {name: path}."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    nta, rings = nta_table(scale, seed)
+    tables = {
+        'nta': nta,
+        'census': census_table(scale, rng),
+        'efap': efap_table(scale, rng),
+        'prioritization': prioritization_table(nta, rings, rng),
+    }
+    paths = {}
+    for name, frame in tables.items():
+        paths[name] = os.path.join(out_dir, FILE_NAMES[name])
+        quoting = csv.QUOTE_ALL if name == 'census' else csv.QUOTE_MINIMAL
+        frame.to_csv(paths[name], index=False, quoting=quoting)
+    return paths
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write schema-faithful synthetic raw files at N x the real size.')
+    parser.add_argument('--scale', type=int, default=10)
+    parser.add_argument('--output', required=True, help='directory for the synthetic raw files')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    for name, path in generate(args.scale, args.output, args.seed).items():
+        print(f"{name}: {path} ({os.path.getsize(path) / 2**20:.1f} MB)")
+    print(f"Generated in {time.perf_counter() - start:.2f}s")
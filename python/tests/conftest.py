@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the modules in python/src import each other by name, as when run as scripts
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'src'))
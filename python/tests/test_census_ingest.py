@@ -0,0 +1,64 @@
+import csv
+
+import pytest
+
+from census_ingest import ingest_census
+from config import SHELTER_CENSUS_RAW
+from schemas import SCHEMAS, read_raw, write_table
+
+RAW_COLUMNS = list(SCHEMAS['shelter_census_raw'].columns)
+
+
+def write_raw(path, dates):
+    """Raw census csv with two districts per report date, in the given (month/day/year) order."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(RAW_COLUMNS)
+        for i, date in enumerate(dates):
+            for district in ('7', '8'):
+                writer.writerow([date, 'Queens', district, 'Individuals', '0', '0', '1,172', '0',
+                                 str(i), f'{i + int(district)}', '1,297'])
+    return path
+
+
+def ingest(tmp_path, raw, name, **options):
+    store = tmp_path / f'{name}.csv'
+    stats = ingest_census(raw, store, state_path=tmp_path / f'{name}_state.json', **options)
+    return stats, store.read_bytes()
+
+
+@pytest.mark.skipif(not SHELTER_CENSUS_RAW.exists(), reason='raw DHS census export not available')
+def test_chunked_ingest_matches_clean_shelter_census_byte_for_byte(tmp_path):
+    from create_schema import clean_shelter_census
+    expected = tmp_path / 'expected.csv'
+    write_table(clean_shelter_census(read_raw('shelter_census_raw')), 'shelter_census_clean', expected)
+    # a small chunk size so rows cross many chunk boundaries
+    _, chunked = ingest(tmp_path, SHELTER_CENSUS_RAW, 'chunked', full=True, chunksize=997)
+    assert chunked == expected.read_bytes()
+
+
+def test_incremental_ingest_matches_full_rebuild(tmp_path):
+    old = ['03/31/2024', '02/29/2024', '01/31/2024']
+    new = ['05/31/2024', '04/30/2024'] + old
+    store = tmp_path / 'store.csv'
+    state = tmp_path / 'state.json'
+    ingest_census(write_raw(tmp_path / 'old.csv', old), store, full=True, chunksize=3, state_path=state)
+
+    stats = ingest_census(write_raw(tmp_path / 'new.csv', new), store, chunksize=3, state_path=state)
+    _, rebuilt = ingest(tmp_path, tmp_path / 'new.csv', 'rebuilt', full=True, chunksize=3)
+    assert stats['mode'] == 'incremental'
+    assert stats['rows_written'] == 4
+    assert store.read_bytes() == rebuilt
+
+
+def test_dates_out_of_order_across_chunks_rebuild_in_full(tmp_path):
+    store = tmp_path / 'store.csv'
+    state = tmp_path / 'state.json'
+    ingest_census(write_raw(tmp_path / 'old.csv', ['01/31/2024']), store, full=True, state_path=state)
+
+    # each 2-row chunk is newest first, but the second chunk starts with a newer month
+    raw = write_raw(tmp_path / 'new.csv', ['03/31/2024', '05/31/2024', '01/31/2024'])
+    stats = ingest_census(raw, store, chunksize=2, state_path=state)
+    _, rebuilt = ingest(tmp_path, raw, 'rebuilt', full=True)
+    assert stats['mode'] == 'full'
+    assert store.read_bytes() == rebuilt
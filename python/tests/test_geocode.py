@@ -0,0 +1,127 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+
+from geocode import CACHED_STATUS, GeocodeCache, GeoclientGeocoder, full_address, geocode_efap
+
+# -----------------------------
+# Local stub Geoclient: answers each houseNumber with a scripted list of
+# HTTP statuses (the last one repeats), no key and no network needed
+# -----------------------------
+
+ANSWERS = {
+    '1': [200],             # listed twice in EFAP below
+    '2': [503, 200],        # retried once, then answered
+    '3': [500],             # server error on every attempt
+    '4': [403],             # a rejected key: not retried
+    '9': [200],             # Geoclient answers without a match
+}
+NO_MATCH = {'9'}
+
+EFAP = pd.DataFrame({
+    'DISTADD': ['1 MAIN STREET', '1 Main Street ', '2 BROADWAY', '3 PARK AVENUE', '4 WALL STREET',
+                '9 NOWHERE ROAD'],
+    'DISTZIP': ['10001', '10001', '10002', '10003', '10004', '10009'],
+    'DISTBORO': ['NY'] * 6,
+})
+
+
+def _handler(requests_seen):
+    class StubGeoclient(BaseHTTPRequestHandler):
+        def do_GET(self):
+            house_number = parse_qs(urlparse(self.path).query).get('houseNumber', [''])[0]
+            requests_seen.append(house_number)
+            statuses = ANSWERS[house_number]
+            status = statuses[min(requests_seen.count(house_number), len(statuses)) - 1]
+            body = b'{}'
+            if status == 200 and house_number not in NO_MATCH:
+                body = b'{"address": {"latitude": 40.7, "longitude": -73.9, "nta": "MN0101"}}'
+            elif status == 200:
+                body = b'{"address": {}}'
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return StubGeoclient
+
+
+@pytest.fixture
+def stub():
+    """(base url, list of houseNumbers requested) of a stub server running for the test."""
+    requests_seen = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _handler(requests_seen))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}/address.json', requests_seen
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = GeocodeCache(tmp_path / 'cache.sqlite')
+    yield cache
+    cache.close()
+
+
+def _geocoder(url):
+    return GeoclientGeocoder(base_url=url, workers=4, rate=None, max_retries=2, backoff=0)
+
+
+def _cached(cache):
+    return cache.get_many(full_address(EFAP['DISTADD'], EFAP['DISTZIP']))
+
+
+def test_duplicate_addresses_are_fetched_once(stub, cache):
+    url, requests_seen = stub
+    _, stats = geocode_efap(EFAP, _geocoder(url), cache)
+    assert stats['unique_addresses'] == 5
+    assert requests_seen.count('1') == 1
+
+
+def test_retried_server_error_is_cached_once_answered(stub, cache):
+    url, requests_seen = stub
+    geocode_efap(EFAP, _geocoder(url), cache)
+    assert requests_seen.count('2') == 2
+    assert _cached(cache)['2 BROADWAY, NEW YORK, NY 10002']['status'] == 'ok'
+
+
+def test_persistent_server_error_is_retried_and_never_cached(stub, cache):
+    url, requests_seen = stub
+    geocode_efap(EFAP, _geocoder(url), cache)
+    assert requests_seen.count('3') == 3
+    assert '3 PARK AVENUE, NEW YORK, NY 10003' not in _cached(cache)
+
+
+def test_client_error_is_not_retried_and_never_cached(stub, cache):
+    url, requests_seen = stub
+    _, stats = geocode_efap(EFAP, _geocoder(url), cache)
+    assert requests_seen.count('4') == 1
+    assert stats['failed'] == 2
+    assert '4 WALL STREET, NEW YORK, NY 10004' not in _cached(cache)
+
+
+def test_only_cached_statuses_are_stored(stub, cache):
+    url, _ = stub
+    geocode_efap(EFAP, _geocoder(url), cache)
+    cached = _cached(cache)
+    assert cached['9 NOWHERE ROAD, NEW YORK, NY 10009']['status'] == 'no_match'
+    assert {row['status'] for row in cached.values()} <= set(CACHED_STATUS)
+
+
+def test_rerun_is_served_from_the_cache(stub, cache):
+    url, requests_seen = stub
+    geocoder = _geocoder(url)
+    geocode_efap(EFAP, geocoder, cache)
+    del requests_seen[:]
+    _, stats = geocode_efap(EFAP, geocoder, cache)
+    # only the addresses that failed are asked again
+    assert sorted(requests_seen) == ['3'] * 3 + ['4']
+    assert stats['cache_hits'] == 3
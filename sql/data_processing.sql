@@ -1,10 +1,12 @@
 -- STAR SCHEMA: NYC Food & Shelter Access Database
 -- 1. DIMENSION TABLES
 
--- dim_date: 
+-- dim_date: one row per census report month, date_id = YYYYMM (e.g. 202601)
 CREATE TABLE dim_date (
     date_id     INT         PRIMARY KEY,
+    report_date TEXT        NOT NULL,
     year        INT         NOT NULL,
+    month       INT         NOT NULL
 );
 
 -- dim_map: where shelters are located (NTA-level)
@@ -15,7 +17,7 @@ CREATE TABLE dim_map (
     cdta_name   TEXT,
     boro_code   INT,
     boro_name   TEXT,
-    the_geom_wkt MULTIPOLYGON
+    the_geom_wkt TEXT                       -- MULTIPOLYGON in WKT
 );
 
 -- dim_cdta: bridge to connect shelter facts to dim_map — extracted from dim_map to allow clean FK from shelter fact
@@ -55,14 +57,13 @@ CREATE TABLE fact_neighborhood_prioritization (
     weighted_score              DECIMAL,
     food_insecure_percentage    DECIMAL,
     supply_gap                  DECIMAL,
-    vulnerable_pop_percentage   DECIMAL,
+    vulnerable_population_percentage   DECIMAL,
     UNIQUE (nta_id),
-    FOREIGN KEY (nta_id)  REFERENCES dim_map (nta_id), -- nta_id is FK only becauce it reference dimensions, not identify the fact
-
+    FOREIGN KEY (nta_id)  REFERENCES dim_map (nta_id) -- nta_id is FK only becauce it reference dimensions, not identify the fact
 );
 
 
--- fact_food_site_coverage
+-- fact_food_site_coverage: materialized per NTA x month and kept up to date by python/src/coverage.py
 CREATE TABLE fact_food_site_coverage (
     nta_id              TEXT        NOT NULL,
     date_id             INT         NOT NULL,
@@ -71,6 +72,8 @@ CREATE TABLE fact_food_site_coverage (
     total_sites         INT,
     weekend_site_count  INT,
     weekday_site_count  INT,
+    sheltered_population REAL,                 -- CDTA shelter census split evenly over its NTAs
+    coverage_ratio      REAL,                   -- total_sites per 1,000 sheltered people (NULL when nobody is sheltered)
     UNIQUE (nta_id, date_id),
     FOREIGN KEY (nta_id)  REFERENCES dim_map (nta_id),
     FOREIGN KEY (date_id) REFERENCES dim_date (date_id) -- nta_id and date_id are FKs only — they reference dimensions, not identify the fact
@@ -83,9 +86,21 @@ CREATE TABLE fact_agg_shelter_cdta_year (
     date_id                         INT         NOT NULL,
     boro                            TEXT,
     family_with_children_commercial_hotel   INT,
-    family_with_children_count      INT,
+    family_with_children_shelter    INT,
     family_cluster                  INT,
     UNIQUE (cdta_id, date_id),
     FOREIGN KEY (cdta_id) REFERENCES dim_cdta (cdta_id), -- cdta_id is FK only, it reference the dimension table (Cdta), not identify the fact itself
     FOREIGN KEY (date_id) REFERENCES dim_date (date_id) -- date_id is FK only because it references the dimension date, not identify the fact it self
 );
+
+
+-- 4. INDEXES
+-- Created after the bulk load (see python/src/load_sqlite.py) so inserts do not
+-- maintain them row by row. UNIQUE/PRIMARY KEY constraints already index their
+-- leading column, so only the remaining FK columns are indexed here. The
+-- dim_map and bridge indexes also carry the column the per-CDTA site counts
+-- join on, so those joins read the index alone instead of a table row per entry.
+CREATE INDEX idx_dim_map_cdta_id ON dim_map (cdta_id, nta_id);
+CREATE INDEX idx_bridge_efap_site_nta_nta_id ON bridge_efap_site_nta (nta_id, efap_id);
+CREATE INDEX idx_fact_food_site_coverage_date_id ON fact_food_site_coverage (date_id);
+CREATE INDEX idx_fact_agg_shelter_cdta_year_date_id ON fact_agg_shelter_cdta_year (date_id);